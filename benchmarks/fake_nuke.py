@@ -0,0 +1,685 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+In-process stand-in for the nuke and nukescripts modules, used to
+benchmark the submitter without a licensed Nuke.
+
+Only the parts of the Nuke API used by the submitter are available.
+Dialogs never block: nuke.ask() returns True and messages are
+collected in nuke.messages.
+
+Usage:
+    import fake_nuke
+    fake_nuke.install()
+    fake_nuke.generate_script(10000, write_count=20, group_depth=2)
+
+"""
+
+import ast
+import os
+import random
+import re
+import sys
+import types
+
+NUKE_VERSION_MAJOR = 13
+NUKE_VERSION_MINOR = 2
+
+# Flags used by the submitter
+STARTLINE = 0x1
+INPUTS = 0x1
+EXPRESSIONS = 0x8
+TO_SCRIPT = 0x1
+WRITE_NON_DEFAULT_ONLY = 0x2
+WRITE_USER_KNOB_DEFS = 0x4
+
+
+class Knob(object):
+    """Knob holding a single value."""
+
+    def __init__(self, name, label="", value=None):
+        self._name = name
+        self._value = value
+        self._values = []
+        self._keys = {}
+        self._expressions = {}
+
+    def name(self):
+        return self._name
+
+    def value(self, index=0):
+        for key in (index, -1):
+            if key in self._expressions:
+                return _number(_tcl(self._expressions[key]))
+        return self._value
+
+    def getValue(self, index=0):
+        return self.value(index)
+
+    def setValue(self, value):
+        self._value = value
+
+    def values(self):
+        return list(self._values)
+
+    def setValues(self, values):
+        self._values = list(values)
+
+    def evaluate(self):
+        if isinstance(self._value, str) and "[" in self._value:
+            return _tcl(self._value)
+        return self.value()
+
+    def isAnimated(self):
+        return bool(self._keys or self._expressions)
+
+    def setExpression(self, expression, channel=-1):
+        self._expressions[channel] = expression
+        return True
+
+    def setAnimated(self, index=-1):
+        return True
+
+    def clearAnimated(self, index=-1):
+        self._keys = {}
+        self._expressions = {}
+        return True
+
+    def setValueAt(self, value, time, index=-1):
+        self._keys[(time, index)] = value
+        return True
+
+    def valueAt(self, time, index=0):
+        for key in ((time, index), (time, -1)):
+            if key in self._keys:
+                return self._keys[key]
+        return self._value
+
+    def toScript(self):
+        if self._expressions:
+            return " ".join(
+                "{{%s}}" % expression
+                for _, expression in sorted(self._expressions.items())
+            )
+        if self._keys:
+            return "{{curve %s}}" % " ".join(
+                "x%s %s" % (time, value)
+                for (time, index), value in sorted(self._keys.items())
+            )
+        return str(self._value)
+
+    def fromScript(self, script):
+        self._keys = {}
+        self._expressions = {}
+        try:
+            self._value = ast.literal_eval(script)
+        except (SyntaxError, ValueError):
+            self._value = script
+        return True
+
+    def setFlag(self, flag):
+        pass
+
+    def clearFlag(self, flag):
+        pass
+
+    def setTooltip(self, tooltip):
+        pass
+
+    def setVisible(self, visible):
+        pass
+
+    def setEnabled(self, enabled):
+        pass
+
+
+class Enumeration_Knob(Knob):
+    def __init__(self, name, label="", values=()):
+        Knob.__init__(self, name, label, values[0] if values else None)
+        self._values = list(values)
+
+
+String_Knob = Int_Knob = Double_Knob = Boolean_Knob = Text_Knob = Knob
+File_Knob = Multiline_Eval_String_Knob = PyScript_Knob = Knob
+
+
+class Format(object):
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+
+class Node(object):
+    """Node with knobs and inputs."""
+
+    def __init__(self, node_class, name, parent=None, **knobs):
+        self._class = node_class
+        self._name = name
+        self._parent = parent
+        self._inputs = []
+        self._links = []
+        self._selected = False
+        self._knobs = {
+            "name": Knob("name", value=name),
+            "disable": Knob("disable", value=False),
+        }
+        for knob_name, value in knobs.items():
+            self._knobs[knob_name] = Knob(knob_name, value=value)
+
+    def Class(self):
+        return self._class
+
+    def name(self):
+        return self._name
+
+    def fullName(self):
+        if self._parent is None or self._parent is _root:
+            return self._name
+        return "%s.%s" % (self._parent.fullName(), self._name)
+
+    def knob(self, name):
+        return self._knobs.get(name)
+
+    def knobs(self):
+        return dict(self._knobs)
+
+    def __getitem__(self, name):
+        return self._knobs[name]
+
+    def input(self, index):
+        if index < len(self._inputs):
+            return self._inputs[index]
+        return None
+
+    def inputs(self):
+        return len(self._inputs)
+
+    def setInput(self, index, node):
+        while len(self._inputs) <= index:
+            self._inputs.append(None)
+        self._inputs[index] = node
+        return True
+
+    def dependencies(self, what=INPUTS):
+        if what & EXPRESSIONS:
+            return list(self._links)
+        return [node for node in self._inputs if node is not None]
+
+    def isSelected(self):
+        return self._selected
+
+    def setSelected(self, selected):
+        self._selected = selected
+
+    def firstFrame(self):
+        return _root.firstFrame()
+
+    def lastFrame(self):
+        return _root.lastFrame()
+
+    def format(self):
+        return _root.format()
+
+    def channels(self):
+        channels = self._knobs.get("channels")
+        if channels is not None:
+            return list(channels.value())
+        return ["rgba.red", "rgba.green", "rgba.blue", "rgba.alpha"]
+
+    def writeKnobs(self, flags=0):
+        return "\n".join(
+            " %s %s" % (name, knob.toScript())
+            for name, knob in sorted(self._knobs.items())
+        )
+
+
+class Group(Node):
+    """Node containing other nodes."""
+
+    def __init__(self, node_class, name, parent=None, **knobs):
+        Node.__init__(self, node_class, name, parent, **knobs)
+        self._nodes = []
+        self._output = None
+
+    def nodes(self):
+        return list(self._nodes)
+
+    def output(self):
+        return self._output
+
+    def __enter__(self):
+        _context.append(self)
+        return self
+
+    def __exit__(self, *args):
+        _context.pop()
+        return False
+
+
+Gizmo = Group
+
+
+class Root(Group):
+    def __init__(self):
+        Group.__init__(self, "Root", "Root")
+        self._knobs["name"] = Knob("name", value="Root")
+        self._knobs["first_frame"] = Knob("first_frame", value=1001)
+        self._knobs["last_frame"] = Knob("last_frame", value=1100)
+        self._knobs["frame"] = Knob("frame", value=1001)
+        self._format = Format(1920, 1080)
+
+    def name(self):
+        return self._knobs["name"].value()
+
+    def firstFrame(self):
+        return self._knobs["first_frame"].value()
+
+    def lastFrame(self):
+        return self._knobs["last_frame"].value()
+
+    def format(self):
+        return self._format
+
+
+class _Menu(object):
+    def __init__(self):
+        self.commands = []
+
+    def addMenu(self, name, **kwargs):
+        return self
+
+    def addCommand(self, name, command="", shortcut="", **kwargs):
+        self.commands.append((name, command, shortcut))
+
+
+class ProgressTask(object):
+    def __init__(self, name):
+        self.name = name
+
+    def setMessage(self, message):
+        pass
+
+    def setProgress(self, progress):
+        pass
+
+    def isCancelled(self):
+        return False
+
+
+_root = Root()
+_menu = _Menu()
+_modified = False
+GUI = True
+messages = []
+
+
+def root():
+    return _root
+
+
+def _number(text):
+    """Return the text as a number if possible, like a knob would."""
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def _words(command):
+    """Split a TCL command into words, braces group a word."""
+    words = []
+    word = ""
+    depth = 0
+
+    for character in command:
+        if character == "{":
+            depth += 1
+            if depth == 1:
+                continue
+        elif character == "}":
+            depth -= 1
+            if depth == 0:
+                words.append(word)
+                word = ""
+                continue
+        elif character.isspace() and depth == 0:
+            if word:
+                words.append(word)
+            word = ""
+            continue
+        word += character
+
+    if word:
+        words.append(word)
+    return words
+
+
+def _tcl(text):
+    """
+    Substitute the TCL commands in the text, only the value and lindex
+    commands used by the submitter are supported.
+    """
+    command = re.compile(r"\[([^\[\]]*)\]")
+    match = command.search(text)
+
+    while match:
+        words = _words(match.group(1))
+        if words[0] == "value":
+            node_name, _, knob_name = words[1].rpartition(".")
+            node = _root if node_name == "root" else toNode(node_name)
+            result = node.knob(knob_name).value()
+            if isinstance(result, float) and result.is_integer():
+                result = int(result)
+        elif words[0] == "lindex":
+            result = _words(words[1])[int(float(words[2]))]
+        else:
+            raise ValueError("Unsupported TCL command: %s" % words[0])
+
+        text = text[: match.start()] + str(result) + text[match.end() :]
+        match = command.search(text)
+
+    return text
+
+
+# Groups entered with a with statement, new nodes are created in the last
+_context = []
+
+
+class _Nodes(object):
+    """Stand-in for nuke.nodes, creating a node of any class."""
+
+    def __getattr__(self, node_class):
+        def create(**knobs):
+            group = _context[-1] if _context else _root
+            name = "%s%i" % (node_class, len(group._nodes) + 1)
+            return add(Node(node_class, name, **knobs), group)
+
+        return create
+
+
+nodes = _Nodes()
+
+
+def delete(node):
+    node._parent._nodes.remove(node)
+
+
+def thisRoot():
+    return _root
+
+
+def menu(name):
+    return _menu
+
+
+def pluginAddPath(path):
+    if path not in sys.path:
+        sys.path.append(path)
+
+
+def allNodes(filter=None, group=None, recurseGroups=False):
+    group = group or _root
+    nodes = []
+    for node in group._nodes:
+        if filter is None or node.Class() == filter:
+            nodes.append(node)
+        if recurseGroups and isinstance(node, Group):
+            nodes.extend(allNodes(filter, node, recurseGroups))
+    return nodes
+
+
+def toNode(name):
+    group = _root
+    node = None
+    for part in name.split("."):
+        node = None
+        for child in group._nodes:
+            if child.name() == part:
+                node = child
+                break
+        if node is None:
+            return None
+        group = node
+    return node
+
+
+def selectedNodes(filter=None):
+    return [
+        node
+        for node in allNodes()
+        if node.isSelected() and (filter is None or node.Class() == filter)
+    ]
+
+
+def selectedNode():
+    nodes = selectedNodes()
+    if not nodes:
+        raise ValueError("no node selected")
+    return nodes[0]
+
+
+def filename(node, mode=None):
+    return node.knob("file").value()
+
+
+def modified():
+    return _modified
+
+
+def scriptSave(path=None):
+    global _modified
+    _modified = False
+    return True
+
+
+def nodeCopy(path):
+    with open(path, "w", encoding="utf-8") as copy_file:
+        copy_file.write("set cut_paste_input [stack 0]\n")
+        copy_file.write("version %i.%i v1\n" % (13, 2))
+        for node in selectedNodes():
+            copy_file.write(
+                "%s {\n%s\n}\n" % (node.Class(), node.writeKnobs())
+            )
+    return True
+
+
+def ask(text):
+    messages.append(("ask", text))
+    return True
+
+
+def message(text):
+    messages.append(("message", text))
+
+
+def critical(text):
+    messages.append(("critical", text))
+
+
+def tprint(*args):
+    messages.append(("tprint", " ".join(str(arg) for arg in args)))
+
+
+def executeInMainThread(call, args=(), kwargs=None):
+    call(*args, **(kwargs or {}))
+
+
+def executeInMainThreadWithResult(call, args=(), kwargs=None):
+    return call(*args, **(kwargs or {}))
+
+
+def frame():
+    return _root.firstFrame()
+
+
+class PythonPanel(object):
+    """Stand-in for nukescripts.PythonPanel, always accepted."""
+
+    def __init__(self, title="", id=""):
+        self._knobs = []
+
+    def addKnob(self, knob):
+        self._knobs.append(knob)
+
+    def knobs(self):
+        return dict((knob.name(), knob) for knob in self._knobs)
+
+    def showModalDialog(self):
+        return True
+
+    def show(self):
+        return True
+
+    def addToPane(self, *args):
+        return True
+
+
+def install():
+    """Install the stand-in as the nuke and nukescripts modules."""
+    module = sys.modules[__name__]
+    sys.modules["nuke"] = module
+
+    nukescripts = types.ModuleType("nukescripts")
+    nukescripts.PythonPanel = PythonPanel
+    sys.modules["nukescripts"] = nukescripts
+
+    return module
+
+
+def reset(script_path="Root"):
+    """Remove all nodes and set the path of the script."""
+    global _root, _modified
+    _root = Root()
+    _root._knobs["name"].setValue(script_path)
+    _modified = False
+    del messages[:]
+
+
+def add(node, group=None):
+    """Add the node to the group, or to the Root."""
+    group = group or _root
+    node._parent = group
+    group._nodes.append(node)
+    return node
+
+
+# Classes used for the synthetic scripts
+_PROCESS_CLASSES = [
+    "Grade",
+    "ColorCorrect",
+    "Blur",
+    "Transform",
+    "Merge2",
+    "Defocus",
+    "Keyer",
+    "Shuffle2",
+    "Dot",
+    "Example_Class",
+]
+
+
+def generate_script(
+    node_count,
+    write_count=1,
+    group_depth=0,
+    group_size=50,
+    script_path="/projects/bench/shot_v001.nk",
+    output_directory="/projects/bench/render",
+    seed=0,
+):
+    """
+    Generate a synthetic script containing about node_count nodes.
+
+    The nodes are chained in branches starting at Read nodes, with
+    Merges joining the branches. Every group_size nodes a Group is
+    created, nested up to group_depth levels. The last write_count
+    branches end in Write nodes.
+
+    Returns a list with the Write nodes.
+    """
+    reset(script_path)
+    random_generator = random.Random(seed)
+
+    counters = {}
+
+    def create(node_class, group, node_type=Node, **knobs):
+        counters[node_class] = counters.get(node_class, 0) + 1
+        name = "%s%i" % (node_class, counters[node_class])
+        return add(node_type(node_class, name, **knobs), group)
+
+    def create_group(upstream, depth):
+        """Create a Group containing a small chain of nodes."""
+        group = create("Group", _root, node_type=Group)
+        group.setInput(0, upstream)
+
+        input_node = create("Input", group, number=0)
+        last = input_node
+        for _ in range(group_size):
+            node = create(random_generator.choice(_PROCESS_CLASSES), group)
+            node.setInput(0, last)
+            last = node
+
+        # Nesting Groups inside the Group
+        if depth > 1:
+            inner_group = create("Group", group, node_type=Group)
+            inner_group.setInput(0, last)
+            inner_input = create("Input", inner_group, number=0)
+            inner_output = create("Output", inner_group)
+            inner_output.setInput(0, inner_input)
+            inner_group._output = inner_output
+            last = inner_group
+
+        output = create("Output", group)
+        output.setInput(0, last)
+        group._output = output
+        return group
+
+    branches = []
+    created = 0
+
+    while created < node_count:
+        last = create(
+            "Read",
+            _root,
+            file="/projects/bench/plates/plate_%i.####.exr" % created,
+        )
+        created += 1
+
+        for _ in range(random_generator.randint(5, 40)):
+            if group_depth and created % group_size == 0:
+                last = create_group(last, group_depth)
+                created += group_size + 3
+                continue
+
+            node = create(random_generator.choice(_PROCESS_CLASSES), _root)
+            node.setInput(0, last)
+
+            # Merge with an earlier branch
+            if node.Class() == "Merge2" and branches:
+                node.setInput(1, random_generator.choice(branches))
+
+            last = node
+            created += 1
+
+        branches.append(last)
+
+    writes = []
+    for index in range(write_count):
+        write = create(
+            "Write",
+            _root,
+            file=os.path.join(
+                output_directory, "write_%i" % index, "write.####.exr"
+            ).replace(os.sep, "/"),
+            reading=False,
+        )
+        write.setInput(0, branches[-1 - (index % len(branches))])
+        writes.append(write)
+
+    return writes
@@ -0,0 +1,294 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Benchmarks for the submitter, running without a licensed Nuke.
+
+Synthetic scripts are generated using the fake_nuke stand-in, after
+which every stage of a submission is timed:
+- validate_script: the sanity check of the Write node
+- submission_parameters: creating the job_info and plugin_info
+- write_info_files: writing the info files to disk
+- deadlinecommand: a submission round-trip to a fake deadlinecommand
+- menu_import: registering the menu in a fresh interpreter
+
+Results are saved to a JSON file, which can be compared with the
+results of an earlier run to catch regressions:
+    python benchmarks/run_benchmarks.py --output new.json
+    python benchmarks/run_benchmarks.py --compare old.json
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SUBMITTER_DIRECTORY = os.path.join(
+    os.path.dirname(BENCHMARK_DIRECTORY), "deadline_submission"
+)
+
+sys.path.insert(0, BENCHMARK_DIRECTORY)
+sys.path.insert(0, SUBMITTER_DIRECTORY)
+
+import fake_nuke  # noqa: E402
+
+fake_nuke.install()
+
+import deadline_submission  # noqa: E402
+import panel  # noqa: E402
+import transport  # noqa: E402
+from sanity_check import SanityCheck  # noqa: E402
+
+# Fake deadlinecommand, answering like Deadline does
+FAKE_DEADLINECOMMAND = """#!%s
+import sys
+jobs = max(sys.argv.count("-job"), 1)
+for index in range(jobs):
+    print("Result=Success")
+    print("JobID=%%024x" %% index)
+"""
+
+# Registering the menu in a fresh interpreter, printing the time it took
+MENU_IMPORT = """
+import sys, time
+sys.path[:0] = [%r, %r]
+import fake_nuke
+nuke = fake_nuke.install()
+start = time.perf_counter()
+exec(compile(open(%r).read(), "menu.py", "exec"), {"nuke": nuke})
+print(time.perf_counter() - start)
+print(len(sys.modules))
+"""
+
+
+def measure(function, repeats):
+    """Run the function the amount of repeats, returning the timings."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings):
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "repeats": len(timings),
+    }
+
+
+def benchmark_script(node_count, write_count, group_depth, repeats, work):
+    """Time every submission stage on a generated script."""
+    writes = fake_nuke.generate_script(
+        node_count,
+        write_count=write_count,
+        group_depth=group_depth,
+        script_path=os.path.join(work, "shot_v001.nk"),
+    )
+    write = writes[0]
+
+    submission = deadline_submission.DeadlineSubmission()
+    submission.transport = transport.SubprocessTransport(work)
+
+    # The parameters are created by a private function
+    get_submission_parameters = (
+        submission._DeadlineSubmission__get_submission_parameters
+    )
+
+    submission_panel = panel.SubmissionPanel(write)
+    submission_parameters = get_submission_parameters(
+        write, submission_panel
+    )
+
+    info_directory = os.path.join(work, "info_files")
+    os.makedirs(info_directory, exist_ok=True)
+
+    results = {}
+    results["validate_script"] = measure(
+        lambda: SanityCheck().validate_script(write), repeats
+    )
+    results["submission_parameters"] = measure(
+        lambda: get_submission_parameters(write, submission_panel),
+        repeats,
+    )
+    results["write_info_files"] = measure(
+        lambda: transport.write_info_files(
+            submission_parameters, info_directory
+        ),
+        repeats,
+    )
+    results["deadlinecommand"] = measure(
+        lambda: submission.transport.submit([submission_parameters]),
+        repeats,
+    )
+
+    return dict(
+        (name, summarize(timings)) for name, timings in results.items()
+    )
+
+
+def benchmark_menu_import(repeats):
+    """Time registering the menu, and count the loaded modules."""
+    code = MENU_IMPORT % (
+        BENCHMARK_DIRECTORY,
+        SUBMITTER_DIRECTORY,
+        os.path.join(SUBMITTER_DIRECTORY, "menu.py"),
+    )
+
+    timings = []
+    modules = 0
+    for _ in range(repeats):
+        output = subprocess.check_output([sys.executable, "-c", code])
+        timing, modules = output.decode("utf-8").split()
+        timings.append(float(timing))
+
+    result = summarize(timings)
+    result["modules"] = int(modules)
+    return result
+
+
+def compare(results, baseline, threshold):
+    """
+    Print the difference with the baseline results. Returns False if
+    any median got slower than the threshold allows.
+    """
+    passed = True
+
+    for size, stages in sorted(results.get("scripts", {}).items()):
+        for stage, result in sorted(stages.items()):
+            baseline_result = (
+                baseline.get("scripts", {}).get(size, {}).get(stage)
+            )
+            if not baseline_result:
+                continue
+
+            ratio = result["median"] / max(baseline_result["median"], 1e-9)
+            regression = ratio > threshold
+            passed = passed and not regression
+
+            print(
+                "%-8s %-22s %10.4fs  x%.2f%s"
+                % (
+                    size,
+                    stage,
+                    result["median"],
+                    ratio,
+                    "  REGRESSION" if regression else "",
+                )
+            )
+
+    menu_import = results.get("menu_import")
+    baseline_menu = baseline.get("menu_import")
+    if menu_import and baseline_menu:
+        ratio = menu_import["median"] / max(baseline_menu["median"], 1e-9)
+        regression = ratio > threshold or (
+            menu_import["modules"] > baseline_menu["modules"]
+        )
+        passed = passed and not regression
+        print(
+            "%-8s %-22s %10.4fs  x%.2f  modules: %i%s"
+            % (
+                "-",
+                "menu_import",
+                menu_import["median"],
+                ratio,
+                menu_import["modules"],
+                "  REGRESSION" if regression else "",
+            )
+        )
+
+    return passed
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Amount of nodes of the generated scripts",
+    )
+    parser.add_argument("--writes", type=int, default=20)
+    parser.add_argument("--group-depth", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument(
+        "--output",
+        default="benchmark_results.json",
+        help="File to save the results to",
+    )
+    parser.add_argument(
+        "--compare", help="Results of an earlier run to compare with"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="Allowed slowdown compared to the earlier run",
+    )
+    options = parser.parse_args(arguments)
+
+    work = tempfile.mkdtemp()
+
+    # Keep the benchmark away from the files of the user
+    os.environ.pop("DEADLINE_WEBSERVICE_URL", None)
+    os.environ["DEADLINE_SUBMISSION_SPOOL"] = os.path.join(work, "spool")
+    os.environ["DEADLINE_SUBMISSION_STATS"] = os.path.join(
+        work, "stats.json"
+    )
+    os.environ["DEADLINE_SUBMISSION_TELEMETRY"] = "off"
+
+    try:
+        # Creating the fake deadlinecommand
+        deadline_command = os.path.join(work, "deadlinecommand")
+        with open(deadline_command, "w", encoding="utf-8") as command_file:
+            command_file.write(FAKE_DEADLINECOMMAND % sys.executable)
+        os.chmod(deadline_command, 0o755)
+
+        results = {
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scripts": {},
+        }
+
+        for size in options.sizes:
+            print("Benchmarking %i nodes..." % size)
+            results["scripts"][str(size)] = benchmark_script(
+                size,
+                options.writes,
+                options.group_depth,
+                options.repeats,
+                work,
+            )
+
+        results["menu_import"] = benchmark_menu_import(options.repeats)
+
+    finally:
+        shutil.rmtree(work)
+
+    with open(options.output, "w", encoding="utf-8") as output_file:
+        json.dump(results, output_file, indent=4)
+    print("Results saved to %s" % options.output)
+
+    # Without earlier results, the results are only printed
+    baseline = results
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as baseline_file:
+            baseline = json.load(baseline_file)
+
+    passed = compare(results, baseline, options.threshold)
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
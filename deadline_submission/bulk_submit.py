@@ -0,0 +1,422 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Command line submitter for a manifest of shots, without Nuke.
+
+The manifest is a CSV file (with a header) or a JSON file containing a
+list of shots. Every shot has the following keys:
+- script: path of the Nuke script
+- write: full name of the Write node, for example Write1
+- frames: frame list to render, the Root frame range if empty
+- priority: priority of the job, 70 if empty
+- name: name of the job (optional)
+- render_mode: auto, light, medium or heavy (optional, auto)
+
+Every script is read with nk_parser and checked with the same checks
+as the submitter in Nuke. The jobs of a script are submitted in a
+single call, while the scripts are handled by a pool of workers.
+
+Usage:
+    python bulk_submit.py shots.csv --workers 8 --report report.csv
+
+The report contains the JobID, or the reason of failure, of every shot.
+Shots that have already been submitted (and haven't failed since) are
+reported as duplicate with the JobID of the earlier job, unless
+--resubmit is used.
+
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import input_footprint
+import duplicates
+import limit_groups
+import nk_parser
+import spool
+import telemetry
+import transport
+from frames import parse_frame_list
+from job_parameters import (
+    build_submission_parameters,
+    fit_to_node_graph,
+    localize_inputs,
+    render_mode_settings,
+)
+from sanity_check import SanityCheck
+
+REPORT_FIELDS = [
+    "script",
+    "write",
+    "frames",
+    "priority",
+    "status",
+    "job_id",
+    "error",
+]
+
+
+def read_manifest(path):
+    """
+    Read the shots of the manifest, returning a list of dictionaries
+    with all keys of a shot filled in.
+    """
+    with open(path, encoding="utf-8", newline="") as manifest_file:
+        if path.lower().endswith(".json"):
+            shots = json.load(manifest_file)
+        else:
+            shots = list(csv.DictReader(manifest_file))
+
+    manifest = []
+    for shot in shots:
+        manifest.append(
+            {
+                "script": (shot.get("script") or "").strip(),
+                "write": (shot.get("write") or "").strip(),
+                "frames": str(shot.get("frames") or "").strip(),
+                "priority": int(shot.get("priority") or 70),
+                "name": (shot.get("name") or "").strip(),
+                "render_mode": (shot.get("render_mode") or "auto").strip(),
+            }
+        )
+
+    return manifest
+
+
+def build_jobs(script_path, shots, nuke_version=None, localize=False):
+    """
+    Read the script and create the submission parameters for every
+    shot of the script. If localize is True, every task copies its
+    input frames to the worker before rendering.
+
+    Returns a list with a result dictionary for every shot, containing
+    the shot and either the submission parameters or an error.
+    """
+    results = [dict(shot, status="failed", error="") for shot in shots]
+
+    try:
+        with telemetry.span("parse"):
+            script = nk_parser.parse_script(script_path)
+    except nk_parser.ParseError as error:
+        for result in results:
+            result["error"] = str(error)
+        return results
+
+    nuke_version = nuke_version or script.version
+    script_name = os.path.splitext(os.path.basename(script_path))[0]
+
+    for result in results:
+        if not nuke_version:
+            result["error"] = "The Nuke version of the script is unknown"
+            continue
+
+        node = script.to_node(result["write"])
+        with telemetry.span("sanity_check"):
+            check = SanityCheck().validate_offline(node, result["write"])
+        if not check["validated"]:
+            result["error"] = "; ".join(check["errors"])
+            continue
+
+        # Render the frame range of the script by default
+        frames = result["frames"] or "%i-%i" % (
+            script.first_frame(),
+            script.last_frame(),
+        )
+        try:
+            parse_frame_list(frames)
+        except ValueError as error:
+            result["error"] = str(error)
+            continue
+
+        concurrent_tasks, chunk_size = render_mode_settings(
+            result["render_mode"], script_path, node.fullName(), frames
+        )
+        fitted = fit_to_node_graph(
+            node,
+            check["upstream_index"],
+            frames,
+            concurrent_tasks,
+            chunk_size,
+            footprint=check["input_footprint"],
+        )
+
+        result["frames"] = frames
+        result["limit_groups"] = check["limit_groups"]
+        result["submission_parameters"] = build_submission_parameters(
+            script_path,
+            node.fullName(),
+            node.knob("file").value(),
+            fitted["frames"],
+            result["name"] or "%s - %s" % (script_name, node.name()),
+            nuke_version,
+            priority=result["priority"],
+            concurrent_tasks=fitted["concurrent_tasks"],
+            chunk_size=fitted["chunk_size"],
+            limit_groups=check["limit_groups"],
+            extra_info=fitted["extra_info"],
+        )
+        if localize:
+            localize_inputs(
+                result["submission_parameters"],
+                input_footprint.input_files(check["upstream_index"]),
+                fitted["reach"],
+            )
+        result["status"] = "checked"
+
+    return results
+
+
+def skip_duplicates(results, deadline_transport):
+    """
+    Mark the results of jobs that have already been submitted as
+    duplicate, with the JobID of the earlier job. Returns the results
+    left to submit. Any error in the check won't block the submission.
+    """
+    try:
+        duplicate_jobs = duplicates.find_duplicates(
+            [result["submission_parameters"] for result in results],
+            deadline_transport,
+        )
+    except Exception:
+        return results
+
+    telemetry.current().set(duplicates=len(duplicate_jobs))
+
+    earlier_ids = dict(
+        (id(duplicate["job"]), duplicate["job_id"])
+        for duplicate in duplicate_jobs
+    )
+    for result in results:
+        job_id = earlier_ids.get(id(result["submission_parameters"]))
+        if job_id:
+            result["status"] = "duplicate"
+            result["job_id"] = job_id
+
+    return [result for result in results if result["status"] == "checked"]
+
+
+def submit_script(
+    script_path,
+    shots,
+    deadline_transport,
+    nuke_version=None,
+    dry_run=False,
+    create_limits=False,
+    localize=False,
+    resubmit=False,
+):
+    """
+    Check and submit the shots of a single script, all jobs of the
+    script are sent to Deadline in one call.
+
+    If create_limits is True, the Deadline Limits of license limited
+    nodes are created before submitting. If localize is True, the
+    input frames are copied to the worker before every task. Jobs that
+    have already been submitted are left out, unless resubmit is True.
+    """
+    trace = telemetry.Trace(
+        "bulk_submit",
+        mode="bulk",
+        transport=type(deadline_transport).__name__,
+        write_count=len(shots),
+    )
+
+    with trace.activate():
+        results = build_jobs(script_path, shots, nuke_version, localize)
+        checked = [
+            result for result in results if result["status"] == "checked"
+        ]
+        trace.set(job_count=len(checked))
+
+        if checked and not dry_run and not resubmit:
+            with trace.span("duplicates"):
+                checked = skip_duplicates(checked, deadline_transport)
+
+        if checked and not dry_run:
+            jobs = [result["submission_parameters"] for result in checked]
+
+            try:
+                if create_limits:
+                    job_limits = {}
+                    for result in checked:
+                        job_limits.update(result["limit_groups"])
+                    with trace.span("limit_groups"):
+                        limit_groups.ensure_limit_groups(
+                            deadline_transport, job_limits
+                        )
+
+                # If Deadline can't be reached, the jobs are spooled
+                with trace.span("transport"):
+                    submission = spool.submit_or_spool(
+                        deadline_transport, jobs
+                    )
+
+            except Exception as error:
+                for result in checked:
+                    result["status"] = "failed"
+                    result["error"] = str(error)
+
+            else:
+                for result, job_id in zip(checked, submission["job_ids"]):
+                    if submission.get("spooled"):
+                        result["status"] = "spooled"
+                    elif job_id:
+                        result["status"] = "submitted"
+                        result["job_id"] = job_id
+                    else:
+                        result["status"] = "failed"
+                        result["error"] = submission.get("output", "")
+
+    trace.finish()
+
+    for result in results:
+        result.pop("submission_parameters", None)
+        result.pop("limit_groups", None)
+
+    return results
+
+
+def submit_manifest(
+    manifest,
+    deadline_transport=None,
+    max_workers=4,
+    nuke_version=None,
+    dry_run=False,
+    create_limits=False,
+    localize=False,
+    resubmit=False,
+):
+    """
+    Submit all shots of the manifest, every script is handled by one
+    of the workers. Returns the results in the order of the manifest.
+    """
+    deadline_transport = deadline_transport or transport.get_transport()
+
+    # Reading a script is the slowest part, so every script
+    # is only read once for all its Write nodes
+    scripts = {}
+    for index, shot in enumerate(manifest):
+        scripts.setdefault(shot["script"], []).append((index, shot))
+
+    results = [None] * len(manifest)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = dict(
+            (
+                executor.submit(
+                    submit_script,
+                    script_path,
+                    [shot for _, shot in shots],
+                    deadline_transport,
+                    nuke_version,
+                    dry_run,
+                    create_limits,
+                    localize,
+                    resubmit,
+                ),
+                shots,
+            )
+            for script_path, shots in scripts.items()
+        )
+
+        for future, shots in futures.items():
+            # A broken script shouldn't stop the other scripts
+            try:
+                script_results = future.result()
+            except Exception as error:
+                script_results = [
+                    dict(shot, status="failed", error=str(error))
+                    for _, shot in shots
+                ]
+
+            for (index, _), result in zip(shots, script_results):
+                results[index] = result
+
+    return results
+
+
+def write_report(results, path):
+    """Write the results to a CSV file, or JSON if the path ends in it."""
+    with open(path, "w", encoding="utf-8", newline="") as report_file:
+        if path.lower().endswith(".json"):
+            json.dump(results, report_file, indent=4)
+            return
+
+        writer = csv.DictWriter(
+            report_file, REPORT_FIELDS, extrasaction="ignore"
+        )
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("manifest", help="CSV or JSON file with shots")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Amount of scripts checked and submitted at the same time",
+    )
+    parser.add_argument(
+        "--report",
+        default="bulk_submit_report.csv",
+        help="CSV or JSON file to write the results to",
+    )
+    parser.add_argument(
+        "--nuke-version",
+        help="Nuke version to render with, by default the version "
+        "the script was saved with",
+    )
+    parser.add_argument(
+        "--create-limits",
+        action="store_true",
+        default=limit_groups.create_limits_enabled(),
+        help="Create the Deadline Limits of license limited nodes",
+    )
+    parser.add_argument(
+        "--localize-inputs",
+        action="store_true",
+        help="Copy the input frames to the worker before every task",
+    )
+    parser.add_argument(
+        "--resubmit",
+        action="store_true",
+        help="Submit shots that have already been submitted again",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only check the shots, without submitting",
+    )
+    options = parser.parse_args(arguments)
+
+    results = submit_manifest(
+        read_manifest(options.manifest),
+        max_workers=options.workers,
+        nuke_version=options.nuke_version,
+        dry_run=options.dry_run,
+        create_limits=options.create_limits,
+        localize=options.localize_inputs,
+        resubmit=options.resubmit,
+    )
+    write_report(results, options.report)
+
+    failed = [result for result in results if result["status"] == "failed"]
+    for result in failed:
+        print("%s: %s" % (result["script"], result["error"]))
+
+    print(
+        "%i shot(s), %i failed. Report saved to %s"
+        % (len(results), len(failed), options.report)
+    )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -8,11 +8,34 @@ Write nodes via the node itself or by selecting the node.
 
 import nuke
 import os
+import re
 import panel
+from frames import compact_frame_list, parse_frame_list
+from job_parameters import (
+    build_submission_parameters,
+    fit_to_node_graph,
+    localize_inputs,
+    preview_jobs,
+    profile_render,
+    render_mode_settings,
+    wedge_job,
+)
+import duplicates
+import input_footprint
+import job_registry
+import limit_groups
+import memory_budget
+from node_graph import TIME_NODE_CLASSES, UpstreamIndex
 from sanity_check import SanityCheck
-import tempfile
-from shutil import rmtree
-from subprocess import check_output
+import render_tuning
+import repository_metadata
+import script_snapshot
+import sequence_scanner
+import spool
+import submission_queue
+import telemetry
+import transport
+import wedge
 
 
 class DeadlineSubmission:
@@ -22,9 +45,25 @@ class DeadlineSubmission:
     the currently selected node. This function won't require any input.
 
     submit() will require a node to submit. E.g. submit(nuke.thisNode())
+
+    submit_selected_nodes() will submit every selected supported node
+    as its own job, using a single deadlinecommand call. With grouped set
+    to True, all nodes are rendered by a single job instead.
+
+    If background is True, the jobs are sent to Deadline in a worker
+    thread so the user interface of Nuke won't freeze while submitting.
+    The result will be shown to the user when the submission is done.
+
+    If spooled is True, the jobs are written to the local spool and sent
+    to Deadline in batches by the spool flusher. Jobs that can't reach
+    Deadline are always spooled, so they won't get lost.
+
+    If create_limits is True, the Deadline Limits of license limited
+    nodes are created when they don't exist yet. By default this is
+    set via the DEADLINE_SUBMISSION_CREATE_LIMITS environment variable.
     """
 
-    def __init__(self):
+    def __init__(self, background=False, spooled=False, create_limits=None):
         # Getting the current Nuke version to match the version
         # in Deadline
         self.nuke_version = "%i.%i" % (
@@ -36,8 +75,27 @@ class DeadlineSubmission:
         # If the node class is in the list, it will proceed submission
         self.supported_nodes = ["Write"]
 
-        # We need the deadline command path so we will get the environment
-        self.deadline_command = os.getenv("DEADLINE_PATH")
+        # Transport used to send the jobs to Deadline, this is either
+        # deadlinecommand or the Deadline Web Service
+        self.transport = transport.get_transport()
+
+        # Record the render times of the jobs when they are completed,
+        # so the auto render mode learns from them. The jobs are only
+        # polled until all jobs of this session are finished.
+        job_registry.get_poller(self.transport).add_listener(
+            render_tuning.get_recorder(self.transport), start=False
+        )
+
+        # Whether to submit in a worker thread instead of waiting
+        self.background = background
+
+        # Whether to add the jobs to the spool instead of submitting
+        self.spooled = spooled
+
+        # Whether to create missing Deadline Limits
+        if create_limits is None:
+            create_limits = limit_groups.create_limits_enabled()
+        self.create_limits = create_limits
 
     def submit_selected_node(self):
         """Submit the currently selected node to Deadline. No input needed.
@@ -67,6 +125,333 @@ class DeadlineSubmission:
         except Exception as error:
             nuke.critical("Something went wrong: %s" % str(error))
 
+    def submit_selected_nodes(self, grouped=False):
+        """Submit all currently selected nodes to Deadline. No input needed.
+
+        Every supported node will become its own job, but all jobs
+        are sent to Deadline in one deadlinecommand call. This saves
+        the startup time of deadlinecommand for every Write node.
+
+        If grouped is True, all nodes are rendered by a single job. Every
+        task then renders all nodes in one Nuke process, so the script is
+        loaded only once per task and the upstream nodes shared by the
+        Write nodes are computed only once.
+
+        Returns a dictionary with the node name as key and the
+        JobID as value. If a job failed, the value will be None.
+        When submitting in the background, the dictionary will be empty
+        as the JobIDs are not known yet.
+
+        If preview frames are enabled in the panel, every node gets a
+        preview job as well, added as "Write1 (preview)".
+        """
+        trace = self.__trace("submit_selected_nodes", grouped=grouped)
+
+        try:
+            with trace.activate():
+                return self.__submit_selected_nodes(trace, grouped)
+
+        # A submission in the background is finished by the queue
+        finally:
+            if not trace.queued:
+                trace.finish()
+
+    def __submit_selected_nodes(self, trace, grouped):
+        """Submit all selected nodes, see submit_selected_nodes()."""
+        job_ids = {}
+
+        try:
+            # Get all selected nodes that are supported
+            nodes = [
+                node
+                for node in nuke.selectedNodes()
+                if node.Class() in self.supported_nodes
+            ]
+            trace.set(write_count=len(nodes))
+
+            # If nothing supported is selected, let the user know
+            if not nodes:
+                nuke.critical(
+                    "No supported nodes selected."
+                    "\n"
+                    "Currently these nodes are supported:"
+                    "\n\n"
+                    "%s" % self.supported_nodes
+                )
+                return job_ids
+
+            # Validate every node via the SanityCheck script,
+            # if one of them fails the whole submission is aborted
+            sanity_checks = []
+            with trace.span("sanity_check"):
+                for node in nodes:
+                    sanity_check = SanityCheck().validate_script(node)
+                    if not sanity_check.get("validated"):
+                        return job_ids
+                    sanity_checks.append(sanity_check)
+
+            trace.set(
+                upstream_nodes=sum(
+                    len(sanity_check["upstream_index"])
+                    for sanity_check in sanity_checks
+                )
+            )
+
+            # Open the dialog once, the settings are used for all nodes
+            with trace.span("panel"):
+                submission_panel = panel.SubmissionPanel(
+                    nodes[0],
+                    sanity_checks[0]["upstream_index"],
+                    sanity_checks[0]["input_footprint"],
+                    repository_metadata.get_metadata(self.transport),
+                )
+                if not submission_panel.showModalDialog():
+                    return job_ids
+
+            # Create the submission parameters for every node, adding
+            # the node name to the submission name so jobs can be told apart
+            submission_name = submission_panel.submission_name.value()
+            jobs = []
+            for node, sanity_check in zip(nodes, sanity_checks):
+                with trace.span("submission_parameters"):
+                    submission_files = self.__get_submission_parameters(
+                        node,
+                        submission_panel,
+                        limit_groups=sanity_check.get("limit_groups"),
+                        upstream_index=sanity_check.get("upstream_index"),
+                        footprint=sanity_check.get("input_footprint"),
+                        snapshot=not grouped,
+                    )
+                submission_files["job_info"]["Name"] = "%s - %s" % (
+                    submission_name,
+                    node.name(),
+                )
+
+                # All frames of this node have already been rendered
+                if not submission_files["job_info"]["Frames"]:
+                    continue
+
+                jobs.append(submission_files)
+
+            # Nothing left to render
+            if not jobs:
+                nuke.message("All frames have already been rendered.")
+                return job_ids
+
+            node_names = [
+                job["plugin_info"]["WriteNode"] for job in jobs
+            ]
+
+            # Combine the jobs rendering the same frames into a single
+            # job, which will be linked to every node of it
+            if grouped:
+                scene_file = None
+
+                # The snapshot has to contain all Write nodes
+                if submission_panel.snapshot.value():
+                    scene_file = script_snapshot.create_snapshot(nodes)
+
+                jobs = self.__group_jobs_by_frames(
+                    jobs, submission_name, scene_file
+                )
+                node_names = [
+                    job["plugin_info"]["WriteNode"] for job in jobs
+                ]
+
+            # Render the key frames of every job first, in their own jobs
+            if submission_panel.preview_first.value():
+                jobs, node_names = self.__split_preview_jobs(jobs)
+
+            # Ask before rendering the same frames again
+            with trace.span("duplicates"):
+                skipped = self.__skip_duplicates(jobs)
+            jobs = [
+                job for index, job in enumerate(jobs) if index not in skipped
+            ]
+            node_names = [
+                name
+                for index, name in enumerate(node_names)
+                if index not in skipped
+            ]
+            if not jobs:
+                return job_ids
+
+            trace.set(job_count=len(jobs))
+
+            # Create the Limits of the license limiting nodes
+            job_limits = {}
+            for sanity_check in sanity_checks:
+                job_limits.update(sanity_check.get("limit_groups") or {})
+            self.__ensure_limit_groups(job_limits)
+
+            # Add the jobs to the spool, they will be submitted
+            # in a batch with the other spooled jobs
+            if self.spooled:
+                with trace.span("spool"):
+                    self.__spool(jobs)
+                return job_ids
+
+            # Submit all jobs at once in a worker thread, the result is
+            # shown to the user when Deadline answered
+            if self.background:
+                submission_queue.get_submission_queue(self.transport).submit(
+                    jobs,
+                    callback=lambda submission: self.__multiple_submitted(
+                        node_names, submission
+                    ),
+                )
+                return job_ids
+
+            # Submit all jobs at once
+            with trace.span("transport"):
+                submission = self.__submit_multiple_to_deadline(jobs)
+            job_ids = self.__multiple_submitted(node_names, submission)
+
+        # If anything happens during the execution of this script,
+        # let the user know
+        except Exception as error:
+            nuke.critical("Something went wrong: %s" % str(error))
+
+        return job_ids
+
+    @classmethod
+    def __group_jobs_by_frames(cls, jobs, submission_name, scene_file=None):
+        """
+        Combine the jobs rendering the same frames into a single job, so
+        no Write node renders frames outside of its own frames.
+
+        Returns a job for every distinct frame list. If there is more
+        than one, the Write nodes are added to the submission name.
+        """
+        frame_groups = {}
+        for job in jobs:
+            frame_groups.setdefault(job["job_info"]["Frames"], []).append(job)
+
+        grouped_jobs = []
+        for frame_jobs in frame_groups.values():
+            name = submission_name
+            if len(frame_groups) > 1:
+                name = "%s - %s" % (
+                    submission_name,
+                    ", ".join(
+                        job["plugin_info"]["WriteNode"] for job in frame_jobs
+                    ),
+                )
+            grouped_jobs.append(
+                cls.__group_jobs(frame_jobs, name, scene_file)
+            )
+
+        return grouped_jobs
+
+    @staticmethod
+    def __group_jobs(jobs, submission_name, scene_file=None):
+        """
+        Combine the submission parameters of multiple jobs into a single
+        job rendering all Write nodes.
+
+        The settings of the first job are used, the frames are the
+        frames of all jobs combined. Every Write node gets its own
+        output directory and file name, so Deadline can show all outputs.
+
+        If provided, the scene_file replaces the script of the jobs.
+        """
+        job_info = dict(jobs[0]["job_info"])
+        plugin_info = dict(jobs[0]["plugin_info"])
+
+        if scene_file is not None:
+            plugin_info["SceneFile"] = scene_file
+
+        job_info["Name"] = submission_name
+
+        # Render the frames needed by any of the Write nodes
+        frames = set()
+        for job in jobs:
+            frames.update(parse_frame_list(job["job_info"]["Frames"]))
+        job_info["Frames"] = compact_frame_list(frames)
+
+        # Add the output of every Write node
+        for index, job in enumerate(jobs):
+            job_info["OutputDirectory%i" % index] = job["job_info"].get(
+                "OutputDirectory0"
+            )
+            job_info["OutputFilename%i" % index] = job["job_info"].get(
+                "OutputFilename0"
+            )
+
+        # Nuke renders multiple Write nodes when separated with a comma
+        plugin_info["WriteNode"] = ",".join(
+            job["plugin_info"]["WriteNode"] for job in jobs
+        )
+
+        # The job needs the Limits of all Write nodes
+        job_limits = set()
+        for job in jobs:
+            job_limits.update(
+                name
+                for name in job["job_info"].get("LimitGroups", "").split(",")
+                if name
+            )
+        job_info.pop("LimitGroups", None)
+        if job_limits:
+            job_info["LimitGroups"] = ",".join(sorted(job_limits))
+
+        return {
+            "job_info": job_info,
+            "plugin_info": plugin_info,
+        }
+
+    @staticmethod
+    def __split_preview_jobs(jobs):
+        """
+        Split every job into a preview job and a fill job.
+
+        Returns the new jobs, and a name for every job based on its
+        Write nodes. The names of the preview jobs end in (preview).
+        """
+        split_jobs = []
+        names = []
+
+        for job in jobs:
+            for index, split_job in enumerate(preview_jobs(job)):
+                name = split_job["plugin_info"]["WriteNode"]
+                if index == 0:
+                    name = "%s (preview)" % name
+
+                split_jobs.append(split_job)
+                names.append(name)
+
+        return split_jobs, names
+
+    @staticmethod
+    def __multiple_submitted(node_names, submission):
+        """
+        Link every JobID of a multiple job submission to the submitted
+        node and give the user the submission result.
+
+        If a grouped job has been submitted for multiple nodes, every
+        node is linked to the same JobID.
+
+        Returns a dictionary with the node name as key and the JobID
+        as value.
+        """
+        job_ids = {}
+        for name, job_id in zip(node_names, submission.get("job_ids")):
+            # A grouped job renders all of its Write nodes
+            name, suffix = re.match(r"^(.*?)( \(preview\))?$", name).groups()
+            for node_name in name.split(","):
+                job_ids[node_name + (suffix or "")] = job_id
+
+        # Give user submission result
+        nuke.message(
+            "\n".join(
+                "%s: %s" % (name, job_id or "Failed")
+                for name, job_id in job_ids.items()
+            )
+            or submission.get("output")
+        )
+
+        return job_ids
+
     def submit(self, node):
         """Submit functionality to Deadline. Requires a node input.
 
@@ -74,39 +459,384 @@ class DeadlineSubmission:
         the user a submission dialog.
 
         If submission proceeded, create submission files and
-        submit via the __submit_to_deadline() function."""
+        submit via the __submit_to_deadline() function. When submitting
+        in the background, the submission queue is used instead."""
+        trace = self.__trace("submit", write_count=1)
+
+        try:
+            with trace.activate():
+                self.__submit(node, trace)
+
+        # A submission in the background is finished by the queue
+        finally:
+            if not trace.queued:
+                trace.finish()
+
+    def __submit(self, node, trace):
+        """Submit the node to Deadline, see submit()."""
 
         # Validate via SanityCheck script
-        sanity_check = SanityCheck().validate_script(node)
+        with trace.span("sanity_check"):
+            sanity_check = SanityCheck().validate_script(node)
 
         # If validated, proceed
         validated = sanity_check.get("validated")
         if validated:
+            trace.set(upstream_nodes=len(sanity_check["upstream_index"]))
 
-            # If there is a license limit, it will return a integer,
-            # otherwise None
-            license_limit = sanity_check.get("license_limit")
+            # The Deadline Limits of the license limiting nodes
+            # and their amount of licenses
+            job_limits = sanity_check.get("limit_groups")
 
             # Open the dialog for submission
-            submission_panel = panel.SubmissionPanel(node)
+            with trace.span("panel"):
+                submission_panel = panel.SubmissionPanel(
+                    node,
+                    sanity_check["upstream_index"],
+                    sanity_check["input_footprint"],
+                    repository_metadata.get_metadata(self.transport),
+                )
+                submitted = submission_panel.showModalDialog()
 
             # If user submitted, proceed
-            if submission_panel.showModalDialog():
+            if submitted:
+
+                # Submit the upstream Write nodes as jobs this job waits on
+                if submission_panel.upstream_writes.value():
+                    self.__submit_with_upstream_writes(node, submission_panel)
+                    return
 
                 # Create dictionaries containing all submission parameters
-                submission_files = self.__get_submission_parameters(
-                    node, submission_panel, license_limit=license_limit
-                )
+                with trace.span("submission_parameters"):
+                    submission_files = self.__get_submission_parameters(
+                        node,
+                        submission_panel,
+                        limit_groups=job_limits,
+                        upstream_index=sanity_check["upstream_index"],
+                        footprint=sanity_check["input_footprint"],
+                    )
+
+                # All frames have already been rendered
+                if not submission_files["job_info"]["Frames"]:
+                    nuke.message("All frames have already been rendered.")
+                    return
+
+                # Render the key frames first, in a preview job
+                jobs = [submission_files]
+                if submission_panel.preview_first.value():
+                    jobs = preview_jobs(submission_files)
+
+                # Ask before rendering the same frames again
+                with trace.span("duplicates"):
+                    skipped = self.__skip_duplicates(jobs)
+                jobs = [
+                    job
+                    for index, job in enumerate(jobs)
+                    if index not in skipped
+                ]
+                if not jobs:
+                    return
+
+                trace.set(job_count=len(jobs))
+
+                # Create the Limits of the license limiting nodes
+                self.__ensure_limit_groups(job_limits)
+
+                # Add the job to the spool, it will be submitted
+                # in a batch with the other spooled jobs
+                if self.spooled:
+                    with trace.span("spool"):
+                        self.__spool(jobs)
+                    return
+
+                # Send the job in a worker thread, the user
+                # will get the result when Deadline answered
+                if self.background:
+                    submission_queue.get_submission_queue(
+                        self.transport
+                    ).submit(
+                        jobs,
+                        callback=lambda submission: nuke.message(
+                            submission.get("output")
+                        ),
+                    )
+                    return
 
                 # Create submission files (job_info.txt and plugin_info.txt)
                 # and submit to deadline
-                submission = self.__submit_to_deadline(submission_files)
+                with trace.span("transport"):
+                    if len(jobs) == 1:
+                        submission = self.__submit_to_deadline(jobs[0])
+                    else:
+                        submission = self.__submit_multiple_to_deadline(
+                            jobs
+                        ).get("output")
 
                 # Give user submission result
                 nuke.message(submission)
 
+    def submit_selected_wedge(self):
+        """Submit the selected Write node as a wedge to Deadline. The knob,
+        values and frame of the wedge are asked in a dialog."""
+        # If there are any errors, throw them into an exception
+        # so the user knows
+        try:
+            node = nuke.selectedNode()
+
+            # Validate if node is a supported one
+            if node.Class() not in self.supported_nodes:
+                nuke.critical(
+                    "This node is unfortunately not supported."
+                    "\n"
+                    "Currently these nodes are supported:"
+                    "\n\n"
+                    "%s" % self.supported_nodes
+                )
+                return
+
+            wedge_panel = panel.WedgePanel(node)
+            if not wedge_panel.showModalDialog():
+                return
+
+            self.submit_wedge(
+                node,
+                wedge_panel.wedge_knob.value(),
+                wedge.parse_values(wedge_panel.values.value()),
+                frame=wedge_panel.frame.value(),
+                priority=wedge_panel.priority.value(),
+                name=wedge_panel.submission_name.value(),
+            )
+
+        # If anything happens during the execution of this script,
+        # for example no node has been selected, let the user know
+        except Exception as error:
+            nuke.critical("Something went wrong: %s" % str(error))
+
+    def submit_wedge(
+        self, node, knob, values, frame=None, priority=70, name=None
+    ):
+        """
+        Submit the Write node as a wedge: a single job rendering the frame
+        once for every value of the knob (for example "Defocus1.size"),
+        one task per value. The script is therefore loaded by one job
+        instead of a job per value.
+
+        Every task renders to its own wedge output, the values and
+        outputs are written to a manifest next to them. The user is told
+        when all tasks of the wedge are done.
+
+        The frame defaults to the current frame. Returns the JobID of
+        the wedge job, or None if it wasn't submitted.
+        """
+        trace = self.__trace("submit_wedge", write_count=1)
+
+        try:
+            with trace.activate():
+                return self.__submit_wedge(
+                    node, knob, values, frame, priority, name, trace
+                )
+        finally:
+            trace.finish()
+
+    def __submit_wedge(self, node, knob, values, frame, priority, name, trace):
+        """Submit the wedge to Deadline, see submit_wedge()."""
+
+        # Validate via SanityCheck script
+        with trace.span("sanity_check"):
+            sanity_check = SanityCheck().validate_script(node)
+
+        if not sanity_check.get("validated"):
+            return None
+
+        # The knob has to exist before the farm renders it
+        node_name, _, knob_name = knob.rpartition(".")
+        wedge_node = nuke.toNode(node_name) if node_name else None
+        if wedge_node is None or wedge_node.knob(knob_name) is None:
+            nuke.critical("The knob %s doesn't exist." % knob)
+            return None
+
+        if not values:
+            nuke.critical("No values have been provided for the wedge.")
+            return None
+
+        if frame is None:
+            frame = nuke.frame()
+
+        script_path = nuke.root().name()
+        job_limits = sanity_check.get("limit_groups")
+        trace.set(
+            upstream_nodes=len(sanity_check["upstream_index"]),
+            wedge_values=len(values),
+        )
+
+        # Every task renders a single frame, so only the
+        # concurrent tasks have to fit in the memory of a worker
+        concurrent_tasks, _ = render_mode_settings("light")
+        concurrent_tasks, _ = memory_budget.fit_render_settings(
+            node, sanity_check["upstream_index"], concurrent_tasks, 1
+        )
+
+        with trace.span("submission_parameters"):
+            wedge_settings = wedge.wedge_settings(
+                node.fullName(),
+                node.knob("file").value(),
+                knob,
+                values,
+                frame,
+            )
+
+            # The job renders a script in which every frame renders a
+            # value, so the tasks never render the normal output
+            try:
+                scene_file = wedge.create_wedge_script(
+                    wedge_settings, script_path
+                )
+            except Exception as error:
+                nuke.critical(
+                    "The wedge script could not be created: %s" % str(error)
+                )
+                return None
+
+            submission_parameters = wedge_job(
+                build_submission_parameters(
+                    script_path,
+                    node.fullName(),
+                    node.knob("file").value(),
+                    str(frame),
+                    name or "%s (wedge)" % knob,
+                    self.nuke_version,
+                    priority=priority,
+                    concurrent_tasks=concurrent_tasks,
+                    chunk_size=1,
+                    limit_groups=job_limits,
+                    scene_file=scene_file,
+                    extra_info={
+                        "Wedge": "%s at frame %i" % (knob, int(frame))
+                    },
+                ),
+                wedge_settings,
+            )
+
+        # Ask before rendering the same wedge again
+        with trace.span("duplicates"):
+            skipped = self.__skip_duplicates([submission_parameters])
+        if skipped:
+            return skipped[0]
+
+        trace.set(job_count=1)
+
+        # Create the Limits of the license limiting nodes
+        self.__ensure_limit_groups(job_limits)
+
+        with trace.span("transport"):
+            submission = self.__submit_multiple_to_deadline(
+                [submission_parameters]
+            )
+        job_id = submission["job_ids"][0]
+
+        # Match the outputs to their values, this should
+        # never fail the submission
+        try:
+            wedge.write_manifest(wedge_settings, job_id)
+        except OSError:
+            pass
+
+        # Let the user know when the whole sweep is done
+        if job_id:
+            wedge.notify_when_done(job_id, knob, self.transport)
+
+        nuke.message(submission["output"])
+
+        return job_id
+
+    def __skip_duplicates(self, jobs):
+        """
+        Check if identical jobs have already been submitted, and ask the
+        user whether to submit them again.
+
+        Returns a dictionary with the index of every job to leave out as
+        key, and the JobID of the earlier job as value. If the user
+        submits them again, the dictionary is empty. Any error in the
+        check won't block the submission.
+        """
+        try:
+            duplicate_jobs = duplicates.find_duplicates(jobs, self.transport)
+        except Exception as error:
+            nuke.tprint("Could not check for duplicate jobs: %s" % error)
+            return {}
+
+        telemetry.current().set(duplicates=len(duplicate_jobs))
+
+        if not duplicate_jobs or nuke.ask(
+            "These jobs have already been submitted:"
+            "\n%s"
+            "\n\n"
+            "Would you like to submit them again?"
+            % "\n".join(
+                "%s (%s, %s)"
+                % (duplicate["name"], duplicate["job_id"], duplicate["status"])
+                for duplicate in duplicate_jobs
+            )
+        ):
+            return {}
+
+        earlier_ids = dict(
+            (id(duplicate["job"]), duplicate["job_id"])
+            for duplicate in duplicate_jobs
+        )
+        return dict(
+            (index, earlier_ids[id(job)])
+            for index, job in enumerate(jobs)
+            if id(job) in earlier_ids
+        )
+
+    def __ensure_limit_groups(self, job_limits):
+        """
+        Create the Deadline Limits that don't exist yet, if enabled.
+
+        If the Limits can't be created the submission continues, so
+        the jobs still end up in Deadline.
+        """
+        if not self.create_limits or not job_limits:
+            return
+
+        try:
+            with telemetry.span("limit_groups"):
+                created = limit_groups.ensure_limit_groups(
+                    self.transport, job_limits
+                )
+            if created:
+                nuke.tprint(
+                    "Created the Deadline Limits: %s" % ", ".join(created)
+                )
+        except Exception as error:
+            nuke.tprint("Could not create the Deadline Limits: %s" % error)
+
+    def __trace(self, name, **fields):
+        """Create the telemetry trace of a submission."""
+        if self.spooled:
+            mode = "spooled"
+        elif self.background:
+            mode = "background"
+        else:
+            mode = "blocking"
+
+        return telemetry.Trace(
+            name,
+            mode=mode,
+            transport=type(self.transport).__name__,
+            nuke_version=self.nuke_version,
+            **fields
+        )
+
     def __get_submission_parameters(
-        self, node, submission_panel, license_limit=None
+        self,
+        node,
+        submission_panel,
+        limit_groups=None,
+        upstream_index=None,
+        footprint=None,
+        snapshot=True,
     ):
         """
         Create dictionaries containing all submission parameters
@@ -131,179 +861,488 @@ class DeadlineSubmission:
                 "SceneFile": "/example/path/ExampleScript.nk",
             },
         }
-        """
-        # Calculating concurrent tasks and chunk size
-        render_mode = submission_panel.render_mode.value()
-        render_mode = self.__render_mode(render_mode)
-        concurrent_tasks = render_mode[0]
-        chunk_size = render_mode[1]
 
-        # Get extra parameters
-        file_path = node.knob("file").value()
-        file_directory = os.path.dirname(file_path)
-        file_name = os.path.basename(file_path)
+        If a pruned script is enabled in the panel, the SceneFile
+        will be the path of the snapshot instead. Set snapshot to False
+        if the snapshot is created for multiple nodes by the caller.
+
+        If the upstream index is provided, the chunks are fitted to the
+        time based nodes and the tasks to the memory of a worker. The
+        input footprint is added to the extra info of the job if it has
+        been scanned already, and if enabled in the panel the inputs are
+        localized by every task.
 
+        If profiling is enabled in the panel, every task writes the time
+        spent in every node to a nuke_profiles folder next to the output.
+
+        The Pool, Group and machine limit chosen in the panel are only
+        set if chosen, the chosen Limit is added to the license Limits.
+
+        The dictionaries are created by build_submission_parameters(),
+        which is shared with the bulk submitter.
+        """
         # Get script path
         script_path = nuke.root().name()
 
-        # Getting job submission parameters
-        job_info = {}
-        job_info["Plugin"] = "Nuke"
-        job_info["Frames"] = submission_panel.framerange.value()
-        job_info["Priority"] = submission_panel.priority.value()
-        job_info["Name"] = submission_panel.submission_name.value()
-        job_info["Department"] = "2D"
-        job_info["ConcurrentTasks"] = concurrent_tasks
-        job_info["ChunkSize"] = chunk_size
-        job_info["OutputDirectory0"] = file_directory
-        job_info["OutputFilename0"] = file_name
-
-        # Getting plugin submission parameters
-        plugin_info = {}
-        plugin_info["Version"] = self.nuke_version
-        plugin_info["WriteNode"] = node.name()
-        plugin_info["SceneFile"] = script_path
-
-        # If license_limit is not None, add it to the dictionary
-        if license_limit:
-            plugin_info["LicenseLimit"] = license_limit
-
-        # Create dictionary containing both dictionaries
-        submission_files = {
-            "job_info": job_info,
-            "plugin_info": plugin_info,
-        }
+        # Calculating concurrent tasks and chunk size
+        concurrent_tasks, chunk_size = render_mode_settings(
+            submission_panel.render_mode.value(),
+            script_path,
+            node.fullName(),
+            submission_panel.framerange.value(),
+        )
 
-        return submission_files
+        # Only render the frames that haven't been rendered yet
+        frames = submission_panel.framerange.value()
+        if submission_panel.missing_frames.value():
+            frames = self.__missing_frames(node, frames, script_path)
+
+        # Fit the chunks to time based nodes, and the tasks to memory
+        extra_info = None
+        if upstream_index is not None:
+            fitted = fit_to_node_graph(
+                node,
+                upstream_index,
+                frames,
+                concurrent_tasks,
+                chunk_size,
+                footprint=input_footprint.scanned(footprint),
+            )
+            frames = fitted["frames"]
+            concurrent_tasks = fitted["concurrent_tasks"]
+            chunk_size = fitted["chunk_size"]
+            extra_info = fitted["extra_info"]
+
+        # Render a snapshot only containing the nodes needed by the node
+        scene_file = None
+        if snapshot and submission_panel.snapshot.value():
+            scene_file = script_snapshot.create_snapshot(node, script_path)
+
+        # Machines and Limit chosen in the panel, "none" leaves them
+        # to the defaults of the repository
+        pool, group, limit = (
+            knob.value() if knob.value() != "none" else None
+            for knob in (
+                submission_panel.pool,
+                submission_panel.group,
+                submission_panel.limit,
+            )
+        )
 
-    def __submit_to_deadline(self, submission_parameters):
+        # The chosen Limit is taken next to the license Limits
+        if limit:
+            limit_groups = set(limit_groups or ()) | {limit}
+
+        submission_parameters = build_submission_parameters(
+            script_path,
+            node.fullName(),
+            node.knob("file").value(),
+            frames,
+            submission_panel.submission_name.value(),
+            self.nuke_version,
+            priority=submission_panel.priority.value(),
+            concurrent_tasks=concurrent_tasks,
+            chunk_size=chunk_size,
+            limit_groups=limit_groups,
+            scene_file=scene_file,
+            extra_info=extra_info,
+            department=submission_panel.department.value(),
+            pool=pool,
+            group=group,
+            machine_limit=submission_panel.machine_limit.value(),
+        )
+
+        # Copy the input frames to the worker before every task
+        localize = submission_panel.localize_inputs.value()
+        if upstream_index is not None and localize:
+            localize_inputs(
+                submission_parameters,
+                input_footprint.input_files(upstream_index),
+                fitted["reach"],
+            )
+
+        # Write the time spent in every node next to the output
+        if submission_panel.profile.value():
+            profile_render(submission_parameters)
+
+        return submission_parameters
+
+    def __submit_with_upstream_writes(self, node, submission_panel):
+        """
+        Submit the node together with all Write nodes upstream of it.
+
+        Every Write node becomes its own job, depending on the jobs of
+        the Write nodes feeding it. Precomps that don't depend on each
+        other will therefore render in parallel. If there are no time
+        changing nodes in between, the job is made frame dependent, so
+        a frame can start as soon as the same frame of its
+        dependencies is done.
+
+        The upstream Write nodes need to read their rendered files,
+        otherwise the last job will still compute every precomp itself.
+        Every job only gets the Deadline Limits of the nodes it renders.
         """
-        This function will create using the provided submission
-        dictionary both the job_info.txt file and plugin_info.txt.
-        This will be done in a temporary directory.
+        with telemetry.span("write_dependency_layers"):
+            layers = self.__write_dependency_layers(node)
+
+        # Ask to read the rendered files of the upstream Write nodes
+        not_reading = [
+            write
+            for layer in layers[:-1]
+            for write, _, _ in layer
+            if write.knob("reading") is not None
+            and not write.knob("reading").value()
+        ]
+        reading = not not_reading
+        if not_reading and nuke.ask(
+            "These upstream Write nodes don't read their rendered files:"
+            "\n%s"
+            "\n\n"
+            "Would you like to enable 'read file' on them, so the next "
+            "jobs use the rendered precomps?"
+            % ", ".join(write.fullName() for write in not_reading)
+        ):
+            for write in not_reading:
+                write.knob("reading").setValue(True)
+            nuke.scriptSave()
+            reading = True
+
+        # A job reading the precomps doesn't need their licenses
+        stop_classes = ["Write"] if reading else []
+        all_limits = {}
+
+        # Create the submission parameters for every Write node
+        submission_name = submission_panel.submission_name.value()
+        job_layers = []
+        for layer in layers:
+            jobs = []
+            for write, dependencies, frame_dependent in layer:
+                write_index = UpstreamIndex(write, stop_classes=stop_classes)
+                write_limits = SanityCheck().limit_groups(write_index)
+                all_limits.update(write_limits)
+                submission_files = self.__get_submission_parameters(
+                    write,
+                    submission_panel,
+                    limit_groups=write_limits,
+                    upstream_index=write_index,
+                )
 
-        After the creation of these files, we call the deadlinecommand
-        and submit the job to Deadline.
+                # All frames of this node have already been rendered
+                if not submission_files["job_info"]["Frames"]:
+                    continue
 
+                submission_files["job_info"]["Name"] = "%s - %s" % (
+                    submission_name,
+                    write.fullName(),
+                )
+                if frame_dependent:
+                    submission_files["job_info"]["IsFrameDependent"] = True
+
+                dependency_names = [
+                    dependency.fullName() for dependency in dependencies
+                ]
+
+                # Render the key frames of the node itself first
+                if (
+                    write.fullName() == node.fullName()
+                    and submission_panel.preview_first.value()
+                ):
+                    split_jobs, names = self.__split_preview_jobs(
+                        [submission_files]
+                    )
+                    for name, split_job in zip(names, split_jobs):
+                        jobs.append((name, dependency_names, split_job))
+                    continue
+
+                jobs.append(
+                    (write.fullName(), dependency_names, submission_files)
+                )
+            job_layers.append(jobs)
+
+        # Ask before rendering the same frames again. The jobs depending
+        # on a job that is left out wait on the earlier job instead.
+        all_jobs = [job for jobs in job_layers for job in jobs]
+        with telemetry.span("duplicates"):
+            skipped = self.__skip_duplicates(
+                [submission_files for _, _, submission_files in all_jobs]
+            )
+        earlier_ids = dict(
+            (all_jobs[index][0], job_id) for index, job_id in skipped.items()
+        )
+        job_layers = [
+            [job for job in jobs if job[0] not in earlier_ids]
+            for jobs in job_layers
+        ]
+
+        node_names = [name for jobs in job_layers for name, _, _ in jobs]
+        telemetry.current().set(job_count=len(node_names))
+
+        # Create the Limits of the license limiting nodes
+        if node_names:
+            self.__ensure_limit_groups(all_limits)
+
+        # Nothing left to render
+        if not node_names:
+            if not earlier_ids:
+                nuke.message("All frames have already been rendered.")
+            return
+
+        # Submit the layers in a worker thread, the result is
+        # shown to the user when Deadline answered
+        if self.background:
+            submission_queue.get_submission_queue(self.transport).run(
+                self.__submit_job_layers,
+                job_layers,
+                earlier_ids,
+                callback=lambda submission: self.__multiple_submitted(
+                    node_names, submission
+                ),
+            )
+            return
+
+        with telemetry.span("transport"):
+            submission = self.__submit_job_layers(job_layers, earlier_ids)
+        self.__multiple_submitted(node_names, submission)
+
+    @staticmethod
+    def __write_dependency_layers(node):
+        """
+        Find all Write nodes upstream of the node, and sort them in
+        layers. The first layer contains the Write nodes without
+        upstream Write nodes, every next layer only depends on the
+        layers before it. The last layer contains the node itself.
+
+        Every item in a layer is a tuple containing the Write node, the
+        nearest upstream Write nodes and whether the job can be
+        frame dependent.
         """
+        dependencies = {}
+        writes = {}
+        frame_dependent = {}
+
+        # Find the nearest upstream Write nodes of every Write node
+        stack = [node]
+        while stack:
+            write = stack.pop()
+            if write.fullName() in dependencies:
+                continue
+
+            index = UpstreamIndex(write, stop_classes=["Write"])
+            upstream_writes = [
+                upstream
+                for upstream in index.nodes_of_class("Write")
+                if upstream.fullName() != write.fullName()
+            ]
 
-        # First we will create the necessary files to submit
-        # These are the job_info.txt and plugin_info.txt
-        # After submitting these files Deadline will understand the submission
+            writes[write.fullName()] = write
+            dependencies[write.fullName()] = upstream_writes
+            frame_dependent[write.fullName()] = bool(upstream_writes) and (
+                not TIME_NODE_CLASSES.intersection(index.classes)
+            )
+            stack.extend(upstream_writes)
+
+        # The layer of a Write node is one after its latest dependency
+        levels = {}
+
+        def level(name):
+            if name not in levels:
+                levels[name] = 1 + max(
+                    [
+                        level(dependency.fullName())
+                        for dependency in dependencies[name]
+                    ]
+                    or [-1]
+                )
+            return levels[name]
 
-        submission_files = []
+        layers = [[] for _ in range(level(node.fullName()) + 1)]
+        for name in dependencies:
+            layers[level(name)].append(
+                (writes[name], dependencies[name], frame_dependent[name])
+            )
 
-        # Setting initial message in case something went wrong
-        # We will change this variable if submission succeeded
-        result = "Something went wrong"
+        return layers
 
-        # Create temporary directory for submission text files
-        temporary_directory = tempfile.mkdtemp()
+    def __submit_job_layers(self, job_layers, earlier_ids=None):
+        """
+        Submit the layers of jobs, one transport call per layer. The
+        JobIDs of a layer are added to the JobDependencies of the jobs
+        in the next layers. The earlier_ids contain the JobID of jobs
+        that have already been submitted by name, the jobs depending on
+        them wait on these.
 
-        # We run the code within a try and except to
-        # catch any exceptions and give them to the user
-        try:
+        If a job failed, the jobs depending on it are not submitted.
 
-            # Iterating through the provided dictionary, and get
-            # the created dictionaries inside.
-            for submission_info in submission_parameters.keys():
+        Returns the same dictionary as the transport, with the job_ids
+        in the order of all jobs in the layers.
+        """
+        job_ids = dict(earlier_ids or {})
+        output = []
+
+        for jobs in job_layers:
+            submit_names = []
+            submit_jobs = []
+
+            for name, dependencies, submission_files in jobs:
+                # Skipped dependencies don't have to be waited on
+                dependency_ids = [
+                    job_ids[dependency]
+                    for dependency in dependencies
+                    if dependency in job_ids
+                ]
+
+                # A dependency failed, so this job would never start
+                if None in dependency_ids:
+                    job_ids[name] = None
+                    output.append("%s: skipped, a dependency failed" % name)
+                    continue
+
+                if dependency_ids:
+                    submission_files["job_info"]["JobDependencies"] = ",".join(
+                        dependency_ids
+                    )
+
+                submit_names.append(name)
+                submit_jobs.append(submission_files)
+
+            if not submit_jobs:
+                continue
+
+            try:
+                submission = self.transport.submit(submit_jobs)
+                job_ids.update(zip(submit_names, submission.get("job_ids")))
+                job_registry.register(submit_jobs, submission.get("job_ids"))
+                output.append(submission.get("output"))
+
+            # Without JobIDs the next layers can't be submitted
+            except transport.TransportError as error:
+                job_ids.update((name, None) for name in submit_names)
+                output.append(str(error))
+
+        return {
+            "output": "\n".join(output),
+            "job_ids": [
+                job_ids.get(name)
+                for jobs in job_layers
+                for name, _, _ in jobs
+            ],
+        }
 
-                # Get the parameters for the specified dictionary
-                # (for example job_info)
-                info_parameters = submission_parameters.get(submission_info)
+    @staticmethod
+    def __missing_frames(node, frame_range, script_path):
+        """
+        Return a compact frame list with the frames of the frame range
+        that still need to be rendered by the node.
 
-                # Create the path for the info_file.txt, for example
-                # path/to/temporarydirectory/job_info.txt
-                info_file = os.path.join(
-                    temporary_directory,
-                    submission_info + ".txt",
-                )
+        A frame needs to be rendered if the output is missing, empty
+        or older than the script. If everything has been rendered, an
+        empty string is returned.
+        """
+        frames = parse_frame_list(frame_range)
 
-                # Fix for Windows backward slashes systems
-                info_file = info_file.replace(os.sep, "/")
+        # Expressions in the file knob are evaluated,
+        # but the frame number pattern is kept
+        file_path = nuke.filename(node)
 
-                # Create a text file
-                info_file_txt = open(info_file, "w", encoding="utf-8")
+        # A single file (for example a movie) can't be checked per frame
+        if not sequence_scanner.is_sequence(file_path):
+            return frame_range
 
-                # Iterate through the dictionary for every key
-                for parameter in info_parameters.keys():
+        script_modified = None
+        if os.path.isfile(script_path):
+            script_modified = os.path.getmtime(script_path)
 
-                    # Get the value per parameter
-                    value = info_parameters.get(parameter)
+        missing_frames = sequence_scanner.missing_frames(
+            file_path, frames, newer_than=script_modified
+        )
 
-                    # Write the key and value and create a new line
-                    # For example:
-                    # Plugin=Nuke (key=value)
-                    info_file_txt.write(parameter + "=" + str(value) + "\n")
+        return compact_frame_list(missing_frames)
 
-                # Close the file to write parameters
-                info_file_txt.close()
+    def __submit_to_deadline(self, submission_parameters):
+        """
+        This function will send the provided submission dictionary
+        to Deadline using the configured transport.
 
-                # Add the created text file to the list for submission
-                submission_files.append(info_file)
+        When using deadlinecommand both the job_info.txt file and
+        plugin_info.txt are created in a temporary directory. The
+        Deadline Web Service receives the dictionaries directly.
 
-            # Create the command for calling deadline
-            deadline_command = [
-                os.path.join(self.deadline_command, "deadlinecommand")
-            ]
+        Returns the submission output as a string, or the error
+        if something went wrong.
+        """
 
-            # Append the text files for the submission parameters
-            deadline_command = deadline_command + submission_files
+        # Setting initial message in case something went wrong
+        # We will change this variable if submission succeeded
+        result = "Something went wrong"
 
-            # Create a subprocess using deadlinecommand and run the submission
-            submission = check_output(deadline_command)
+        # We run the code within a try and except to
+        # catch any exceptions and give them to the user
+        try:
+            # If Deadline can't be reached, the job is spooled
+            submission = spool.submit_or_spool(
+                self.transport, [submission_parameters]
+            )
 
-            # Return the command output so the user
+            # Return the output so the user
             # will get the submission information
-            result = str(submission)
+            result = submission.get("output")
 
         # If there is an error, return the error
         # so the user knows
         except Exception as error:
             result = str(error)
 
-        # Always remove the created temporary directory
-        finally:
-            rmtree(temporary_directory)
-
         return result
 
-    @staticmethod
-    def __render_mode(render_mode):
-        """This function will calculate the
-        concurrent tasks and the chunk size provided by the
-        mode knob in the submission panel.
+    def __submit_multiple_to_deadline(self, jobs):
+        """
+        Submit multiple jobs at once using the configured transport.
 
-        There are 3 modes: light, medium, heavy
+        Every item in the jobs list is a dictionary as created by
+        __get_submission_parameters(). When using deadlinecommand,
+        all jobs are submitted with a single call.
 
-        Light will render 3 tasks on the same machine simultaneously, with
-        each 10 frames. (So a total of 30 frames)
+        Will return a dictionary:
+            {
+                "output": "Submission output",
+                "job_ids": ["63a1...", None],
+            }
 
-        Medium will render 2 tasks on the same machine at the same time, each
-        rendering 5 frames (So a total of 10 frames)
+        The job_ids list has the same order as the provided jobs,
+        if a job failed its JobID will be None.
+        """
 
-        Heavy will render 1 task at a time, each with 1 frame.
+        # Setting initial result in case something went wrong
+        result = {
+            "output": "Something went wrong",
+            "job_ids": [None] * len(jobs),
+        }
 
-        By using the concurrent tasks and chunk size, a lot more ram and
-        computational power can be used while rendering, thus providing
-        faster render times.
+        try:
+            # If Deadline can't be reached, the jobs are spooled
+            result = spool.submit_or_spool(self.transport, jobs)
 
-        """
+        # If there is an error, return the error
+        # so the user knows
+        except Exception as error:
+            result["output"] = str(error)
 
-        # Setting initial values, used for heavy renders
-        concurrent_tasks = 1
-        chunk_size = 1
+        return result
 
-        # If render mode is light, change concurrent to
-        # 10 frames per time, with 3 tasks at the same time
-        if render_mode == "light":
-            concurrent_tasks = 10
-            chunk_size = 3
+    def __spool(self, jobs):
+        """
+        Add the jobs to the spool and schedule a flush, so all jobs
+        spooled in the meantime are sent to Deadline in one batch.
+        """
+        submission_spool = spool.get_spool()
+
+        for submission_parameters in jobs:
+            submission_spool.add(submission_parameters)
 
-        # If render mode is medium, concurrent tasks is 5
-        # while rendering 2 tasks at the same time.
-        elif render_mode == "medium":
-            concurrent_tasks = 5
-            chunk_size = 2
+        submission_spool.schedule_flush(self.transport)
 
-        return concurrent_tasks, chunk_size
+        nuke.message(
+            "%i job(s) added to the spool."
+            "\n"
+            "They will be submitted to Deadline in the next batch." % len(jobs)
+        )
@@ -0,0 +1,236 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to find jobs that have already been submitted.
+
+Every submitted job gets a fingerprint, made of the content of the
+script it renders, the Write node, the frames and the output paths.
+The fingerprints are stored locally with their JobID, so submitting
+the same job again (for example pressing F5 twice, or resubmitting an
+unchanged script) can be detected before the farm renders the same
+frames again.
+
+The index is stored in ~/.nuke/deadline_submissions.json, which can be
+changed with the DEADLINE_SUBMISSION_INDEX environment variable.
+
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from frames import compact_frame_list, parse_frame_list
+
+# Statuses of jobs that will render, or have rendered, the frames
+DUPLICATE_STATUSES = {
+    "Submitted",
+    "Active",
+    "Pending",
+    "Suspended",
+    "Completed",
+}
+
+# Hashes of the scene files, by path, size and modification time
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def file_hash(path):
+    """
+    Return the hash of the content of the file. The hash is cached until
+    the file changes, so a large script is only read once.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime)
+
+    with _file_hashes_lock:
+        if key in _file_hashes:
+            return _file_hashes[key]
+
+    content_hash = hashlib.sha1()
+    with open(path, "rb") as scene_file:
+        for chunk in iter(lambda: scene_file.read(1024 * 1024), b""):
+            content_hash.update(chunk)
+
+    with _file_hashes_lock:
+        _file_hashes[key] = content_hash.hexdigest()
+
+    return _file_hashes[key]
+
+
+def fingerprint(submission_parameters):
+    """
+    Return the fingerprint of a job, or None if the scene file can't be
+    read. The scene file is hashed as it is on disk, as that is what
+    the farm will render.
+    """
+    job_info = submission_parameters["job_info"]
+    plugin_info = submission_parameters["plugin_info"]
+
+    try:
+        content_hash = file_hash(plugin_info["SceneFile"])
+    except (KeyError, OSError):
+        return None
+
+    outputs = []
+    index = 0
+    while "OutputFilename%i" % index in job_info:
+        outputs.append(
+            "%s/%s"
+            % (
+                job_info.get("OutputDirectory%i" % index),
+                job_info.get("OutputFilename%i" % index),
+            )
+        )
+        index += 1
+
+    parts = [
+        content_hash,
+        plugin_info.get("WriteNode", ""),
+        compact_frame_list(parse_frame_list(job_info.get("Frames", ""))),
+    ] + outputs
+
+    return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class SubmissionIndex(object):
+    """
+    Local index with the fingerprints of the recently submitted jobs.
+
+    Every fingerprint is linked to the JobID, name and submission time
+    of the job. Fingerprints older than max_age seconds are removed,
+    and only the latest max_entries are kept.
+    """
+
+    def __init__(self, path=None, max_age=14 * 24 * 3600, max_entries=1000):
+        # The file can be set via the environment,
+        # otherwise the .nuke folder of the user is used
+        if path is None:
+            path = os.getenv(
+                "DEADLINE_SUBMISSION_INDEX",
+                os.path.join(
+                    os.path.expanduser("~"),
+                    ".nuke",
+                    "deadline_submissions.json",
+                ),
+            )
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+
+    def record(self, jobs, job_ids):
+        """Add the fingerprints of the submitted jobs to the index."""
+        entries = {}
+        for job, job_id in zip(jobs, job_ids):
+            job_fingerprint = job_id and fingerprint(job)
+            if job_fingerprint:
+                entries[job_fingerprint] = {
+                    "job_id": job_id,
+                    "name": job["job_info"].get("Name", ""),
+                    "submitted": time.time(),
+                }
+
+        if not entries:
+            return
+
+        with self.__lock:
+            index = self.__load()
+            index.update(entries)
+
+            # Only keep the latest fingerprints
+            latest = sorted(
+                index.items(),
+                key=lambda item: item[1].get("submitted", 0),
+                reverse=True,
+            )[: self.max_entries]
+            self.__save(dict(latest))
+
+    def find(self, job_fingerprint):
+        """Return the entry of the fingerprint, or None."""
+        with self.__lock:
+            entry = self.__load().get(job_fingerprint)
+        return entry
+
+    def __load(self):
+        try:
+            with open(self.path, encoding="utf-8") as index_json:
+                index = json.load(index_json)
+        except (OSError, ValueError):
+            return {}
+
+        oldest = time.time() - self.max_age
+        return dict(
+            (job_fingerprint, entry)
+            for job_fingerprint, entry in index.items()
+            if entry.get("submitted", 0) >= oldest
+        )
+
+    def __save(self, index):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        temporary_file = self.path + ".tmp"
+        with open(temporary_file, "w", encoding="utf-8") as index_json:
+            json.dump(index, index_json)
+        os.replace(temporary_file, self.path)
+
+
+def find_duplicates(jobs, deadline_transport, index=None):
+    """
+    Return the jobs that have already been submitted, and haven't failed
+    or been deleted since.
+
+    Returns a list with a dictionary for every duplicate job:
+        {
+            "job": {...},
+            "job_id": "63a1...",
+            "name": "ExampleScript - Write1",
+            "status": "Completed",
+        }
+
+    The statuses of all earlier jobs are asked in a single query. If
+    Deadline can't be reached, all earlier jobs are returned.
+    """
+    index = index or _index
+
+    candidates = []
+    for job in jobs:
+        job_fingerprint = fingerprint(job)
+        entry = job_fingerprint and index.find(job_fingerprint)
+        if entry:
+            candidates.append(dict(entry, job=job, status="Submitted"))
+
+    if not candidates:
+        return []
+
+    try:
+        statuses = deadline_transport.job_statuses(
+            [candidate["job_id"] for candidate in candidates]
+        )
+    except Exception:
+        return candidates
+
+    duplicates = []
+    for candidate in candidates:
+        status = statuses.get(candidate["job_id"], {"status": "Deleted"})
+        if status["status"] in DUPLICATE_STATUSES:
+            candidate["status"] = status["status"]
+            duplicates.append(candidate)
+
+    return duplicates
+
+
+# Index shared by this session
+_index = SubmissionIndex()
+
+
+def record(jobs, job_ids):
+    """Add the submitted jobs to the index, without ever failing."""
+    try:
+        _index.record(jobs, job_ids)
+    except Exception:
+        pass
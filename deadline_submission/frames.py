@@ -0,0 +1,84 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module with helpers for Deadline frame lists.
+
+A frame list is a string like "1-100" or "1,5,10-20", as used
+by the Frames key of the job_info.
+
+"""
+
+import re
+
+
+def parse_frame_list(frame_list):
+    """
+    Return a sorted list with all frames in the frame list.
+
+    Supports single frames, ranges and ranges with a step, separated
+    by commas or spaces. For example "1-10x2, 20" will return
+    [1, 3, 5, 7, 9, 20].
+    """
+    frames = set()
+
+    for part in re.split(r"[,\s]+", str(frame_list).strip()):
+        if not part:
+            continue
+
+        match = re.match(r"^(-?\d+)(?:-(-?\d+)(?:x(\d+))?)?$", part)
+        if not match:
+            raise ValueError("Invalid frame list: %s" % frame_list)
+
+        first = int(match.group(1))
+        last = int(match.group(2)) if match.group(2) is not None else first
+        step = int(match.group(3) or 1)
+
+        if last < first:
+            first, last = last, first
+
+        frames.update(range(first, last + 1, step))
+
+    return sorted(frames)
+
+
+def compact_frame_list(frames):
+    """
+    Return a compact frame list for the provided frames.
+
+    Consecutive frames are joined to ranges, so [1, 2, 3, 5, 7, 8]
+    will become "1-3,5,7-8".
+    """
+    ranges = []
+
+    for frame in sorted(set(frames)):
+        # Extend the current range if the frame follows it
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+
+    return ",".join(
+        str(first) if first == last else "%i-%i" % (first, last)
+        for first, last in ranges
+    )
+
+
+def key_frames(frames, step=10):
+    """
+    Return the key frames of the provided frames, in the order they
+    should be rendered: the first, last and middle frame, followed by
+    every step-th frame. For example frames 1-100 with a step of 25
+    will return [1, 100, 51, 26, 76].
+    """
+    frames = sorted(set(frames))
+    if not frames:
+        return []
+
+    ordered = [frames[0], frames[-1], frames[len(frames) // 2]]
+    ordered.extend(frames[:: max(int(step), 1)])
+
+    # Remove duplicates, keeping the first occurrence
+    seen = set()
+    return [
+        frame for frame in ordered if not (frame in seen or seen.add(frame))
+    ]
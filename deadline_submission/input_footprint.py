@@ -0,0 +1,200 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to estimate the amount of data a job reads.
+
+The files of the Read nodes upstream of the Write node are scanned in
+bulk (every directory once, in parallel), which gives the average size
+of a frame of every sequence. Together with the chunk size, the
+concurrent tasks and the time reach of the node graph, this gives the
+bytes read per frame and per task.
+
+A job is likely I/O-bound when reading the inputs of a frame takes
+longer than IO_BOUND_SECONDS on the bandwidth of a worker. The
+bandwidth is set in MB/s via the DEADLINE_SUBMISSION_READ_BANDWIDTH
+environment variable (500 MB/s by default). Such jobs can copy their
+input frames to the worker before every task, see localize_inputs.py.
+
+Inside Nuke the files are scanned in the background by scan(), so the
+submission never waits on the file server.
+
+"""
+
+import os
+import threading
+from concurrent.futures import Future
+
+import sequence_scanner
+
+# Seconds of reading per frame after which a job is I/O-bound
+IO_BOUND_SECONDS = 2.0
+
+
+def read_bandwidth():
+    """Return the read bandwidth of a worker in bytes per second."""
+    try:
+        bandwidth = float(
+            os.getenv("DEADLINE_SUBMISSION_READ_BANDWIDTH", 500)
+        )
+    except ValueError:
+        bandwidth = 500.0
+
+    return bandwidth * 1024 ** 2
+
+
+def input_files(upstream_index):
+    """
+    Return the file paths of the enabled Read nodes, leaving out paths
+    containing expressions as these can't be resolved without Nuke.
+    """
+    files = []
+
+    for read in upstream_index.nodes_of_class("Read"):
+        file_knob = read.knob("file")
+        file_path = str(file_knob.value()) if file_knob else ""
+        if not file_path or "[" in file_path or file_path in files:
+            continue
+        files.append(file_path)
+
+    return files
+
+
+def estimate(upstream_index):
+    """
+    Estimate the data read by the node graph.
+
+    Will return a dictionary:
+        {
+            "inputs": [
+                {
+                    "file": "/plates/a.####.exr",
+                    "frames": 100,
+                    "bytes_per_frame": 52428800,
+                },
+            ],
+            "bytes_per_frame": 52428800,
+            "bytes_per_task": 0,
+            "missing": ["/plates/b.####.exr"],
+        }
+
+    Files that aren't sequences (stills, movies) are read completely
+    by every task, so they are added to bytes_per_task instead.
+    """
+    return estimate_files(input_files(upstream_index))
+
+
+def estimate_files(files):
+    """Estimate the data read from the input files, see estimate()."""
+    sequences = sequence_scanner.scan_sequences(
+        [path for path in files if sequence_scanner.is_sequence(path)]
+    )
+
+    footprint = {
+        "inputs": [],
+        "bytes_per_frame": 0,
+        "bytes_per_task": 0,
+        "missing": [],
+    }
+
+    for file_path in files:
+        if file_path in sequences:
+            frames = sequences[file_path]
+            if not frames:
+                footprint["missing"].append(file_path)
+                continue
+
+            size = sum(frame[0] for frame in frames.values()) // len(frames)
+            footprint["inputs"].append(
+                {
+                    "file": file_path,
+                    "frames": len(frames),
+                    "bytes_per_frame": size,
+                }
+            )
+            footprint["bytes_per_frame"] += size
+            continue
+
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            footprint["missing"].append(file_path)
+            continue
+
+        footprint["inputs"].append(
+            {"file": file_path, "frames": 1, "bytes_per_frame": size}
+        )
+        footprint["bytes_per_task"] += size
+
+    return footprint
+
+
+def scan(upstream_index):
+    """
+    Estimate the data read by the node graph in a background thread.
+    The input files are collected right away, as nodes should only be
+    read from the main thread.
+
+    Returns a Future containing the footprint, or None if anything
+    went wrong while scanning.
+    """
+    files = input_files(upstream_index)
+    footprint = Future()
+
+    def run():
+        try:
+            footprint.set_result(estimate_files(files))
+
+        # Scanning the files should never block the submission
+        except Exception:
+            footprint.set_result(None)
+
+    thread = threading.Thread(target=run, name="DeadlineInputFootprint")
+    thread.daemon = True
+    thread.start()
+
+    return footprint
+
+
+def scanned(footprint):
+    """
+    Return the footprint of a scan started by scan(), or None if it's
+    still scanning. A footprint that isn't a scan is returned as is.
+    """
+    if not isinstance(footprint, Future):
+        return footprint
+
+    return footprint.result() if footprint.done() else None
+
+
+def bytes_per_task(footprint, chunk_size, reach=(0, 0)):
+    """
+    Return the bytes read by a task rendering a chunk, including the
+    frames read around the chunk by time based nodes.
+    """
+    frames = max(int(chunk_size), 1) + reach[0] + reach[1]
+    return footprint["bytes_per_frame"] * frames + footprint["bytes_per_task"]
+
+
+def is_io_bound(footprint, concurrent_tasks=1, bandwidth=None):
+    """
+    Check if reading the inputs of a frame takes longer than
+    IO_BOUND_SECONDS, with the bandwidth of the worker shared by
+    the concurrent tasks.
+    """
+    if bandwidth is None:
+        bandwidth = read_bandwidth()
+
+    task_bandwidth = bandwidth / max(int(concurrent_tasks), 1)
+    return footprint["bytes_per_frame"] / task_bandwidth > IO_BOUND_SECONDS
+
+
+def describe(footprint, chunk_size=1, concurrent_tasks=1, reach=(0, 0)):
+    """Return a short description of the footprint, for the user."""
+    return "%i inputs, %.1f MB per frame, %.1f MB per task%s" % (
+        len(footprint["inputs"]),
+        footprint["bytes_per_frame"] / 1024.0 ** 2,
+        bytes_per_task(footprint, chunk_size, reach) / 1024.0 ** 2,
+        " (likely I/O-bound)"
+        if is_io_bound(footprint, concurrent_tasks)
+        else "",
+    )
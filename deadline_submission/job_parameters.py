@@ -0,0 +1,371 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module creating the submission parameters of a job.
+
+The functions don't need Nuke or the submission panel, so the same
+job_info and plugin_info dictionaries are created by the submitter
+inside Nuke and by the bulk submitter on the command line.
+
+"""
+
+import json
+import os
+import input_footprint
+import memory_budget
+import temporal
+from frames import compact_frame_list, key_frames, parse_frame_list
+from render_tuning import RenderTuner
+
+# Every how many frames a preview job renders a frame,
+# next to the first, last and middle frame
+PREVIEW_STEP = 10
+
+# Priority added to preview jobs, so they are picked up first
+PREVIEW_PRIORITY = 10
+
+# Folder next to the output receiving the profiles of every task
+PROFILE_DIRECTORY = "nuke_profiles"
+
+# Concurrent tasks and chunk size of every render mode
+RENDER_MODES = {
+    "light": (10, 3),
+    "medium": (5, 2),
+    "heavy": (1, 1),
+}
+
+
+def render_mode_settings(
+    render_mode, script_path=None, write_node=None, frame_range=None
+):
+    """This function will calculate the
+    concurrent tasks and the chunk size provided by the
+    render mode.
+
+    There are 4 modes: auto, light, medium, heavy
+
+    Auto will use the render history of the Write node (its full name)
+    to find the concurrent tasks and chunk size that render the frame
+    range in the least time. If there is no history, light will be used.
+
+    Light will render 10 tasks on the same machine simultaneously, with
+    each 3 frames. (So a total of 30 frames)
+
+    Medium will render 5 tasks on the same machine at the same time, each
+    rendering 2 frames (So a total of 10 frames)
+
+    Heavy will render 1 task at a time, each with 1 frame.
+
+    By using the concurrent tasks and chunk size, a lot more ram and
+    computational power can be used while rendering, thus providing
+    faster render times.
+
+    """
+
+    # Use the render history if available
+    if render_mode == "auto":
+        suggestion = None
+
+        if script_path and write_node and frame_range:
+            try:
+                frame_count = len(parse_frame_list(frame_range))
+                suggestion = RenderTuner().suggest(
+                    script_path, write_node, frame_count
+                )
+
+            # The history should never block the submission
+            except Exception:
+                suggestion = None
+
+        if suggestion is not None:
+            return suggestion
+
+        # No history yet, so fall back to the light preset
+        render_mode = "light"
+
+    # Unknown modes render like heavy, one frame at a time
+    return RENDER_MODES.get(render_mode, RENDER_MODES["heavy"])
+
+
+def fit_to_node_graph(
+    node, upstream_index, frames, concurrent_tasks, chunk_size, footprint=None
+):
+    """
+    Fit the render settings to the nodes upstream of the Write node.
+
+    The concurrent tasks and chunk size are capped to the memory of a
+    worker first. The chunks are then chosen so time based nodes
+    (Kronos, FrameBlend, FrameHold segments, etc.) compute as few frames
+    again as possible, with chunks that still fit in the memory. If the
+    input footprint is provided, the data read per frame and per task is
+    added to the extra info.
+
+    Will return a dictionary:
+        {
+            "frames": "1005-1100,1001-1004",
+            "concurrent_tasks": 5,
+            "chunk_size": 10,
+            "reach": (2, 2),
+            "extra_info": {"TemporalOverlapAvoided": "108 frames"},
+        }
+    """
+    concurrent_tasks, chunk_size = memory_budget.fit_render_settings(
+        node, upstream_index, concurrent_tasks, chunk_size
+    )
+    fitted = {
+        "frames": frames,
+        "concurrent_tasks": concurrent_tasks,
+        "chunk_size": chunk_size,
+        "reach": temporal.upstream_reach(upstream_index),
+        "extra_info": {},
+    }
+
+    if frames:
+        chunks = temporal.fit_chunks(
+            upstream_index,
+            parse_frame_list(frames),
+            chunk_size,
+            chunk_limit=memory_budget.max_chunk_size(
+                node, upstream_index, concurrent_tasks
+            ),
+        )
+        if chunks["avoided"]:
+            fitted["frames"] = temporal.ordered_frame_list(chunks["frames"])
+            fitted["chunk_size"] = chunks["chunk_size"]
+        if chunks["overlap"] or chunks["avoided"]:
+            fitted["extra_info"].update(
+                TemporalReach="-%i/+%i" % chunks["reach"],
+                TemporalOverlap="%i frames" % chunks["overlap"],
+                TemporalOverlapAvoided="%i frames" % chunks["avoided"],
+            )
+
+    if footprint and footprint["inputs"]:
+        fitted["extra_info"]["InputFootprint"] = input_footprint.describe(
+            footprint,
+            fitted["chunk_size"],
+            fitted["concurrent_tasks"],
+            fitted["reach"],
+        )
+
+    return fitted
+
+
+def build_submission_parameters(
+    script_path,
+    write_node,
+    file_path,
+    frames,
+    name,
+    nuke_version,
+    priority=70,
+    concurrent_tasks=1,
+    chunk_size=1,
+    limit_groups=None,
+    scene_file=None,
+    extra_info=None,
+    department="2D",
+    pool=None,
+    group=None,
+    machine_limit=0,
+):
+    """
+    Create dictionaries containing all submission parameters of a job
+    rendering the Write node (its full name) of the script.
+
+    Will return a dictionary:
+        {
+        "job_info": {
+            "Plugin": "Nuke",
+            "Frames": "1-100",
+            "Priority": 70,
+            "Name": "ExampleScript",
+            "Department": "2D",
+            "ConcurrentTasks": 10,
+            "ChunkSize": 3,
+            "OutputDirectory0": "/example/path",
+            "OutputFilename0": "file.exr",
+            "LimitGroups": "neatvideo",
+        },
+        "plugin_info": {
+            "Version": "13.2",
+            "WriteNode": "Write1",
+            "SceneFile": "/example/path/ExampleScript.nk",
+        },
+    }
+
+    The limit_groups are the names of the Deadline Limits the job needs
+    a stub of, for example the Limits of license limited nodes.
+
+    If provided, the scene_file (for example a snapshot) is rendered
+    instead of the script, which is added to the extra info as Script.
+
+    The extra_info dictionary is shown in Deadline as the extra info
+    key values of the job.
+
+    The pool, group and machine limit are only added if provided, so
+    Deadline uses the defaults of the repository otherwise.
+    """
+
+    # Getting job submission parameters
+    job_info = {}
+    job_info["Plugin"] = "Nuke"
+    job_info["Frames"] = frames
+    job_info["Priority"] = priority
+    job_info["Name"] = name
+    job_info["Department"] = department
+    job_info["ConcurrentTasks"] = concurrent_tasks
+    job_info["ChunkSize"] = chunk_size
+    job_info["OutputDirectory0"] = os.path.dirname(file_path)
+    job_info["OutputFilename0"] = os.path.basename(file_path)
+
+    # Machines rendering the job
+    if pool:
+        job_info["Pool"] = pool
+    if group:
+        job_info["Group"] = group
+    if machine_limit:
+        job_info["MachineLimit"] = int(machine_limit)
+
+    # Every task takes a stub of the Limits of the used licenses
+    if limit_groups:
+        job_info["LimitGroups"] = ",".join(sorted(limit_groups))
+
+    # A snapshot is rendered, so keep the script it was made of
+    if scene_file and scene_file != script_path:
+        extra_info = dict(extra_info or {}, Script=script_path)
+
+    # Shown in the job properties of the Deadline Monitor
+    for index, key in enumerate(sorted(extra_info or {})):
+        job_info["ExtraInfoKeyValue%i" % index] = "%s=%s" % (
+            key,
+            extra_info[key],
+        )
+
+    # Getting plugin submission parameters
+    plugin_info = {}
+    plugin_info["Version"] = nuke_version
+    plugin_info["WriteNode"] = write_node
+    plugin_info["SceneFile"] = scene_file or script_path
+
+    # Create dictionary containing both dictionaries
+    return {
+        "job_info": job_info,
+        "plugin_info": plugin_info,
+    }
+
+
+def preview_jobs(submission_parameters, step=PREVIEW_STEP):
+    """
+    Split the job into a preview job and a fill job.
+
+    The preview job renders the key frames (first, last, middle and
+    every step-th frame) one frame per task, in that order and with a
+    higher priority. The fill job renders the other frames with the
+    settings of the original job. Obvious problems will therefore show
+    up in the first frames that are done.
+
+    Returns a list with the preview job and the fill job. If all frames
+    are key frames, only the preview job is returned.
+    """
+    frames = parse_frame_list(submission_parameters["job_info"]["Frames"])
+    preview_frames = key_frames(frames, step)
+    fill_frames = sorted(set(frames).difference(preview_frames))
+
+    preview = {
+        "job_info": dict(submission_parameters["job_info"]),
+        "plugin_info": dict(submission_parameters["plugin_info"]),
+    }
+    preview["job_info"]["Name"] = "%s (preview)" % preview["job_info"]["Name"]
+    preview["job_info"]["Frames"] = ",".join(
+        str(frame) for frame in preview_frames
+    )
+    preview["job_info"]["ChunkSize"] = 1
+    preview["job_info"]["Priority"] = min(
+        int(preview["job_info"]["Priority"]) + PREVIEW_PRIORITY, 100
+    )
+
+    if not fill_frames:
+        return [preview]
+
+    fill = {
+        "job_info": dict(submission_parameters["job_info"]),
+        "plugin_info": dict(submission_parameters["plugin_info"]),
+    }
+    fill["job_info"]["Frames"] = compact_frame_list(fill_frames)
+
+    return [preview, fill]
+
+
+def localize_inputs(submission_parameters, files, reach=(0, 0)):
+    """
+    Let every task copy its input frames to the worker before rendering,
+    using localize_inputs.py as the pre task script of the job.
+
+    The files and the time reach of the node graph are passed to the
+    script via the environment of the job. The script needs to be
+    available to the farm, its path can be set with the
+    DEADLINE_SUBMISSION_LOCALIZE_SCRIPT environment variable.
+    """
+    job_info = submission_parameters["job_info"]
+    job_info["PreTaskScript"] = os.getenv(
+        "DEADLINE_SUBMISSION_LOCALIZE_SCRIPT",
+        os.path.join(os.path.dirname(__file__), "localize_inputs.py"),
+    ).replace(os.sep, "/")
+
+    _add_environment(
+        job_info,
+        "DEADLINE_LOCALIZE_INPUTS",
+        json.dumps({"files": list(files), "reach": list(reach)}),
+    )
+
+    return submission_parameters
+
+
+def _add_environment(job_info, key, value):
+    """Add the environment variable to the job, after the existing ones."""
+    index = 0
+    while "EnvironmentKeyValue%i" % index in job_info:
+        index += 1
+
+    job_info["EnvironmentKeyValue%i" % index] = "%s=%s" % (key, value)
+
+
+def profile_render(submission_parameters, directory=None):
+    """
+    Let every task measure the time spent in every node, using the
+    performance profiler of the Nuke plugin (the -Pf argument of Nuke).
+
+    Every task writes its profile XML to the directory, by default a
+    nuke_profiles folder next to the output. The profiles are merged
+    into a hotspot report by profile_report.py.
+    """
+    if directory is None:
+        directory = os.path.join(
+            submission_parameters["job_info"]["OutputDirectory0"],
+            PROFILE_DIRECTORY,
+        )
+
+    plugin_info = submission_parameters["plugin_info"]
+    plugin_info["PerformanceProfiler"] = True
+    plugin_info["PerformanceProfilerDir"] = directory.replace(os.sep, "/")
+
+    return submission_parameters
+
+
+def wedge_job(submission_parameters, wedge_settings):
+    """
+    Turn the job into a wedge, rendering a frame once for every value
+    of a knob, one task per value. The wedge_settings are created by
+    wedge.wedge_settings().
+
+    The frames of the job are the indices of the values, and every task
+    renders to its own wedge output. The job has to render the script
+    created by wedge.create_wedge_script(), in which the knob has the
+    value of every index.
+    """
+    job_info = submission_parameters["job_info"]
+    job_info["Frames"] = "0-%i" % (len(wedge_settings["values"]) - 1)
+    job_info["ChunkSize"] = 1
+    job_info["OutputFilename0"] = os.path.basename(wedge_settings["file"])
+
+    return submission_parameters
@@ -0,0 +1,335 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module keeping track of the jobs submitted in this session.
+
+Every submitted job is added to the registry, with its JobID, name
+and Write nodes. The StatusPoller asks Deadline for the status of all
+unfinished jobs in a single batched query, instead of a request per
+job. The poll interval adapts to the jobs: it starts short and grows
+while nothing changes, so many artists watching many jobs won't flood
+the repository.
+
+Usage:
+    poller = get_poller(transport.get_transport())
+    poller.add_listener(show_jobs)
+
+"""
+
+import random
+import threading
+import time
+
+import duplicates
+
+# Statuses after which a job won't change anymore by itself. Suspended
+# jobs are still polled, as they are often resumed in the Monitor.
+FINISHED_STATUSES = {"Completed", "Failed", "Deleted"}
+
+# Amount of polls in a row a job has to be missing from the answer of
+# Deadline before it is marked as deleted. A job that was just
+# submitted, or a hiccup of the repository, can leave a job out once.
+MISSING_POLLS = 3
+
+# Status codes used by the Deadline Web Service
+STATUS_CODES = {
+    0: "Unknown",
+    1: "Active",
+    2: "Suspended",
+    3: "Completed",
+    4: "Failed",
+    6: "Pending",
+}
+
+
+class JobRegistry(object):
+    """
+    Registry with the jobs submitted in this session.
+
+    Every job is a dictionary:
+        {
+            "job_id": "63a1...",
+            "name": "ExampleScript - Write1",
+            "write": "Write1",
+            "script": "/example/path/ExampleScript.nk",
+            "concurrent_tasks": 1,
+            "submitted": 1670000000.0,
+            "status": "Submitted",
+            "completed": 0,
+            "tasks": 0,
+        }
+    """
+
+    def __init__(self):
+        self.__jobs = {}
+        self.__lock = threading.Lock()
+
+    def register(self, jobs, job_ids):
+        """
+        Add the submitted jobs to the registry. The job_ids have the
+        order of the jobs, failed jobs (without JobID) are skipped.
+        """
+        with self.__lock:
+            for job, job_id in zip(jobs, job_ids):
+                if not job_id:
+                    continue
+
+                job_info = job.get("job_info", {})
+                plugin_info = job.get("plugin_info", {})
+                self.__jobs[job_id] = {
+                    "job_id": job_id,
+                    "name": job_info.get("Name", ""),
+                    "write": plugin_info.get("WriteNode", ""),
+                    "script": extra_info(job_info).get(
+                        "Script", plugin_info.get("SceneFile", "")
+                    ),
+                    "concurrent_tasks": int(
+                        job_info.get("ConcurrentTasks") or 1
+                    ),
+                    "submitted": time.time(),
+                    "status": "Submitted",
+                    "completed": 0,
+                    "tasks": 0,
+                }
+
+    def jobs(self):
+        """Return a copy of all registered jobs, the oldest first."""
+        with self.__lock:
+            jobs = [dict(job) for job in self.__jobs.values()]
+        return sorted(jobs, key=lambda job: job["submitted"])
+
+    def get(self, job_id):
+        """Return a copy of the registered job, or None."""
+        with self.__lock:
+            job = self.__jobs.get(job_id)
+            return dict(job) if job else None
+
+    def unfinished(self):
+        """Return the JobIDs of the jobs that can still change."""
+        with self.__lock:
+            return [
+                job_id
+                for job_id, job in self.__jobs.items()
+                if job["status"] not in FINISHED_STATUSES
+            ]
+
+    def update(self, statuses):
+        """
+        Update the jobs with the statuses of a status query, returns
+        True if anything changed.
+        """
+        changed = False
+
+        with self.__lock:
+            for job_id, status in statuses.items():
+                job = self.__jobs.get(job_id)
+                if job is None:
+                    continue
+
+                for key, value in status.items():
+                    if job.get(key) != value:
+                        job[key] = value
+                        changed = True
+
+        return changed
+
+    def clear_finished(self):
+        """Remove the finished jobs from the registry."""
+        with self.__lock:
+            for job_id in list(self.__jobs):
+                if self.__jobs[job_id]["status"] in FINISHED_STATUSES:
+                    del self.__jobs[job_id]
+
+
+class StatusPoller(object):
+    """
+    Polls the status of all unfinished registered jobs in one query.
+
+    The interval starts at min_interval and doubles (up to
+    max_interval) every poll in which nothing changed. A random jitter
+    is added, so sessions started at the same time don't poll together.
+    Polling stops when there are no listeners or no unfinished jobs.
+    """
+
+    def __init__(
+        self, transport, registry, min_interval=5.0, max_interval=120.0
+    ):
+        self.transport = transport
+        self.registry = registry
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+
+        self.__listeners = []
+        self.__lock = threading.Lock()
+        self.__wake = threading.Event()
+        self.__thread = None
+
+        # Amount of polls in a row every job has been missing
+        self.__missing = {}
+
+    def add_listener(self, listener, start=True):
+        """
+        Add a function called with the list of jobs after every poll,
+        this is called from the poll thread. A listener is only added
+        once. If start is False, polling starts when jobs are registered
+        instead of right away.
+        """
+        with self.__lock:
+            if listener not in self.__listeners:
+                self.__listeners.append(listener)
+        if start:
+            self.start()
+
+    def remove_listener(self, listener):
+        with self.__lock:
+            if listener in self.__listeners:
+                self.__listeners.remove(listener)
+
+    def start(self):
+        """Start polling, if not already running."""
+        with self.__lock:
+            if self.__thread is not None and self.__thread.is_alive():
+                return
+            self.__thread = threading.Thread(
+                target=self.__run, name="DeadlineStatusPoller"
+            )
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def poll_now(self):
+        """Poll as soon as possible, for example when jobs are added."""
+        self.interval = self.min_interval
+        self.__wake.set()
+        self.start()
+
+    def poll(self):
+        """
+        Ask the status of all unfinished jobs in one query, and update
+        the registry. Returns True if anything changed.
+        """
+        job_ids = self.registry.unfinished()
+        if not job_ids:
+            return False
+
+        statuses = self.transport.job_statuses(job_ids)
+
+        # Jobs Deadline doesn't know anymore have been deleted
+        for job_id in job_ids:
+            if job_id in statuses:
+                self.__missing.pop(job_id, None)
+                continue
+
+            self.__missing[job_id] = self.__missing.get(job_id, 0) + 1
+            if self.__missing[job_id] >= MISSING_POLLS:
+                del self.__missing[job_id]
+                statuses[job_id] = {"status": "Deleted"}
+
+        return self.registry.update(statuses)
+
+    def __run(self):
+        while True:
+            # Checked under the lock start() uses, so a listener added
+            # while stopping will start a new thread
+            with self.__lock:
+                listeners = list(self.__listeners)
+                if not listeners or not self.registry.unfinished():
+                    self.__thread = None
+                    return
+
+            try:
+                changed = self.poll()
+            except Exception:
+                changed = False
+
+            # Poll again soon while jobs are changing
+            if changed:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+
+            jobs = self.registry.jobs()
+            for listener in listeners:
+                try:
+                    listener(jobs)
+                except Exception:
+                    pass
+
+            self.__wake.wait(self.interval * random.uniform(0.9, 1.1))
+            self.__wake.clear()
+
+
+def extra_info(job_info):
+    """Return the extra info key values of the job info as a dictionary."""
+    info = {}
+
+    for key, value in job_info.items():
+        if key.startswith("ExtraInfoKeyValue"):
+            name, _, value = str(value).partition("=")
+            info[name] = value
+
+    return info
+
+
+def parse_job_status(job):
+    """
+    Return the status of a job as returned by the Web Service or
+    deadlinecommand -GetJob, in the format used by the registry.
+    """
+    status = job.get("Status", job.get("Stat", "Unknown"))
+    try:
+        status = STATUS_CODES.get(int(status), "Unknown")
+    except (TypeError, ValueError):
+        status = str(status)
+
+    def count(*keys):
+        for key in keys:
+            try:
+                return int(job[key])
+            except (KeyError, TypeError, ValueError):
+                continue
+        return 0
+
+    return {
+        "status": status,
+        "completed": count("CompletedChunks", "JobCompletedTasks"),
+        "tasks": count("Tasks", "JobTaskCount", "TaskCount"),
+    }
+
+
+# Registry and poller shared by this session
+_registry = JobRegistry()
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_registry():
+    """Return the job registry of this session."""
+    return _registry
+
+
+def register(jobs, job_ids):
+    """
+    Add the submitted jobs to the registry of this session, and their
+    fingerprints to the index of submitted jobs.
+    """
+    _registry.register(jobs, job_ids)
+    duplicates.record(jobs, job_ids)
+
+    # Let a running poller pick up the new jobs soon
+    if _poller is not None and any(job_ids):
+        _poller.poll_now()
+
+
+def get_poller(transport):
+    """Return the status poller shared by this session."""
+    global _poller
+
+    with _poller_lock:
+        if _poller is None:
+            _poller = StatusPoller(transport, _registry)
+
+        # Always use the latest configured transport
+        _poller.transport = transport
+
+        return _poller
@@ -0,0 +1,71 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module for the Deadline Limits used by license limited nodes.
+
+Every node class with a limited amount of licenses gets its own
+Deadline Limit, for example NeatVideo and OpticalFlares. A job only
+takes a stub of the Limits of the nodes it uses, so jobs using
+different plugins don't hold each other back.
+
+The Limits can be created automatically, with the amount of licenses
+as the amount of stubs. Set DEADLINE_SUBMISSION_CREATE_LIMITS to 1 to
+create missing Limits while submitting.
+
+"""
+
+import os
+import re
+import threading
+
+# Names of the Limits known to exist, so the repository
+# is only asked once per session
+_known_limits = set()
+_known_limits_loaded = False
+_lock = threading.Lock()
+
+
+def limit_group_name(node_class):
+    """
+    Return the name of the Deadline Limit for the node class. Deadline
+    only allows lower case letters, numbers, dashes and underscores.
+    """
+    return re.sub(r"[^a-z0-9_-]+", "_", node_class.lower()).strip("_")
+
+
+def create_limits_enabled():
+    """Check if missing Limits should be created while submitting."""
+    return os.getenv("DEADLINE_SUBMISSION_CREATE_LIMITS", "").lower() in (
+        "1",
+        "true",
+        "yes",
+    )
+
+
+def ensure_limit_groups(deadline_transport, limit_groups):
+    """
+    Create the Limits that don't exist in the repository yet.
+
+    The limit_groups dictionary contains the name of the Limit as key
+    and the amount of licenses as value, for example {"neatvideo": 5}.
+    Existing Limits are left as they are. Returns a list with the names
+    of the created Limits.
+    """
+    global _known_limits_loaded
+
+    created = []
+
+    with _lock:
+        if not _known_limits_loaded:
+            _known_limits.update(deadline_transport.limit_group_names())
+            _known_limits_loaded = True
+
+        for name, limit in sorted(limit_groups.items()):
+            if name in _known_limits:
+                continue
+
+            deadline_transport.set_limit_group(name, limit)
+            _known_limits.add(name)
+            created.append(name)
+
+    return created
@@ -0,0 +1,154 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Pre task script copying the input frames of a task to the worker.
+
+Jobs submitted with "Localize inputs" run this script before every
+task. The input sequences of the job and the time reach of its node
+graph are stored in the DEADLINE_LOCALIZE_INPUTS environment variable
+of the job. The frames of the task (and the frames around it read by
+time based nodes) are copied to a local cache, so Nuke doesn't read
+them over the network while rendering.
+
+The cache is stored in the deadline_input_cache folder of the temporary
+directory, or in DEADLINE_SUBMISSION_LOCAL_CACHE on the worker. Files
+already in the cache with the same size and modification time are
+not copied again.
+
+Nuke reads the local copies via a filename filter. Add it to the
+init.py used by the workers:
+    import localize_inputs
+    localize_inputs.register()
+
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Deadline runs this file on its own, so the other modules of the
+# submitter have to be found next to it
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import sequence_scanner  # noqa: E402
+
+
+def cache_root():
+    """Return the directory of the local cache of the worker."""
+    return os.getenv(
+        "DEADLINE_SUBMISSION_LOCAL_CACHE",
+        os.path.join(tempfile.gettempdir(), "deadline_input_cache"),
+    )
+
+
+def local_path(file_path, root=None):
+    """Return the path of the file inside the local cache."""
+    drive, path = os.path.splitdrive(os.path.abspath(file_path))
+    parts = [drive.strip(":\\/")] if drive else []
+    parts += [part for part in path.replace("\\", "/").split("/") if part]
+
+    return os.path.join(root or cache_root(), *parts)
+
+
+def localize_file(file_path, root=None):
+    """
+    Copy the file to the local cache, unless it's already there.
+    Returns True if the file has been copied.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return False
+
+    target = local_path(file_path, root)
+    try:
+        target_stat = os.stat(target)
+        if (
+            target_stat.st_size == stat.st_size
+            and int(target_stat.st_mtime) == int(stat.st_mtime)
+        ):
+            return False
+    except OSError:
+        pass
+
+    directory = os.path.dirname(target)
+    if not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    # Copy via a temporary file, so Nuke never reads half a frame
+    temporary_file = "%s.%i.tmp" % (target, os.getpid())
+    shutil.copy2(file_path, temporary_file)
+    os.replace(temporary_file, target)
+
+    return True
+
+
+def localize_frames(files, first_frame, last_frame, reach=(0, 0), root=None):
+    """
+    Copy the frames of the task, and the frames around it read by time
+    based nodes, of every input file to the local cache. Files that
+    aren't sequences are copied as a whole. Returns the amount of
+    copied files.
+    """
+    copied = 0
+    frames = range(first_frame - reach[0], last_frame + reach[1] + 1)
+
+    for file_path in files:
+        if not sequence_scanner.is_sequence(file_path):
+            copied += localize_file(file_path, root)
+            continue
+
+        for frame in frames:
+            frame_file = sequence_scanner.frame_path(file_path, frame)
+            copied += localize_file(frame_file, root)
+
+    return copied
+
+
+def filename_filter(file_path):
+    """
+    Nuke filename filter returning the local copy of a file, if
+    it has been copied to the local cache.
+    """
+    if not os.getenv("DEADLINE_LOCALIZE_INPUTS"):
+        return file_path
+
+    cached_path = local_path(file_path)
+    if os.path.isfile(cached_path):
+        return cached_path.replace(os.sep, "/")
+
+    return file_path
+
+
+def register():
+    """Register the filename filter in Nuke, for the workers init.py."""
+    import nuke
+
+    nuke.addFilenameFilter(filename_filter)
+
+
+def __main__(*args):
+    """Entry point of Deadline, called with the plugin before a task."""
+    deadline_plugin = args[0]
+
+    job = deadline_plugin.GetJob()
+    settings = json.loads(
+        job.GetJobEnvironmentKeyValue("DEADLINE_LOCALIZE_INPUTS") or "{}"
+    )
+
+    first_frame = deadline_plugin.GetStartFrame()
+    last_frame = deadline_plugin.GetEndFrame()
+
+    copied = localize_frames(
+        settings.get("files", []),
+        first_frame,
+        last_frame,
+        tuple(settings.get("reach", (0, 0))),
+    )
+
+    deadline_plugin.LogInfo(
+        "Localized %i input file(s) of frames %i-%i to %s"
+        % (copied, first_frame, last_frame, cache_root())
+    )
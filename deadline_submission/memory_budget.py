@@ -0,0 +1,278 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to estimate the memory a render task needs.
+
+Running many concurrent tasks on a 4K multichannel comp makes workers
+swap, which renders slower than a single task would. The peak memory
+of a task is estimated from the node graph upstream of the Write node:
+the size of a frame (format and channels) multiplied by the amount of
+frame buffers the nodes hold. Reads and Merges hold about a frame,
+blurs and filters a few and nodes caching frames (retimes, motion
+vectors, denoise) many.
+
+The concurrent tasks and chunk size of a job are capped, so all tasks
+of a worker fit in its memory. The memory of a worker is set in GB via
+the DEADLINE_SUBMISSION_WORKER_MEMORY environment variable (32 GB by
+default).
+
+"""
+
+import os
+
+# Memory of a Nuke process with an empty script, in bytes
+PROCESS_MEMORY = 1.5 * 1024 ** 3
+
+# Part of the memory of the worker available to the tasks,
+# the rest is left for the operating system
+MEMORY_HEADROOM = 0.85
+
+# Nuke processes every channel as a 32 bit float
+BYTES_PER_CHANNEL = 4
+
+# Amount of channels of the channels knob values
+CHANNEL_COUNTS = {
+    "alpha": 1,
+    "depth": 1,
+    "rgb": 3,
+    "rgba": 4,
+    "motion": 4,
+    "forward": 2,
+    "backward": 2,
+}
+
+# Amount of channels assumed for "all" if the channels are unknown
+ALL_CHANNELS = 16
+
+# Amount of frame buffers held by nodes of these classes
+READ_BUFFERS = 1.0
+MERGE_BUFFERS = 0.25
+FILTER_BUFFERS = 2.0
+CACHE_BUFFERS = 6.0
+OTHER_BUFFERS = 0.01
+
+READ_CLASSES = {"Read", "DeepRead"}
+MERGE_CLASSES = {
+    "Merge2",
+    "Keymix",
+    "Copy",
+    "ShuffleCopy",
+    "ChannelMerge",
+    "Dissolve",
+    "Switch",
+}
+FILTER_CLASSES = {
+    "Blur",
+    "Defocus",
+    "ZDefocus2",
+    "Bokeh",
+    "Convolve2",
+    "Glow2",
+    "GodRays",
+    "Median",
+    "Erode",
+    "FilterErode",
+    "EdgeBlur",
+    "Sharpen",
+    "Soften",
+    "VectorBlur2",
+    "IDistort",
+    "STMap",
+    "LensDistortion2",
+}
+CACHE_CLASSES = {
+    "Kronos",
+    "OFlow2",
+    "VectorGenerator",
+    "TimeBlur",
+    "FrameBlend",
+    "TimeEcho",
+    "Denoise2",
+    "DiskCache",
+    "Precomp",
+    "ScanlineRender",
+    "RayRender",
+    "CopyCat",
+    "Inference",
+}
+
+
+def worker_memory():
+    """Return the memory of a worker in bytes, set via the environment."""
+    try:
+        memory = float(os.getenv("DEADLINE_SUBMISSION_WORKER_MEMORY", 32))
+    except ValueError:
+        memory = 32.0
+
+    return memory * 1024 ** 3
+
+
+def channel_count(node, upstream_index=None):
+    """
+    Return the amount of channels rendered by the Write node.
+
+    If the Write renders all channels, the largest amount of channels
+    of the upstream Read nodes is used, as these are all processed.
+    """
+    channels_knob = node.knob("channels")
+    channels = str(channels_knob.value()) if channels_knob else "rgb"
+
+    if channels in CHANNEL_COUNTS:
+        return CHANNEL_COUNTS[channels]
+
+    if channels != "all":
+        return CHANNEL_COUNTS["rgba"]
+
+    counts = []
+    if upstream_index is not None:
+        for read in upstream_index.nodes_of_class("Read"):
+            try:
+                counts.append(len(read.channels()))
+            except Exception:
+                continue
+
+    return max(counts) if counts else ALL_CHANNELS
+
+
+def frame_bytes(node, upstream_index=None):
+    """Return the size of a single frame buffer of the node in bytes."""
+    try:
+        node_format = node.format()
+        pixels = node_format.width() * node_format.height()
+    except Exception:
+        pixels = 1920 * 1080
+
+    return pixels * channel_count(node, upstream_index) * BYTES_PER_CHANNEL
+
+
+def frame_buffers(upstream_index):
+    """
+    Return the amount of frame buffers held while rendering a frame,
+    and the amount of them held for every frame of a chunk.
+    """
+    buffers = 1.0
+    cached_buffers = 1.0
+
+    for node in upstream_index.nodes:
+        if upstream_index.is_disabled(node):
+            continue
+
+        node_class = node.Class()
+        if node_class in READ_CLASSES:
+            buffers += READ_BUFFERS
+        elif node_class in MERGE_CLASSES:
+            buffers += MERGE_BUFFERS
+        elif node_class in FILTER_CLASSES:
+            buffers += FILTER_BUFFERS
+        elif node_class in CACHE_CLASSES:
+            buffers += CACHE_BUFFERS
+            cached_buffers += 1.0
+        else:
+            buffers += OTHER_BUFFERS
+
+    return buffers, cached_buffers
+
+
+def estimate_task_memory(node, upstream_index, chunk_size=1):
+    """
+    Return the estimated peak memory of a task rendering the Write node
+    in bytes. Every extra frame of a chunk adds the frames cached by
+    the nodes holding frames.
+    """
+    buffers, cached_buffers = frame_buffers(upstream_index)
+    buffers += cached_buffers * (max(int(chunk_size), 1) - 1)
+
+    return PROCESS_MEMORY + buffers * frame_bytes(node, upstream_index)
+
+
+def fit_render_settings(
+    node, upstream_index, concurrent_tasks, chunk_size, memory=None
+):
+    """
+    Cap the concurrent tasks and chunk size, so all tasks of a worker
+    fit in the memory of the worker.
+
+    The amount of concurrent tasks is lowered first. If a single task
+    doesn't fit, the chunk size is lowered as well. Returns the
+    concurrent tasks and chunk size.
+    """
+    if memory is None:
+        memory = worker_memory()
+    available = memory * MEMORY_HEADROOM
+
+    concurrent_tasks = max(int(concurrent_tasks), 1)
+    chunk_size = max(int(chunk_size), 1)
+
+    task_memory = estimate_task_memory(node, upstream_index, chunk_size)
+    fitting_tasks = int(available // task_memory)
+    if fitting_tasks >= 1:
+        return min(concurrent_tasks, fitting_tasks), chunk_size
+
+    # A single task doesn't fit, so render less frames per task
+    while chunk_size > 1:
+        chunk_size -= 1
+        task_memory = estimate_task_memory(node, upstream_index, chunk_size)
+        if task_memory <= available:
+            break
+
+    return 1, chunk_size
+
+
+def max_chunk_size(node, upstream_index, concurrent_tasks, memory=None):
+    """
+    Return the largest chunk size with which the concurrent tasks still
+    fit in the memory of a worker, at least 1.
+    """
+    if memory is None:
+        memory = worker_memory()
+    available = memory * MEMORY_HEADROOM / max(int(concurrent_tasks), 1)
+
+    buffers, cached_buffers = frame_buffers(upstream_index)
+    buffer_bytes = frame_bytes(node, upstream_index)
+    free_buffers = (available - PROCESS_MEMORY) / buffer_bytes - buffers
+
+    return max(int(free_buffers // cached_buffers) + 1, 1)
+
+
+def memory_warning(
+    node, upstream_index, concurrent_tasks, chunk_size, memory=None
+):
+    """
+    Return a warning if the render settings don't fit in the memory of
+    a worker, otherwise an empty string.
+    """
+    if memory is None:
+        memory = worker_memory()
+
+    task_memory = estimate_task_memory(node, upstream_index, chunk_size)
+    needed = task_memory * max(int(concurrent_tasks), 1)
+    if needed <= memory * MEMORY_HEADROOM:
+        return ""
+
+    fitting_tasks, fitting_chunk_size = fit_render_settings(
+        node, upstream_index, concurrent_tasks, chunk_size, memory
+    )
+    fitting_memory = estimate_task_memory(
+        node, upstream_index, fitting_chunk_size
+    )
+
+    # Even a single task of a single frame is too large
+    if fitting_memory > memory * MEMORY_HEADROOM:
+        return (
+            "A task needs about %.1f GB, workers have %.0f GB. "
+            "Workers will likely swap while rendering."
+            % (fitting_memory / 1024 ** 3, memory / 1024 ** 3)
+        )
+
+    return (
+        "%i tasks of %.1f GB need %.0f GB, workers have %.0f GB. "
+        "The job will render %i task(s) of %i frame(s) at a time."
+        % (
+            concurrent_tasks,
+            task_memory / 1024 ** 3,
+            needed / 1024 ** 3,
+            memory / 1024 ** 3,
+            fitting_tasks,
+            fitting_chunk_size,
+        )
+    )
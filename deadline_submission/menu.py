@@ -4,17 +4,60 @@ This file adds the command to the Nuke user interface.
 You can change the shortcut by changing the shortcut
 variable. For example: shortcut = "ctrl+R" will use
 ctrl + r for the submission shortcut.
+
+The multiple_shortcut variable is used to submit all
+selected Write nodes at once, the grouped_shortcut variable
+to render all selected Write nodes in a single job.
+
+The wedge command renders the selected Write node once for
+every value of a knob, as the tasks of a single job.
+
+The Deadline Job Monitor shows the status of all jobs
+submitted in this session.
+
+The commands are registered as strings only, so the submitter
+itself is imported the first time it is used. This way it
+doesn't add anything to the startup time of Nuke.
 """
 
-import deadline_submission
+import nuke
 
 shortcut = "F5"
+multiple_shortcut = "shift+F5"
+grouped_shortcut = "ctrl+shift+F5"
 
-menubar = nuke.menu("Nuke")
-deadline_menu = menubar.addMenu("&Render")
-deadline_menu.addCommand("-", "", "")
-deadline_menu.addCommand(
-    "Submit to Deadline",
-    "deadline_submission.DeadlineSubmission().submit_selected_node()",
-    shortcut,
-)
+# Terminal and render sessions have no menu to add the commands to
+if nuke.GUI:
+    menubar = nuke.menu("Nuke")
+    deadline_menu = menubar.addMenu("&Render")
+    deadline_menu.addCommand("-", "", "")
+    deadline_menu.addCommand(
+        "Submit to Deadline",
+        "import deadline_submission; "
+        "deadline_submission.DeadlineSubmission(background=True)"
+        ".submit_selected_node()",
+        shortcut,
+    )
+    deadline_menu.addCommand(
+        "Submit selected to Deadline",
+        "import deadline_submission; "
+        "deadline_submission.DeadlineSubmission(background=True)"
+        ".submit_selected_nodes()",
+        multiple_shortcut,
+    )
+    deadline_menu.addCommand(
+        "Submit selected to Deadline as one job",
+        "import deadline_submission; "
+        "deadline_submission.DeadlineSubmission(background=True)"
+        ".submit_selected_nodes(grouped=True)",
+        grouped_shortcut,
+    )
+    deadline_menu.addCommand(
+        "Submit wedge to Deadline",
+        "import deadline_submission; "
+        "deadline_submission.DeadlineSubmission().submit_selected_wedge()",
+    )
+    deadline_menu.addCommand(
+        "Deadline Job Monitor",
+        "import monitor; monitor.show_monitor()",
+    )
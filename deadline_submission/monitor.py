@@ -0,0 +1,121 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+This module includes the panel showing the status
+of the jobs submitted in this session
+"""
+
+import nuke
+import nukescripts
+
+import job_registry
+import transport
+
+# Colors of the statuses shown in the panel
+STATUS_COLORS = {
+    "Submitted": "#aaaaaa",
+    "Active": "#6fa8dc",
+    "Pending": "#aaaaaa",
+    "Suspended": "#e0c050",
+    "Completed": "#7fc97f",
+    "Failed": "#e06666",
+    "Deleted": "#777777",
+}
+
+
+class MonitorPanel(nukescripts.PythonPanel):
+    """
+    Class containing the panel showing all jobs submitted in this
+    session, with their status and completed tasks.
+
+    The statuses are asked by the shared StatusPoller, in one query
+    for all jobs. The panel is updated in the main thread after
+    every poll.
+    """
+
+    def __init__(self):
+        # Header
+        nukescripts.PythonPanel.__init__(self, "Deadline Job Monitor 📡")
+
+        # Defining knobs
+        self.jobs = nuke.Text_Knob("jobs", "", "")
+        self.refresh = nuke.PyScript_Knob("refresh", "Refresh 🔄")
+        self.refresh.setFlag(nuke.STARTLINE)
+        self.clear_finished = nuke.PyScript_Knob(
+            "clearFinished", "Clear finished 🧹"
+        )
+
+        # Adding knobs
+        for knob in (self.jobs, self.refresh, self.clear_finished):
+            self.addKnob(knob)
+
+        self.poller = job_registry.get_poller(transport.get_transport())
+        self.update_jobs(job_registry.get_registry().jobs())
+
+    def knobChanged(self, knob):
+        # Nuke tells the panel when it's shown and closed, a closed
+        # panel shouldn't keep the poller running
+        if knob.name() == "showPanel":
+            self.watch()
+        elif knob.name() == "hidePanel":
+            self.unwatch()
+        elif knob is self.refresh:
+            self.poller.poll_now()
+        elif knob is self.clear_finished:
+            job_registry.get_registry().clear_finished()
+            self.update_jobs(job_registry.get_registry().jobs())
+
+    def watch(self):
+        """Start receiving the statuses of the poller."""
+        self.poller.add_listener(self.__jobs_polled)
+        self.poller.poll_now()
+
+    def unwatch(self):
+        """Stop receiving the statuses, when the panel is closed."""
+        self.poller.remove_listener(self.__jobs_polled)
+
+    def update_jobs(self, jobs):
+        """Show the jobs in the panel, needs to run in the main thread."""
+        if not jobs:
+            self.jobs.setValue("No jobs submitted in this session.")
+            return
+
+        rows = [
+            "<tr><th align=left>Job</th><th align=left>Status</th>"
+            "<th align=right>Tasks</th><th align=left>JobID</th></tr>"
+        ]
+        for job in jobs:
+            rows.append(
+                "<tr><td>%s</td><td><font color=%s>%s</font></td>"
+                "<td align=right>%s</td><td>%s</td></tr>"
+                % (
+                    job["name"] or job["write"],
+                    STATUS_COLORS.get(job["status"], "#aaaaaa"),
+                    job["status"],
+                    "%i/%i" % (job["completed"], job["tasks"])
+                    if job["tasks"]
+                    else "",
+                    job["job_id"],
+                )
+            )
+
+        self.jobs.setValue("<table cellspacing=6>%s</table>" % "".join(rows))
+
+    def __jobs_polled(self, jobs):
+        """Called from the poll thread, so the panel is updated later."""
+        nuke.executeInMainThread(self.update_jobs, args=(jobs,))
+
+
+# Panel shared by this session, so the poller has a single listener
+_panel = None
+
+
+def show_monitor():
+    """Show the monitor panel with the jobs submitted in this session."""
+    global _panel
+
+    if _panel is None:
+        _panel = MonitorPanel()
+
+    _panel.watch()
+    _panel.show()
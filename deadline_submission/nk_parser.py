@@ -0,0 +1,652 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to read Nuke scripts without Nuke.
+
+The script is memory mapped and read line by line, so large scripts
+are never loaded as a single string. While reading, the node graph is
+rebuilt using the stack of the .nk format:
+- every node takes its inputs from the top of the stack (the top of
+  the stack is input 0) and is pushed onto the stack itself
+- set N1234 [stack 0] remembers the top of the stack
+- push $N1234 pushes a remembered node, push 0 an empty input
+- the nodes of a Group follow the Group itself, ending with end_group
+
+The parsed nodes offer the parts of the Nuke API used by the submitter
+(Class, name, fullName, knob, input, inputs, nodes, output), so the
+UpstreamIndex and the checks of the SanityCheck can use them directly.
+
+Usage:
+    script = parse_script("/path/to/script.nk")
+    write = script.to_node("Write1")
+    index = UpstreamIndex(write)
+
+It can also be used from the command line to check Write nodes:
+    python nk_parser.py /path/to/script.nk Write1 Write2
+
+"""
+
+import mmap
+import os
+import re
+import sys
+
+# Knobs kept for every node, other knobs are skipped to keep the index
+# small. More knobs can be kept by providing them to parse_script().
+INDEXED_KNOBS = {
+    "disable",
+    "file",
+    "first_frame",
+    "format",
+    "last_frame",
+    "name",
+    "number",
+    # Used to estimate the memory and time reach of a job
+    "channels",
+    "framestolookat",
+    "increment",
+    "numframes",
+    "shutter",
+    "shutterTime",
+    "time_offset",
+}
+
+# Values of knobs that Nuke doesn't write when they are default
+DEFAULT_VALUES = {
+    "disable": False,
+    "number": 0,
+}
+
+# Commands that contain a block, but don't create a node
+BLOCK_COMMANDS = {"add_layer", "define_window_layout_xml"}
+
+_NODE_START = re.compile(r"^(\s*)(clone\s+)?(\S+)(?:\s+(\S+))?\s*\{(.*)$")
+_SET_STACK = re.compile(r"^\s*set\s+(\S+)\s+\[stack\s+(\d+)\]")
+_PUSH = re.compile(r"^\s*push\s+(\S+)")
+_INPUTS = re.compile(r"^(\d+)(?:\+(\d+))?$")
+_VERSION = re.compile(r"^version\s+(\d+\.\d+)")
+
+
+class ParseError(Exception):
+    """Raised when the script can't be read."""
+
+
+class ParsedKnob(object):
+    """Knob of a parsed node, holding the value as written in the script."""
+
+    def __init__(self, name, value):
+        self.__name = name
+        self.__value = value
+
+    def name(self):
+        return self.__name
+
+    def value(self):
+        return self.__value
+
+    def getValue(self):
+        return self.__value
+
+
+class ParsedFormat(object):
+    """Format of the Root, for example "1920 1080 0 0 1920 1080 1 HD"."""
+
+    def __init__(self, value):
+        parts = str(value).split()
+        numbers = []
+        for part in parts:
+            try:
+                numbers.append(float(part))
+            except ValueError:
+                break
+
+        self.__width = int(numbers[0]) if len(numbers) > 1 else 0
+        self.__height = int(numbers[1]) if len(numbers) > 1 else 0
+        self.__pixel_aspect = numbers[6] if len(numbers) > 6 else 1.0
+        self.__name = parts[-1] if len(parts) > len(numbers) else ""
+
+    def width(self):
+        return self.__width
+
+    def height(self):
+        return self.__height
+
+    def pixelAspect(self):
+        return self.__pixel_aspect
+
+    def name(self):
+        return self.__name
+
+
+class ParsedNode(object):
+    """Node read from a script."""
+
+    def __init__(self, node_class, knobs, parent=None, line=0):
+        self.__class = node_class
+        self._knobs = knobs
+        self.parent = parent
+        self.line = line
+        self.script = None
+        self.input_count = 1
+        self._inputs = []
+
+    def Class(self):
+        return self.__class
+
+    def name(self):
+        return self._knobs.get("name", "")
+
+    def fullName(self):
+        if self.parent is None or self.parent.Class() == "Root":
+            return self.name()
+        return "%s.%s" % (self.parent.fullName(), self.name())
+
+    def knob(self, name):
+        if name in self._knobs:
+            return ParsedKnob(name, self._knobs[name])
+        if name in DEFAULT_VALUES:
+            return ParsedKnob(name, DEFAULT_VALUES[name])
+        return None
+
+    def knobs(self):
+        return dict(
+            (name, ParsedKnob(name, value))
+            for name, value in self._knobs.items()
+        )
+
+    def __getitem__(self, name):
+        knob = self.knob(name)
+        if knob is None:
+            raise NameError("unknown knob %s" % name)
+        return knob
+
+    def input(self, index):
+        if 0 <= index < len(self._inputs):
+            return self._inputs[index]
+        return None
+
+    def inputs(self):
+        return len(self._inputs)
+
+    def dependencies(self, what=None):
+        return [node for node in self._inputs if node is not None]
+
+    def firstFrame(self):
+        return self.script.first_frame()
+
+    def lastFrame(self):
+        return self.script.last_frame()
+
+    def format(self):
+        return self.script.format()
+
+    def __repr__(self):
+        return "<%s %s>" % (self.__class, self.fullName())
+
+
+class ParsedGroup(ParsedNode):
+    """Group (or Gizmo) read from a script, containing other nodes."""
+
+    def __init__(self, node, children=None):
+        ParsedNode.__init__(
+            self, node.Class(), node._knobs, node.parent, node.line
+        )
+        self.script = node.script
+        self.input_count = node.input_count
+        self._inputs = node._inputs
+        self.children = children or []
+
+    def nodes(self):
+        return list(self.children)
+
+    def output(self):
+        for node in self.children:
+            if node.Class() == "Output":
+                return node
+        return None
+
+
+class ParsedScript(object):
+    """
+    All nodes read from a script.
+
+    The Root node contains the settings of the script, nodes contains
+    the nodes outside of Groups. The version is the Nuke version the
+    script was saved with, for example "13.2".
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.root = None
+        self.nodes = []
+        self.version = None
+
+    def first_frame(self):
+        return int(self.__root_value("first_frame", 1))
+
+    def last_frame(self):
+        return int(self.__root_value("last_frame", 100))
+
+    def format(self):
+        return ParsedFormat(self.__root_value("format", ""))
+
+    def name(self):
+        """Return the path of the script, as Nuke would."""
+        return self.__root_value("name", self.path)
+
+    def all_nodes(self, node_class=None, group=None):
+        """
+        Return all nodes, including the nodes inside Groups. If
+        provided, only the nodes of the class are returned.
+        """
+        nodes = []
+        stack = list(reversed(group.nodes() if group else self.nodes))
+        while stack:
+            node = stack.pop()
+            if node_class is None or node.Class() == node_class:
+                nodes.append(node)
+            if isinstance(node, ParsedGroup):
+                stack.extend(reversed(node.children))
+        return nodes
+
+    def to_node(self, full_name):
+        """Return the node with the full name, for example Group1.Blur1."""
+        nodes = self.nodes
+        node = None
+        for name in full_name.split("."):
+            node = None
+            for child in nodes:
+                if child.name() == name:
+                    node = child
+                    break
+            if node is None:
+                return None
+            nodes = node.nodes() if isinstance(node, ParsedGroup) else []
+        return node
+
+    def __root_value(self, knob_name, default):
+        if self.root is None:
+            return default
+        knob = self.root.knob(knob_name)
+        if knob is None or knob.value() in (None, ""):
+            return default
+        return knob.value()
+
+
+def parse_value(value):
+    """
+    Convert a knob value as written in the script to a Python value.
+    Booleans and numbers are converted, quoted strings are unquoted and
+    everything else (like expressions) is returned as written.
+    """
+    value = value.strip()
+
+    if value == "true":
+        return True
+    if value == "false":
+        return False
+
+    if len(value) > 1 and value[0] == '"' and value[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", value[1:-1])
+
+    # Braces quote a value, double braces are expressions or curves
+    if value.startswith("{") and not value.startswith("{{"):
+        if value.endswith("}"):
+            return value[1:-1]
+
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def _brace_depth(line, depth, in_string):
+    """
+    Return the brace depth and string state after the line.
+
+    Quotes only start a string directly inside a node, inside braces
+    they are part of the value. Braces inside strings are ignored.
+    """
+    # Most lines don't contain quotes or escapes, so just count
+    if '"' not in line and "\\" not in line and not in_string:
+        return depth + line.count("{") - line.count("}"), False
+
+    escaped = False
+    for character in line:
+        if escaped:
+            escaped = False
+        elif character == "\\":
+            escaped = True
+        elif in_string:
+            if character == '"':
+                in_string = False
+        elif character == '"' and depth <= 1:
+            in_string = True
+        elif character == "{":
+            depth += 1
+        elif character == "}":
+            depth -= 1
+
+    return depth, in_string
+
+
+def _indentation(line):
+    return len(line) - len(line.lstrip(" "))
+
+
+def _lines(path):
+    """Yield the decoded lines of the file, using a memory map."""
+    with open(path, "rb") as script_file:
+        if not os.fstat(script_file.fileno()).st_size:
+            return
+
+        with mmap.mmap(
+            script_file.fileno(), 0, access=mmap.ACCESS_READ
+        ) as script_map:
+            for line in iter(script_map.readline, b""):
+                yield line.decode("utf-8", "replace").rstrip("\r\n")
+
+
+class _Parser(object):
+    """Rebuilds the node graph of a script, one line at a time."""
+
+    def __init__(self, path, knobs):
+        self.script = ParsedScript(path)
+        self.knobs = INDEXED_KNOBS.union(knobs)
+
+        # Every Group gets its own stack, the outer ones are kept here
+        self.stack = []
+        self.groups = []
+        self.variables = {}
+
+        # Node being read, and the last node read (which is a
+        # Group when the next lines are indented further)
+        self.node = None
+        self.node_indentation = 0
+        self.depth = 0
+        self.in_string = False
+        self.skipping = False
+        self.closed = None
+
+        self.names = {}
+
+    def parse(self):
+        for number, line in enumerate(_lines(self.script.path), 1):
+            if self.node is not None or self.skipping:
+                self.__node_line(line)
+                continue
+
+            if not line.strip():
+                continue
+
+            if self.closed is not None:
+                self.__check_group(line)
+
+            self.__command(line, number)
+
+        if self.node is not None:
+            raise ParseError(
+                "%s: node %s is never closed"
+                % (self.script.path, self.node.Class())
+            )
+
+        return self.script
+
+    def __command(self, line, number):
+        """Handle a line outside of a node."""
+        stripped = line.strip()
+
+        if stripped == "end_group":
+            self.__end_group()
+            return
+
+        match = _VERSION.match(line)
+        if match:
+            self.script.version = match.group(1)
+            return
+
+        match = _SET_STACK.match(line)
+        if match:
+            index = int(match.group(2))
+            if index < len(self.stack):
+                self.variables[match.group(1)] = self.stack[-1 - index]
+            return
+
+        match = _PUSH.match(line)
+        if match:
+            value = match.group(1)
+            if value.startswith("$"):
+                self.stack.append(self.variables.get(value[1:]))
+            else:
+                self.stack.append(None)
+            return
+
+        match = _NODE_START.match(line)
+        if not match:
+            return
+
+        indentation, clone, first, second, rest = match.groups()
+
+        # The block is closed on the same line, or it's not a node
+        depth, in_string = _brace_depth("{" + rest, 0, False)
+        if first in BLOCK_COMMANDS or (depth <= 0 and not clone):
+            self.skipping = depth > 0 or in_string
+            self.depth, self.in_string = depth, in_string
+            return
+
+        knobs = {}
+        if clone:
+            # First clone: clone node1a2b|Blur|1234 Blur {
+            # Other clones: clone $C1a2b {
+            original = self.variables.get(first[1:])
+            if first.startswith("$") and original is not None:
+                node_class = original.Class()
+                knobs.update(original._knobs)
+                knobs.pop("name", None)
+            elif second:
+                node_class = second
+            else:
+                node_class = (first.split("|") + [""])[1]
+        else:
+            node_class = first
+
+        parent = self.groups[-1][0] if self.groups else None
+        self.node = ParsedNode(node_class, knobs, parent=parent, line=number)
+        self.node.script = self.script
+        self.node_indentation = len(indentation)
+        self.depth = 1
+        self.in_string = False
+        self.__knob_line(rest)
+        if depth <= 0:
+            self.__close_node()
+
+    def __node_line(self, line):
+        """Handle a line inside a node (or a skipped block)."""
+        depth = self.depth
+        in_string = self.in_string
+
+        self.depth, self.in_string = _brace_depth(line, depth, in_string)
+
+        if self.skipping:
+            if self.depth <= 0 and not self.in_string:
+                self.skipping = False
+                self.depth = 0
+            return
+
+        # Knobs are only read directly inside the node
+        if depth == 1 and not in_string:
+            self.__knob_line(line)
+
+        if self.depth <= 0 and not self.in_string:
+            self.__close_node()
+
+    def __knob_line(self, line):
+        """Store the knob on the line, if it's one we keep."""
+        parts = line.strip().split(None, 1)
+        if not parts or parts[0] == "}":
+            return
+
+        name = parts[0]
+        value = parts[1] if len(parts) > 1 else ""
+
+        if name == "inputs":
+            match = _INPUTS.match(value.strip())
+            if match:
+                self.node.input_count = int(match.group(1)) + int(
+                    match.group(2) or 0
+                )
+            return
+
+        if name not in self.knobs:
+            return
+
+        # Values continuing on the next lines are not kept
+        depth, in_string = _brace_depth(value, 1, False)
+        if depth != 1 or in_string:
+            return
+
+        self.node._knobs[name] = parse_value(value)
+
+    def __close_node(self):
+        """Connect the read node to its inputs, and push it."""
+        node = self.node
+        self.node = None
+        self.depth = 0
+
+        if node.Class() == "Root":
+            self.script.root = node
+            return
+
+        inputs = []
+        for _ in range(node.input_count):
+            inputs.append(self.stack.pop() if self.stack else None)
+        node._inputs = inputs
+
+        # Nodes without a name get one, like Nuke would
+        if not node.name():
+            count = self.names.get(node.Class(), 0) + 1
+            self.names[node.Class()] = count
+            node._knobs["name"] = "%s%i" % (node.Class(), count)
+
+        self.__add(node)
+        self.stack.append(node)
+
+        self.closed = (node, self.node_indentation)
+
+    def __check_group(self, line):
+        """
+        The nodes inside a Group are indented one step further than the
+        Group itself. If the line after a node is indented further, or
+        is the end_group of the node, the node is a Group.
+        """
+        node, indentation = self.closed
+        self.closed = None
+
+        line_indentation = _indentation(line)
+        if (
+            node.Class() == "Group"
+            or line_indentation > indentation
+            or (
+                line.strip() == "end_group"
+                and line_indentation == indentation
+            )
+        ):
+            group = ParsedGroup(node)
+            self.__replace(node, group)
+
+            # The Group itself is pushed once its nodes are read
+            self.stack.pop()
+            self.groups.append((group, self.stack))
+            self.stack = []
+
+    def __end_group(self):
+        """Go back to the stack outside of the Group."""
+        if not self.groups:
+            return
+
+        group, self.stack = self.groups.pop()
+        self.stack.append(group)
+
+    def __add(self, node):
+        if self.groups:
+            self.groups[-1][0].children.append(node)
+        else:
+            self.script.nodes.append(node)
+
+    def __replace(self, node, group):
+        """Replace the node by the Group created from it."""
+        nodes = self.groups[-1][0].children if self.groups else None
+        if nodes is None:
+            nodes = self.script.nodes
+        nodes[nodes.index(node)] = group
+
+        # Update the variables pointing to the node
+        for name, value in self.variables.items():
+            if value is node:
+                self.variables[name] = group
+
+
+def parse_script(path, knobs=()):
+    """
+    Read the script at the path, returning a ParsedScript.
+
+    Only the knobs in INDEXED_KNOBS are kept, other knobs can be
+    kept by providing their names.
+    """
+    try:
+        return _Parser(path, set(knobs)).parse()
+    except OSError as error:
+        raise ParseError("Can't read %s: %s" % (path, error))
+
+
+def main(arguments):
+    """Command line interface to check Write nodes of a script."""
+    if not arguments:
+        print("Usage: nk_parser.py script.nk [Write nodes]")
+        return 1
+
+    # Import here, so the parser itself doesn't need the checks
+    from sanity_check import SanityCheck
+
+    script = parse_script(arguments[0])
+    print(
+        "%s: %i nodes, frames %i-%i, format %ix%i"
+        % (
+            script.name(),
+            len(script.all_nodes()),
+            script.first_frame(),
+            script.last_frame(),
+            script.format().width(),
+            script.format().height(),
+        )
+    )
+
+    write_names = arguments[1:] or [
+        node.fullName() for node in script.all_nodes("Write")
+    ]
+
+    failed = False
+    for write_name in write_names:
+        write = script.to_node(write_name)
+        check = SanityCheck().validate_offline(write, write_name)
+        failed = failed or not check["validated"]
+
+        if check["errors"]:
+            print("\n".join(check["errors"]))
+        else:
+            print(
+                "%s: OK (%i upstream nodes)"
+                % (write_name, len(check["upstream_index"]))
+            )
+        if check["limit_groups"]:
+            print("  limits: %s" % ", ".join(sorted(check["limit_groups"])))
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
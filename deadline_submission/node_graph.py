@@ -0,0 +1,166 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to index the upstream node graph of a node.
+
+Instead of searching the whole script for every check, the nodes
+feeding the submitted node are collected in a single traversal.
+Groups and Gizmos are entered, so nodes inside of them are found as
+well. Disabled nodes only pass through their first input, so the
+branches behind their other inputs are skipped, just like Nuke does
+while rendering.
+
+"""
+
+from collections import deque
+
+# Node classes changing the frame that is read from their input. A job
+# can only wait frame by frame on another job if none of these
+# are in between.
+TIME_NODE_CLASSES = {
+    "FrameBlend",
+    "FrameHold",
+    "FrameRange",
+    "Kronos",
+    "OFlow2",
+    "Retime",
+    "TimeBlur",
+    "TimeClip",
+    "TimeEcho",
+    "TimeOffset",
+    "TimeWarp",
+}
+
+
+def is_group(node):
+    """
+    Check if the node is a Group (or Gizmo) containing other nodes.
+
+    Checked via the available functions instead of the class, so nodes
+    that are not coming from a Nuke session can be indexed as well.
+    """
+    return callable(getattr(node, "nodes", None)) and callable(
+        getattr(node, "output", None)
+    )
+
+
+def is_disabled(node):
+    """Check if the disable knob of the node is set."""
+    disable_knob = node.knob("disable")
+    if disable_knob is None:
+        return False
+
+    # Scripts read by nk_parser keep expressions like {{$gui}} as
+    # written. They can't be evaluated, so the node counts as enabled.
+    value = disable_knob.value()
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true")
+
+    return bool(value)
+
+
+class UpstreamIndex(object):
+    """
+    Index of all nodes upstream of the provided node, including the
+    node itself.
+
+    The index contains:
+    - nodes: all found nodes, in the order they were found
+    - classes: dictionary with the node class as key and a list of
+      nodes as value, for example {"Blur": [Blur1, Blur2]}
+    - disabled: set with the full names of the disabled nodes
+    - depth: dictionary with the full name as key and the amount of
+      nodes between the node and the indexed node as value
+
+    If stop_classes is provided, enabled nodes of these classes are
+    added to the index, but their inputs are not followed. This can be
+    used to find the nearest upstream Write nodes of a Write node.
+
+    Usage:
+        index = UpstreamIndex(nuke.toNode("Write1"))
+        blurs = index.nodes_of_class("Blur")
+    """
+
+    def __init__(self, node, stop_classes=()):
+        self.node = node
+        self.stop_classes = set(stop_classes)
+        self.nodes = []
+        self.classes = {}
+        self.disabled = set()
+        self.depth = {}
+
+        self.__index()
+
+    def nodes_of_class(self, node_class, include_disabled=False):
+        """
+        Return all found nodes of the provided class.
+
+        Disabled nodes are left out, unless include_disabled is True.
+        """
+        nodes = self.classes.get(node_class, [])
+
+        if include_disabled:
+            return list(nodes)
+
+        return [
+            node for node in nodes if node.fullName() not in self.disabled
+        ]
+
+    def is_disabled(self, node):
+        """Check if the node has been found as a disabled node."""
+        return node.fullName() in self.disabled
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __index(self):
+        """
+        Walk breadth first through the inputs of the node, so the
+        depth of every node is the shortest distance to the node.
+
+        Every item in the queue contains the node, its depth and the
+        Groups we are in, so an Input node inside a Group can continue
+        with the matching input of the Group itself.
+        """
+        queue = deque([(self.node, 0, ())])
+        visited = set()
+
+        while queue:
+            node, depth, groups = queue.popleft()
+
+            full_name = node.fullName()
+            if full_name in visited:
+                continue
+            visited.add(full_name)
+
+            # Adding node to the index
+            self.nodes.append(node)
+            self.classes.setdefault(node.Class(), []).append(node)
+            self.depth[full_name] = depth
+
+            # Disabled nodes only pass through their first input
+            if is_disabled(node):
+                self.disabled.add(full_name)
+                inputs = [node.input(0)]
+
+            # Don't look any further than the stop classes
+            elif node is not self.node and node.Class() in self.stop_classes:
+                continue
+
+            # Continue inside the Group, starting at its Output node
+            elif is_group(node) and node.output() is not None:
+                queue.append((node.output(), depth + 1, groups + (node,)))
+                continue
+
+            # Continue with the matching input of the Group we are in
+            elif node.Class() == "Input" and groups:
+                number = int(node.knob("number").value())
+                inputs = [groups[-1].input(number)]
+                groups = groups[:-1]
+
+            else:
+                inputs = [node.input(index) for index in range(node.inputs())]
+
+            for input_node in inputs:
+                if input_node is not None:
+                    queue.append((input_node, depth + 1, groups))
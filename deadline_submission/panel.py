@@ -9,6 +9,10 @@ import nuke
 import nukescripts
 import os
 
+import input_footprint
+import memory_budget
+from job_parameters import render_mode_settings
+
 
 class SubmissionPanel(nukescripts.PythonPanel):
     """
@@ -16,22 +20,57 @@ class SubmissionPanel(nukescripts.PythonPanel):
 
     Will ask the user for the following parameters:
     - Submission name
+    - Department, Pool, Group, machine limit and Limit
     - Framerange
+    - Only render missing frames
+    - Render preview frames first
     - Render mode
+    - Submit upstream Write nodes as dependencies
+    - Submit a pruned snapshot of the script
+    - Copy the input frames to the worker before every task
+    - Profile the time spent in every node
 
-    Will require a node as input
+    Will require a node as input. If the upstream index of the node is
+    provided, a warning is shown when the render mode won't fit in the
+    memory of a worker. If the input footprint of the node is provided
+    (a Future of input_footprint.scan()), a warning is shown when the
+    job is likely I/O-bound as soon as the inputs are scanned. If the
+    repository metadata is provided, the Pools, Groups and Limits are
+    offered as dropdowns.
     """
 
-    def __init__(self, node):
+    def __init__(
+        self, node, upstream_index=None, footprint=None, metadata=None
+    ):
         # Header
         nukescripts.PythonPanel.__init__(self, "Submit to Deadline 📤")
 
+        self.submission_node = node
+        self.upstream_index = upstream_index
+        self.footprint = None
+        self.metadata = metadata
+
         # Defining knobs
         self.submission_name = nuke.String_Knob(
             "submissionName", "Submission name 📝"
         )
         self.divider = nuke.Text_Knob("dividerOne", "")
         self.priority = nuke.Int_Knob("priority", "Priority 🚦")
+        self.department = nuke.String_Knob("department", "Department 🏢")
+        self.pool = nuke.Enumeration_Knob("pool", "Pool 🗂", ["none"])
+        self.group = nuke.Enumeration_Knob("group", "Group 🖥", ["none"])
+        self.group.clearFlag(nuke.STARTLINE)
+        self.machine_limit = nuke.Int_Knob("machineLimit", "Machine limit 🔢")
+        self.machine_limit.setTooltip(
+            "Maximum amount of machines rendering the job at the same "
+            "time, 0 means no limit."
+        )
+        self.limit = nuke.Enumeration_Knob("limit", "Limit 🔒", ["none"])
+        self.limit.setTooltip(
+            "Deadline Limit every task takes a stub of, next to the "
+            "Limits of license limited nodes."
+        )
+        self.limit.clearFlag(nuke.STARTLINE)
         self.framerange_select = nuke.Enumeration_Knob(
             "frameRangeSelect", "Frame range 🎞", ["global", "input", "in-out"]
         )
@@ -41,11 +80,59 @@ class SubmissionPanel(nukescripts.PythonPanel):
             "%s-%s" % (nuke.root().firstFrame(), nuke.root().lastFrame()),
         )
         self.framerange.clearFlag(nuke.STARTLINE)
+        self.missing_frames = nuke.Boolean_Knob(
+            "missingFrames", "Only missing frames 🩹"
+        )
+        self.missing_frames.setTooltip(
+            "Only render the frames that are missing, empty or "
+            "older than the script."
+        )
+        self.missing_frames.setFlag(nuke.STARTLINE)
+        self.preview_first = nuke.Boolean_Knob(
+            "previewFirst", "Preview frames first 👀"
+        )
+        self.preview_first.setTooltip(
+            "Render the first, last, middle and every 10th frame first in "
+            "a high priority preview job, the other frames are rendered "
+            "by a second job."
+        )
+        self.preview_first.setFlag(nuke.STARTLINE)
         self.render_mode = nuke.Enumeration_Knob(
             "renderMode",
             "Mode 🏋️",
-            ["light", "medium", "heavy"],
+            ["auto", "light", "medium", "heavy"],
+        )
+        self.memory_warning = nuke.Text_Knob("memoryWarning", "", "")
+        self.upstream_writes = nuke.Boolean_Knob(
+            "upstreamWrites", "Submit upstream Writes 🔗"
         )
+        self.upstream_writes.setTooltip(
+            "Submit the Write nodes upstream of this node as their own "
+            "jobs, so precomps render in parallel before this node."
+        )
+        self.upstream_writes.setFlag(nuke.STARTLINE)
+        self.snapshot = nuke.Boolean_Knob("snapshot", "Pruned script 🪶")
+        self.snapshot.setTooltip(
+            "Submit a snapshot of the script only containing the nodes "
+            "needed to render this node, so it loads faster on the farm."
+        )
+        self.snapshot.setFlag(nuke.STARTLINE)
+        self.localize_inputs = nuke.Boolean_Knob(
+            "localizeInputs", "Localize inputs 📥"
+        )
+        self.localize_inputs.setTooltip(
+            "Copy the input frames of every task to the worker before "
+            "rendering, so they aren't read over the network."
+        )
+        self.localize_inputs.setFlag(nuke.STARTLINE)
+        self.input_warning = nuke.Text_Knob("inputWarning", "", "")
+        self.profile = nuke.Boolean_Knob("profile", "Profile nodes ⏱")
+        self.profile.setTooltip(
+            "Measure the time spent in every node while rendering. Every "
+            "task writes a profile to a nuke_profiles folder next to the "
+            "output, merge them with profile_report.py."
+        )
+        self.profile.setFlag(nuke.STARTLINE)
         self.divider2 = nuke.Text_Knob("dividerTwo", "")
 
         # Adding all knobs
@@ -53,15 +140,29 @@ class SubmissionPanel(nukescripts.PythonPanel):
             self.submission_name,
             self.divider,
             self.priority,
+            self.department,
+            self.pool,
+            self.group,
+            self.machine_limit,
+            self.limit,
             self.framerange_select,
             self.framerange,
+            self.missing_frames,
+            self.preview_first,
             self.render_mode,
+            self.memory_warning,
+            self.upstream_writes,
+            self.snapshot,
+            self.localize_inputs,
+            self.input_warning,
+            self.profile,
             self.divider2,
         ):
             self.addKnob(knobs)
 
         # Setting initial knob values
         self.priority.setValue(70)
+        self.department.setValue("2D")
 
         # Getting script name
         script_name = nuke.root().knob("name").value()
@@ -69,7 +170,32 @@ class SubmissionPanel(nukescripts.PythonPanel):
         script_name = os.path.splitext(script_name)[0]
 
         self.submission_name.setValue(script_name)
-        self.render_mode.setValue("light")
+        self.render_mode.setValue("auto")
+        self.update_warnings()
+
+        # Cached names of the repository, refreshed in the background
+        if self.metadata is not None:
+            self.update_metadata(self.metadata.get())
+
+        # The inputs are scanned in the background
+        if footprint is not None:
+            footprint.add_done_callback(self.__footprint_scanned)
+
+    def showModalDialog(self):
+        """
+        Show the dialog. The dropdowns are updated when the repository
+        metadata is refreshed while the dialog is open.
+        """
+        if self.metadata is None:
+            return nukescripts.PythonPanel.showModalDialog(self)
+
+        self.metadata.add_listener(self.__metadata_refreshed)
+        try:
+            # A refresh may have finished before listening
+            self.update_metadata(self.metadata.get())
+            return nukescripts.PythonPanel.showModalDialog(self)
+        finally:
+            self.metadata.remove_listener(self.__metadata_refreshed)
 
     # Actions when knobs change
     def knobChanged(self, knob):
@@ -78,7 +204,8 @@ class SubmissionPanel(nukescripts.PythonPanel):
         changes in the dialog
 
         Will check if the changed knob is the framerange,
-        and set the frame range accordingly
+        and set the frame range accordingly. If the render mode
+        or frame range changes, the warnings are updated
         """
 
         # If knob is framerange node, check what the setting is
@@ -107,3 +234,142 @@ class SubmissionPanel(nukescripts.PythonPanel):
                 self.framerange.setValue(
                     nuke.activeViewer().node().knob("frame_range").getValue()
                 )
+
+        # Check if the render mode fits the worker
+        if knob in (self.render_mode, self.framerange, self.framerange_select):
+            self.update_warnings()
+
+    def update_warnings(self):
+        """
+        Show a warning when the tasks of the render mode won't fit in the
+        memory of a worker, and how the job will be rendered instead.
+        Another warning is shown when the tasks are likely I/O-bound.
+        """
+        if self.upstream_index is None:
+            return
+
+        concurrent_tasks, chunk_size = 1, 1
+        try:
+            concurrent_tasks, chunk_size = render_mode_settings(
+                self.render_mode.value(),
+                nuke.root().name(),
+                self.submission_node.fullName(),
+                self.framerange.value(),
+            )
+            warning = memory_budget.memory_warning(
+                self.submission_node,
+                self.upstream_index,
+                concurrent_tasks,
+                chunk_size,
+            )
+
+        # The estimate should never block the submission
+        except Exception:
+            warning = ""
+
+        if warning:
+            warning = "<font color=#e0c050>⚠️ %s</font>" % warning
+        self.memory_warning.setValue(warning)
+
+        # Reading the inputs of a frame takes too long
+        warning = ""
+        if self.footprint and input_footprint.is_io_bound(
+            self.footprint, concurrent_tasks
+        ):
+            warning = (
+                "<font color=#e0c050>⚠️ %s, consider localizing the "
+                "inputs.</font>"
+                % input_footprint.describe(
+                    self.footprint, chunk_size, concurrent_tasks
+                )
+            )
+        self.input_warning.setValue(warning)
+
+    def __footprint_scanned(self, footprint):
+        """Show the warnings of the scanned footprint, from any thread."""
+        nuke.executeInMainThread(
+            self.__update_footprint, args=(footprint.result(),)
+        )
+
+    def __update_footprint(self, footprint):
+        self.footprint = footprint
+        self.update_warnings()
+
+    def update_metadata(self, metadata):
+        """
+        Offer the Pools, Groups and Limits of the repository in the
+        dropdowns, keeping the selected values. Needs to run in the
+        main thread.
+        """
+        for knob, names in (
+            (self.pool, metadata.get("pools")),
+            (self.group, metadata.get("groups")),
+            (self.limit, metadata.get("limits")),
+        ):
+            names = ["none"] + [name for name in names or [] if name != "none"]
+            selected = knob.value()
+            knob.setValues(names)
+            knob.setValue(selected if selected in names else "none")
+
+    def __metadata_refreshed(self, metadata):
+        """Called from the refresh thread, so the panel is updated later."""
+        nuke.executeInMainThread(self.update_metadata, args=(metadata,))
+
+
+class WedgePanel(nukescripts.PythonPanel):
+    """
+    Class containing the dialog for wedge submission
+
+    Will ask the user for the following parameters:
+    - Submission name
+    - Priority
+    - Knob to wedge, for example Defocus1.size
+    - Values of the knob, for example 1,2,4,8 or 0-1x0.25
+    - Frame to render
+
+    Will require the Write node as input.
+    """
+
+    def __init__(self, node):
+        # Header
+        nukescripts.PythonPanel.__init__(self, "Submit wedge to Deadline 🧪")
+
+        self.submission_node = node
+
+        # Defining knobs
+        self.submission_name = nuke.String_Knob(
+            "submissionName", "Submission name 📝"
+        )
+        self.priority = nuke.Int_Knob("priority", "Priority 🚦")
+        self.divider = nuke.Text_Knob("dividerOne", "")
+        self.wedge_knob = nuke.String_Knob("wedgeKnob", "Knob 🎛")
+        self.wedge_knob.setTooltip(
+            "Node and knob to wedge, for example Defocus1.size"
+        )
+        self.values = nuke.String_Knob("values", "Values 🔢")
+        self.values.setTooltip(
+            "Values separated by commas, ranges as start-end with an "
+            "optional step, for example 1,2,4,8 or 0-1x0.25"
+        )
+        self.frame = nuke.Int_Knob("frame", "Frame 🎞")
+        self.divider2 = nuke.Text_Knob("dividerTwo", "")
+
+        # Adding all knobs
+        for knobs in (
+            self.submission_name,
+            self.priority,
+            self.divider,
+            self.wedge_knob,
+            self.values,
+            self.frame,
+            self.divider2,
+        ):
+            self.addKnob(knobs)
+
+        # Setting initial knob values
+        script_name = nuke.root().knob("name").value()
+        script_name = os.path.splitext(os.path.basename(script_name))[0]
+
+        self.submission_name.setValue("%s_wedge" % script_name)
+        self.priority.setValue(70)
+        self.frame.setValue(nuke.frame())
@@ -0,0 +1,333 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to merge the performance profiles of a job into a hotspot report.
+
+Jobs submitted with "Profile nodes" let every task write a profile XML
+(the -Pf argument of Nuke) to a nuke_profiles folder next to the
+output. Every profile contains the time spent in every node (store,
+validate, request and engine) for the frames of the task. The profiles
+of all tasks are merged into the total and per frame time of every
+node and every node class, so the nodes making a render slow stand out.
+
+Works without Nuke, on a folder of profiles or single files:
+    python profile_report.py /renders/shot/nuke_profiles --top 20
+
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import xml.etree.ElementTree as ElementTree
+
+# Nuke writes the time taken in microseconds
+TIME_UNIT = 1000000.0
+
+# Tags holding the time taken, in order of preference
+TIME_TAGS = ("timetakenwall", "timetakencpu")
+
+
+def _tag(element):
+    """Return the tag of the element in lower case, without namespace."""
+    return element.tag.rsplit("}", 1)[-1].lower()
+
+
+def _field(element, names):
+    """
+    Return the value of the first attribute or child element of the
+    element with one of the names, ignoring case.
+    """
+    attributes = dict(
+        (key.lower(), value) for key, value in element.attrib.items()
+    )
+    for name in names:
+        if name in attributes:
+            return attributes[name]
+
+    for child in element:
+        if _tag(child) in names and child.text:
+            return child.text.strip()
+
+    return None
+
+
+def _time_taken(node_element):
+    """Return the time spent in the node in seconds, over all categories."""
+    for time_tag in TIME_TAGS:
+        times = [
+            element.text
+            for element in node_element.iter()
+            if _tag(element) == time_tag and element.text
+        ]
+        if times:
+            return sum(float(value) for value in times) / TIME_UNIT
+
+    return 0.0
+
+
+def _frame_from_path(path):
+    """Return the last number in the file name, the frame of the task."""
+    numbers = re.findall(r"\d+", os.path.basename(path))
+    return int(numbers[-1]) if numbers else None
+
+
+def read_profile(path):
+    """
+    Read a profile XML, returning a list of (frame, node, class, seconds)
+    tuples. If the profile doesn't contain frames, the last number in
+    the file name is used as the frame.
+
+    The file is read incrementally, so large profiles don't have to fit
+    in memory.
+    """
+    timings = []
+    file_frame = _frame_from_path(path)
+
+    # Frames of the frame elements being read, the frame number is
+    # either an attribute or a child element
+    frames = []
+    parents = []
+
+    for event, element in ElementTree.iterparse(path, ("start", "end")):
+        tag = _tag(element)
+
+        if event == "start":
+            if tag == "frame":
+                frames.append(
+                    _field(element, ("value", "number", "time"))
+                )
+            parents.append(tag)
+            continue
+
+        parents.pop()
+
+        if tag == "frame":
+            frames.pop()
+            element.clear()
+
+        elif tag in ("value", "number", "time") and parents[-1:] == [
+            "frame"
+        ]:
+            frames[-1] = frames[-1] or element.text
+
+        elif tag == "node":
+            name = _field(element, ("name", "fullname"))
+            if name:
+                try:
+                    frame = int(float(frames[-1]))
+                except (IndexError, TypeError, ValueError):
+                    frame = file_frame
+
+                timings.append(
+                    (
+                        frame,
+                        name,
+                        _field(element, ("class",)) or "",
+                        _time_taken(element),
+                    )
+                )
+
+            # Nested nodes (inside Groups) shouldn't add up to their parent
+            element.clear()
+
+    return timings
+
+
+def profile_files(paths):
+    """Return the profile XML files of the provided files and folders."""
+    files = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(glob.glob(os.path.join(path, "*.xml")))
+        else:
+            files.extend(glob.glob(path))
+
+    return sorted(set(files))
+
+
+def hotspots(paths):
+    """
+    Merge the profiles of the provided files and folders.
+
+    Will return a dictionary, with the nodes and classes sorted by
+    their total time:
+        {
+            "profiles": 12,
+            "frames": 100,
+            "total": 1250.0,
+            "nodes": [
+                {
+                    "node": "Kronos1",
+                    "class": "Kronos",
+                    "frames": 100,
+                    "total": 900.0,
+                    "per_frame": 9.0,
+                    "share": 0.72,
+                },
+            ],
+            "classes": [
+                {
+                    "class": "Kronos",
+                    "nodes": 1,
+                    "total": 900.0,
+                    "per_frame": 9.0,
+                    "share": 0.72,
+                },
+            ],
+            "errors": ["/renders/nuke_profiles/task_3.xml: ..."],
+        }
+
+    The per frame time is the total time divided by the frames the
+    node (or a node of the class) was profiled in. Unreadable profiles
+    are added to the errors.
+    """
+    nodes = {}
+    all_frames = set()
+    profiles = 0
+    errors = []
+
+    for path in profile_files(paths):
+        try:
+            timings = read_profile(path)
+        except (OSError, ElementTree.ParseError) as error:
+            errors.append("%s: %s" % (path, error))
+            continue
+
+        profiles += 1
+        for frame, name, node_class, seconds in timings:
+            # Profiles without frames count as a frame of their own
+            frame = (path,) if frame is None else frame
+            all_frames.add(frame)
+
+            node = nodes.setdefault(
+                name, {"class": node_class, "frames": set(), "total": 0.0}
+            )
+            node["class"] = node["class"] or node_class
+            node["frames"].add(frame)
+            node["total"] += seconds
+
+    total = sum(node["total"] for node in nodes.values())
+
+    def share(seconds):
+        return seconds / total if total else 0.0
+
+    classes = {}
+    node_results = []
+    for name, node in nodes.items():
+        node_results.append(
+            {
+                "node": name,
+                "class": node["class"],
+                "frames": len(node["frames"]),
+                "total": node["total"],
+                "per_frame": node["total"] / max(len(node["frames"]), 1),
+                "share": share(node["total"]),
+            }
+        )
+
+        node_class = classes.setdefault(
+            node["class"], {"nodes": 0, "frames": set(), "total": 0.0}
+        )
+        node_class["nodes"] += 1
+        node_class["frames"].update(node["frames"])
+        node_class["total"] += node["total"]
+
+    class_results = [
+        {
+            "class": name,
+            "nodes": node_class["nodes"],
+            "total": node_class["total"],
+            "per_frame": node_class["total"]
+            / max(len(node_class["frames"]), 1),
+            "share": share(node_class["total"]),
+        }
+        for name, node_class in classes.items()
+    ]
+
+    return {
+        "profiles": profiles,
+        "frames": len(all_frames),
+        "total": total,
+        "nodes": sorted(node_results, key=lambda node: -node["total"]),
+        "classes": sorted(class_results, key=lambda node: -node["total"]),
+        "errors": errors,
+    }
+
+
+def format_report(report, top=20):
+    """Return the hotspot report as a readable table."""
+    lines = [
+        "%i profile(s), %i frame(s), %.1f s in nodes"
+        % (report["profiles"], report["frames"], report["total"]),
+        "",
+        "%-32s %-16s %10s %12s %7s"
+        % ("node", "class", "total (s)", "per frame (s)", "share"),
+    ]
+    for node in report["nodes"][:top]:
+        lines.append(
+            "%-32s %-16s %10.2f %12.3f %6.1f%%"
+            % (
+                node["node"],
+                node["class"],
+                node["total"],
+                node["per_frame"],
+                node["share"] * 100,
+            )
+        )
+
+    lines += [
+        "",
+        "%-32s %-16s %10s %12s %7s"
+        % ("class", "nodes", "total (s)", "per frame (s)", "share"),
+    ]
+    for node_class in report["classes"][:top]:
+        lines.append(
+            "%-32s %-16i %10.2f %12.3f %6.1f%%"
+            % (
+                node_class["class"],
+                node_class["nodes"],
+                node_class["total"],
+                node_class["per_frame"],
+                node_class["share"] * 100,
+            )
+        )
+
+    for error in report["errors"]:
+        lines.append("Unreadable profile %s" % error)
+
+    return "\n".join(lines)
+
+
+def main(arguments):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "profiles", nargs="+", help="Profile XML files or folders"
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="Amount of nodes and classes to show",
+    )
+    parser.add_argument("--json", help="JSON file to write the report to")
+    options = parser.parse_args(arguments)
+
+    report = hotspots(options.profiles)
+    if not report["profiles"]:
+        print("No profiles found")
+        return 1
+
+    if options.json:
+        with open(options.json, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=4)
+
+    print(format_report(report, options.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,416 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to choose the chunk size and concurrent tasks based on
+the render history of a Write node.
+
+Render statistics of finished jobs are stored locally, per script and
+Write node. For every submission the stored frame time and task
+overhead (the time to start Nuke and load the script) are used to pick
+the combination that renders the frame range in the least time.
+
+If there is no history yet, the presets of the submission panel are
+used instead. The HistoryRecorder records the task times of every job
+submitted in this session when it completes, as a listener of the
+StatusPoller.
+
+Statistics can be recorded from the command line as well:
+    python render_tuning.py record /path/shot_v001.nk Write1 12.5 40
+
+"""
+
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+
+from frames import parse_frame_list
+
+# Keys of a task holding its frames, render time and startup time,
+# as returned by the Web Service or deadlinecommand -GetJobTasks
+TASK_FRAME_KEYS = ("Frames", "TaskFrameString", "TaskFrameList")
+TASK_RENDER_TIME_KEYS = ("RenderTime", "TaskRenderTime", "RndTime")
+TASK_STARTUP_TIME_KEYS = ("StartupTime", "TaskStartupTime")
+TASK_STATUS_KEYS = ("Stat", "Status", "TaskStatus")
+
+# Status of a completed task, as a code or a name
+TASK_COMPLETED = ("5", "Completed")
+
+
+def _seconds(value):
+    """
+    Return a duration in seconds, written as seconds or as a TimeSpan
+    like 1.02:03:04.5 (days, hours, minutes and seconds). Returns None
+    if the duration can't be read.
+    """
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+
+    match = re.match(
+        r"^(?:(\d+)\.)?(\d+):(\d+):(\d+(?:\.\d+)?)$", str(value).strip()
+    )
+    if not match:
+        return None
+
+    days, hours, minutes, seconds = match.groups()
+    return (
+        int(days or 0) * 86400
+        + int(hours) * 3600
+        + int(minutes) * 60
+        + float(seconds)
+    )
+
+
+def parse_task(task):
+    """
+    Return a task as returned by the Web Service or deadlinecommand
+    -GetJobTasks in the format used by RenderStats.record_tasks():
+        {"frames": 3, "render_time": 80.0, "startup_time": 20.0}
+
+    Returns None if the task isn't completed or has no render time.
+    """
+
+    def field(keys):
+        for key in keys:
+            if task.get(key) not in (None, ""):
+                return task[key]
+        return None
+
+    status = field(TASK_STATUS_KEYS)
+    if status is not None and str(status) not in TASK_COMPLETED:
+        return None
+
+    try:
+        frames = len(parse_frame_list(field(TASK_FRAME_KEYS) or ""))
+    except ValueError:
+        return None
+
+    render_time = _seconds(field(TASK_RENDER_TIME_KEYS))
+    if not frames or not render_time:
+        return None
+
+    parsed = {"frames": frames, "render_time": render_time}
+
+    startup_time = _seconds(field(TASK_STARTUP_TIME_KEYS))
+    if startup_time is not None:
+        parsed["startup_time"] = startup_time
+
+    return parsed
+
+
+class RenderStats(object):
+    """
+    Local store containing render statistics per script and Write node.
+
+    Every recorded job adds a sample with the average time per frame,
+    the task overhead and the amount of concurrent tasks it rendered
+    with. Only the latest max_samples samples are kept.
+
+    The version of the script is left out of the key, so a new version
+    of a script uses the history of the previous versions.
+    """
+
+    def __init__(self, path=None, max_samples=20):
+        # The file can be set via the environment,
+        # otherwise the .nuke folder of the user is used
+        if path is None:
+            path = os.getenv(
+                "DEADLINE_SUBMISSION_STATS",
+                os.path.join(
+                    os.path.expanduser("~"),
+                    ".nuke",
+                    "deadline_render_stats.json",
+                ),
+            )
+        self.path = path
+        self.max_samples = max_samples
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def key(script_path, write_node):
+        """
+        Return the key used for the script and Write node, for
+        example "shot_v003.nk" and "Write1" will be "shot.nk:Write1".
+        """
+        script_name = os.path.basename(script_path)
+        script_name = re.sub(r"[._]v\d+", "", script_name)
+        return "%s:%s" % (script_name, write_node)
+
+    def record(
+        self,
+        script_path,
+        write_node,
+        frame_time,
+        task_overhead,
+        concurrent_tasks=1,
+    ):
+        """
+        Record the statistics of a finished job.
+
+        frame_time is the average render time of a single frame in
+        seconds, task_overhead the average time in seconds before
+        a task starts rendering.
+        """
+        key = self.key(script_path, write_node)
+        sample = {
+            "frame_time": float(frame_time),
+            "task_overhead": float(task_overhead),
+            "concurrent_tasks": int(concurrent_tasks),
+            "recorded": time.time(),
+        }
+
+        with self.__lock:
+            stats = self.__load()
+            samples = stats.setdefault(key, [])
+            samples.append(sample)
+            stats[key] = samples[-self.max_samples :]
+            self.__save(stats)
+
+    def record_tasks(
+        self, script_path, write_node, tasks, concurrent_tasks=1
+    ):
+        """
+        Record the statistics using the tasks of a finished job, for
+        example taken from a Deadline job report.
+
+        Every task is a dictionary containing the amount of frames and
+        the total render time of the task in seconds:
+            {"frames": 3, "render_time": 80.0}
+
+        The frame time and task overhead are found by fitting a line
+        through the tasks, as render_time = overhead + frames * frame_time.
+        If all tasks have the same amount of frames, a startup_time key
+        is used for the overhead instead (0 if not available).
+        """
+        tasks = [task for task in tasks if task.get("frames")]
+        if not tasks:
+            return
+
+        frames = [float(task.get("frames")) for task in tasks]
+        render_times = [float(task.get("render_time")) for task in tasks]
+
+        mean_frames = sum(frames) / len(frames)
+        mean_time = sum(render_times) / len(render_times)
+        variance = sum((count - mean_frames) ** 2 for count in frames)
+
+        # Fitting a line through the tasks
+        if variance:
+            frame_time = (
+                sum(
+                    (count - mean_frames) * (render_time - mean_time)
+                    for count, render_time in zip(frames, render_times)
+                )
+                / variance
+            )
+            task_overhead = max(mean_time - frame_time * mean_frames, 0.0)
+
+        # All tasks have the same size, so the overhead can't be fitted
+        else:
+            task_overhead = sum(
+                float(task.get("startup_time", 0)) for task in tasks
+            ) / len(tasks)
+            frame_time = max(mean_time - task_overhead, 0.0) / mean_frames
+
+        self.record(
+            script_path,
+            write_node,
+            max(frame_time, 0.0),
+            task_overhead,
+            concurrent_tasks,
+        )
+
+    def get(self, script_path, write_node):
+        """Return the recorded samples of the script and Write node."""
+        with self.__lock:
+            return self.__load().get(self.key(script_path, write_node), [])
+
+    def __load(self):
+        try:
+            with open(self.path, encoding="utf-8") as stats_json:
+                return json.load(stats_json)
+        except (OSError, ValueError):
+            return {}
+
+    def __save(self, stats):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        temporary_file = self.path + ".tmp"
+        with open(temporary_file, "w", encoding="utf-8") as stats_json:
+            json.dump(stats, stats_json)
+        os.replace(temporary_file, self.path)
+
+
+class RenderTuner(object):
+    """
+    Chooses the concurrent tasks and chunk size using the render history.
+
+    The wall-clock time of a job is estimated as:
+        waves * (task_overhead + chunk_size * frame_time)
+
+    Where waves is the amount of rounds needed to render all tasks on
+    the available slots (workers * concurrent tasks). Running tasks at
+    the same time on a machine slows every task down, this is set by
+    contention: 0.5 means every extra concurrent task makes a frame
+    render 50% slower.
+    """
+
+    concurrent_choices = (1, 2, 3, 4, 5, 8, 10)
+
+    def __init__(self, stats=None, workers=None, contention=0.5):
+        self.stats = stats or RenderStats()
+
+        # Amount of machines expected to pick up the job
+        if workers is None:
+            workers = int(os.getenv("DEADLINE_SUBMISSION_WORKERS", "10"))
+        self.workers = max(workers, 1)
+
+        self.contention = contention
+
+    def suggest(self, script_path, write_node, frame_count):
+        """
+        Return the concurrent tasks and chunk size with the lowest
+        estimated wall-clock time, or None if there is no history.
+        """
+        samples = self.stats.get(script_path, write_node)
+        if not samples or frame_count < 1:
+            return None
+
+        # Converting every sample to the frame time of a single task
+        frame_time = sum(
+            sample.get("frame_time")
+            / self.__slowdown(sample.get("concurrent_tasks", 1))
+            for sample in samples
+        ) / len(samples)
+        task_overhead = sum(
+            sample.get("task_overhead") for sample in samples
+        ) / len(samples)
+
+        best = None
+        for concurrent_tasks in self.concurrent_choices:
+            for chunk_size in range(1, min(frame_count, 100) + 1):
+                tasks = math.ceil(frame_count / chunk_size)
+                slots = self.workers * concurrent_tasks
+                waves = math.ceil(tasks / slots)
+
+                task_time = task_overhead + chunk_size * frame_time * (
+                    self.__slowdown(concurrent_tasks)
+                )
+                wall_time = waves * task_time
+
+                # Equal wall-clock times prefer the lowest farm usage
+                farm_time = tasks * task_time
+
+                score = (round(wall_time, 3), round(farm_time, 3))
+                if best is None or score < best[0]:
+                    best = (score, concurrent_tasks, chunk_size)
+
+        return best[1], best[2]
+
+    def __slowdown(self, concurrent_tasks):
+        return 1.0 + self.contention * (max(concurrent_tasks, 1) - 1)
+
+
+class HistoryRecorder(object):
+    """
+    Records the render statistics of the jobs submitted in this session.
+
+    Add it as a listener to the StatusPoller: when a job is completed,
+    its tasks are asked from Deadline once and recorded for the script
+    and Write node of the job.
+    """
+
+    def __init__(self, transport, stats=None):
+        self.transport = transport
+        self.stats = stats or RenderStats()
+
+        self.__recorded = set()
+        self.__lock = threading.Lock()
+
+    def __call__(self, jobs):
+        for job in jobs:
+            if job.get("status") != "Completed":
+                continue
+            if not job.get("script") or not job.get("write"):
+                continue
+
+            with self.__lock:
+                if job["job_id"] in self.__recorded:
+                    continue
+                self.__recorded.add(job["job_id"])
+
+            # Without task times there is nothing to learn from the job
+            try:
+                tasks = self.transport.job_tasks(job["job_id"])
+            except Exception:
+                continue
+
+            self.stats.record_tasks(
+                job["script"],
+                job["write"],
+                tasks,
+                job.get("concurrent_tasks", 1),
+            )
+
+
+# Recorder shared by this session
+_recorder = None
+_recorder_lock = threading.Lock()
+
+
+def get_recorder(transport):
+    """Return the history recorder shared by this session."""
+    global _recorder
+
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = HistoryRecorder(transport)
+
+        # Always use the latest configured transport
+        _recorder.transport = transport
+
+        return _recorder
+
+
+def main(arguments):
+    """Command line interface to record and inspect statistics."""
+    stats = RenderStats()
+
+    if len(arguments) >= 5 and arguments[0] == "record":
+        concurrent_tasks = arguments[5] if len(arguments) > 5 else 1
+        stats.record(
+            arguments[1],
+            arguments[2],
+            arguments[3],
+            arguments[4],
+            concurrent_tasks,
+        )
+        return 0
+
+    if len(arguments) >= 4 and arguments[0] == "suggest":
+        suggestion = RenderTuner(stats).suggest(
+            arguments[1], arguments[2], int(arguments[3])
+        )
+        if suggestion is None:
+            print("No render history found")
+        else:
+            print("ConcurrentTasks=%i\nChunkSize=%i" % suggestion)
+        return 0
+
+    print(
+        "Usage:"
+        "\n  render_tuning.py record <script> <write> <frame time> "
+        "<task overhead> [concurrent tasks]"
+        "\n  render_tuning.py suggest <script> <write> <frame count>"
+    )
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
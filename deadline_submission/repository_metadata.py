@@ -0,0 +1,207 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module caching the Pools, Groups and Limits of the Deadline repository.
+
+Asking the repository takes a deadlinecommand call (or a request) for
+every list, which is too slow to do every time the panel opens. The
+names are kept in memory and in ~/.nuke/deadline_repository.json, so
+the panel shows them instantly, even in a new session. The location
+can be changed with the DEADLINE_SUBMISSION_METADATA environment
+variable.
+
+Names older than the TTL (10 minutes by default, set in seconds via
+DEADLINE_SUBMISSION_METADATA_TTL) are refreshed in a background thread,
+after which the listeners (for example an open panel) receive them.
+
+"""
+
+import json
+import os
+import threading
+import time
+
+# Names of the metadata, with the transport method returning them
+METADATA_METHODS = {
+    "pools": "pool_names",
+    "groups": "group_names",
+    "limits": "limit_group_names",
+}
+
+# Seconds before a failed refresh is tried again
+RETRY_DELAY = 60
+
+
+def metadata_ttl():
+    """Return the seconds the metadata stays fresh, set via the environment."""
+    try:
+        return float(os.getenv("DEADLINE_SUBMISSION_METADATA_TTL", 600))
+    except ValueError:
+        return 600.0
+
+
+class RepositoryMetadata(object):
+    """
+    Cache of the Pools, Groups and Limits of the repository.
+
+    get() never waits on Deadline: it returns the cached names, and
+    starts a refresh in the background when they are older than the
+    TTL. Listeners are called from the background thread with the
+    new names after every refresh.
+    """
+
+    def __init__(self, transport, path=None, ttl=None):
+        # The file can be set via the environment,
+        # otherwise the .nuke folder of the user is used
+        if path is None:
+            path = os.getenv(
+                "DEADLINE_SUBMISSION_METADATA",
+                os.path.join(
+                    os.path.expanduser("~"),
+                    ".nuke",
+                    "deadline_repository.json",
+                ),
+            )
+        self.path = path
+        self.ttl = metadata_ttl() if ttl is None else ttl
+        self.transport = transport
+
+        self.__metadata = None
+        self.__failed = 0
+        self.__thread = None
+        self.__listeners = []
+        self.__lock = threading.Lock()
+
+    def add_listener(self, listener):
+        """Call the listener with the metadata after every refresh."""
+        with self.__lock:
+            if listener not in self.__listeners:
+                self.__listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self.__lock:
+            if listener in self.__listeners:
+                self.__listeners.remove(listener)
+
+    def get(self):
+        """
+        Return the cached metadata, refreshing it in the background if
+        it's older than the TTL:
+            {
+                "pools": ["none", "comp"],
+                "groups": ["none", "nuke"],
+                "limits": ["neatvideo"],
+                "updated": 1662026102.0,
+            }
+
+        Before the first refresh every list is empty.
+        """
+        with self.__lock:
+            if self.__metadata is None:
+                self.__metadata = self.__load()
+            metadata = dict(self.__metadata)
+
+        if self.is_stale(metadata):
+            self.refresh()
+
+        return metadata
+
+    def is_stale(self, metadata):
+        """Check if the metadata should be refreshed."""
+        now = time.time()
+        if now - self.__failed < RETRY_DELAY:
+            return False
+
+        return now - metadata.get("updated", 0) > self.ttl
+
+    def refresh(self, wait=False):
+        """
+        Ask the repository for the metadata in a background thread,
+        unless a refresh is already running. If wait is True, returns
+        after the refresh is done.
+        """
+        with self.__lock:
+            if self.__thread is None:
+                self.__thread = threading.Thread(
+                    target=self.__run, name="DeadlineRepositoryMetadata"
+                )
+                self.__thread.daemon = True
+                self.__thread.start()
+            thread = self.__thread
+
+        if wait:
+            thread.join()
+
+    def __run(self):
+        try:
+            metadata = dict(
+                (name, sorted(getattr(self.transport, method)()))
+                for name, method in METADATA_METHODS.items()
+            )
+            metadata["updated"] = time.time()
+
+        # Keep the cached names if the repository can't be reached
+        except Exception:
+            self.__failed = time.time()
+            metadata = None
+
+        with self.__lock:
+            if metadata is not None:
+                self.__metadata = metadata
+            listeners = list(self.__listeners)
+            self.__thread = None
+
+        if metadata is None:
+            return
+
+        try:
+            self.__save(metadata)
+        except OSError:
+            pass
+
+        for listener in listeners:
+            try:
+                listener(dict(metadata))
+            except Exception:
+                pass
+
+    def __load(self):
+        metadata = dict((name, []) for name in METADATA_METHODS)
+        metadata["updated"] = 0
+
+        try:
+            with open(self.path, encoding="utf-8") as metadata_json:
+                metadata.update(json.load(metadata_json))
+        except (OSError, ValueError):
+            pass
+
+        return metadata
+
+    def __save(self, metadata):
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        temporary_file = "%s.%i.tmp" % (self.path, os.getpid())
+        with open(temporary_file, "w", encoding="utf-8") as metadata_json:
+            json.dump(metadata, metadata_json)
+        os.replace(temporary_file, self.path)
+
+
+# Metadata shared by this session
+_metadata = None
+_metadata_lock = threading.Lock()
+
+
+def get_metadata(transport):
+    """Return the repository metadata shared by this session."""
+    global _metadata
+
+    with _metadata_lock:
+        if _metadata is None:
+            _metadata = RepositoryMetadata(transport)
+
+        # Always use the latest configured transport
+        _metadata.transport = transport
+
+        return _metadata
@@ -8,14 +8,26 @@ it modified, or is the file path in the write node added.
 
 License check is also added, so if there are any nodes
 in the __init__ license_nodes dictionary added, it will
-scan for them. If found, a license limit will be added to
+scan for them upstream of the submitted node. If found, the
+Deadline Limit of every found node class will be added to
 the submission.
 
 Other checks can be added via this module.
 
+The checks that don't need a dialog can also run without Nuke, on a
+script read by nk_parser, using validate_offline().
+
 """
 
-import nuke
+import input_footprint
+from limit_groups import limit_group_name
+from node_graph import UpstreamIndex
+
+# Nuke is only needed for the checks asking the user
+try:
+    import nuke
+except ImportError:
+    nuke = None
 
 
 class SanityCheck(object):
@@ -27,8 +39,10 @@ class SanityCheck(object):
         Add the Class name to the key, and add the amount
         of licenses in the value.
 
-        This functionality is not provided by default in Deadline, so
-        it can provide a way to implement into your own farm.
+        Every class is rendered with its own Deadline Limit, named after
+        the class (Example_Class will use the Limit example_class). To
+        use another Limit, add the class to the limit_names dictionary.
+        The amount of licenses is used when the Limit is created.
 
         If you haven't integrated a license limiting function, you can ignore
         the license check.
@@ -43,12 +57,16 @@ class SanityCheck(object):
             "Example_Class": 5,
         }
 
+        # Dictionary with the Deadline Limit of a class, if it's
+        # not named after the class (for example "OFlow2": "kronos")
+        self.limit_names = {}
+
     def validate_script(self, node):
         """
         This function can be called for validating the script.
 
-        It will return a dictionary containing
-        validated and license limit keys.
+        It will return a dictionary containing validated, limit
+        groups, upstream index and input footprint keys.
 
         If the key 'validated' is False, the submission will be canceled.
 
@@ -56,14 +74,22 @@ class SanityCheck(object):
 
         {
             "validated": True
-            "license_limit": 5
+            "limit_groups": {"example_class": 5}
+            "upstream_index": UpstreamIndex(node)
+            "input_footprint": Future({"bytes_per_frame": 52428800, ...})
         }
 
         So the script will proceed with submission, but it will have
-        a LicenseLimit key added to the submission.
+        the Deadline Limits added to the LimitGroups of the submission.
+        The value is the amount of licenses of the Limit.
+
+        The upstream index contains all nodes feeding the provided node,
+        and can be reused by other checks so the node graph is only
+        walked once.
 
-        This is a functionality Deadline doesn't provide by default, but
-        it can be built in the balancing of jobs.
+        The input footprint contains the amount of data read by the
+        upstream Read nodes. The files are scanned in the background, so
+        it is a Future, see input_footprint.scan().
 
         Custom validation checks can be added in this function.
 
@@ -73,7 +99,9 @@ class SanityCheck(object):
         # submission will be aborted.
         validated = {
             "validated": False,
-            "license_limit": None,
+            "limit_groups": {},
+            "upstream_index": None,
+            "input_footprint": None,
         }
 
         # Validate script
@@ -86,24 +114,90 @@ class SanityCheck(object):
         if not node_validated:
             return validated
 
+        # Index all nodes feeding the provided node
+        upstream_index = UpstreamIndex(node)
+        validated["upstream_index"] = upstream_index
+
         # Check for license limiting nodes
-        license_limit = self.__license_nodes()
+        limit_groups = self.__license_nodes(upstream_index)
 
         # If there are license limiting nodes, but user
         # doesn't want to submit these, abort submission
-        if license_limit is True:
+        if limit_groups is None:
             return validated
 
         # If user still wants to submit, add
-        # license limit to validation dictionary
-        elif license_limit > 0:
-            validated["license_limit"] = license_limit
+        # the limits to validation dictionary
+        validated["limit_groups"] = limit_groups
+
+        # Estimate the data read by the job in the background,
+        # to find I/O-bound jobs
+        validated["input_footprint"] = input_footprint.scan(upstream_index)
 
         # Script is validated, change key so submission will continue
         validated["validated"] = True
 
         return validated
 
+    def validate_offline(self, node, node_name=None):
+        """
+        Validate the node without Nuke, for example a node of a script
+        read by nk_parser. Nothing is asked, every problem found is
+        added to the errors instead.
+
+        Will return a dictionary like validate_script():
+
+        {
+            "validated": False
+            "limit_groups": {"example_class": 5}
+            "upstream_index": UpstreamIndex(node)
+            "input_footprint": {"bytes_per_frame": 52428800, ...}
+            "errors": ["Write1: no filepath has been set"]
+        }
+
+        Found license limiting nodes are not an error, their Limits
+        are returned like validate_script() would.
+        """
+        node_name = node_name or (node.fullName() if node else "Node")
+
+        validated = {
+            "validated": False,
+            "limit_groups": {},
+            "upstream_index": None,
+            "input_footprint": None,
+            "errors": [],
+        }
+
+        if node is None:
+            validated["errors"].append("%s: node not found" % node_name)
+            return validated
+
+        if node.Class() != "Write":
+            validated["errors"].append(
+                "%s: %s nodes are not supported" % (node_name, node.Class())
+            )
+
+        # The same check as the node validation
+        file_knob = node.knob("file")
+        if file_knob is None or not file_knob.value():
+            validated["errors"].append(
+                "%s: no filepath has been set" % node_name
+            )
+
+        if validated["errors"]:
+            return validated
+
+        upstream_index = UpstreamIndex(node)
+        validated["upstream_index"] = upstream_index
+
+        limit_groups, _ = self.__find_license_nodes(upstream_index)
+        validated["limit_groups"] = limit_groups
+        validated["input_footprint"] = self.__input_footprint(upstream_index)
+
+        validated["validated"] = True
+
+        return validated
+
     @staticmethod
     def __script_validation():
         """
@@ -159,64 +253,90 @@ class SanityCheck(object):
         # Write node is validated
         return True
 
-    def __license_nodes(self):
+    def __license_nodes(self, upstream_index):
         """
         Function to check for license limiting nodes
-        in the script.
+        upstream of the submitted node.
+
+        Only enabled nodes feeding the node are taken into
+        account, including nodes inside Groups and Gizmos.
+
+        Returns a dictionary with the Deadline Limits of the found
+        nodes, or None if the user doesn't want to submit.
         """
 
-        # Get dictionary with license limiting nodes
-        license_nodes = self.license_nodes
+        limit_groups, limiting_nodes = self.__find_license_nodes(
+            upstream_index
+        )
 
-        # Set initial lists so we can add values
-        license_limits = []
-        limiting_nodes = []
+        # If license limiting nodes found, ask the user
+        if limit_groups:
 
-        # Iterate through the provided nodes
-        for license_node in license_nodes.keys():
+            # Ask the user if user would like to proceed with the limits
+            proceed = nuke.ask(
+                "There are nodes active in the script with limited "
+                "licenses %s."
+                "\nIf you submit, the job will use the Deadline Limits: %s."
+                "\n\n"
+                "Would you like to proceed?"
+                % (limiting_nodes, ", ".join(sorted(limit_groups)))
+            )
 
-            # Search for nodes with the provided classes
-            nodes = nuke.allNodes(license_node)
+            # If no, return None so validation failed
+            if not proceed:
+                return None
 
-            # If nodes found, proceed searching
-            if nodes:
+        return limit_groups
+
+    @staticmethod
+    def __input_footprint(upstream_index):
+        """
+        Estimate the data read by the upstream Read nodes. Scanning the
+        files should never block the submission, so None is returned
+        if anything goes wrong.
+        """
+        try:
+            return input_footprint.estimate(upstream_index)
+        except Exception:
+            return None
 
-                # Iterate trough each node in this class
-                for node in nodes:
+    def limit_groups(self, upstream_index):
+        """
+        Return a dictionary with the Deadline Limits needed by the
+        indexed nodes and their amount of licenses, without asking.
+        """
+        return self.__find_license_nodes(upstream_index)[0]
 
-                    # Only proceed if node is not disabled
-                    if not node.knob("disable").value():
+    def __find_license_nodes(self, upstream_index):
+        """
+        Find the enabled license limiting nodes in the upstream index.
 
-                        # Get the corresponding license limit for the node
-                        license_limit = license_nodes.get(license_node)
+        Returns a dictionary with the Deadline Limit of every found
+        class and its amount of licenses, and a list with the full
+        names of the found nodes.
+        """
 
-                        # Add to list
-                        license_limits.append(license_limit)
+        # Get dictionary with license limiting nodes
+        license_nodes = self.license_nodes
 
-                        limiting_nodes.append(node.name())
+        # Set initial dictionary and list so we can add values
+        limit_groups = {}
+        limiting_nodes = []
 
-        # If license limiting nodes found, add license limit
-        if license_limits:
+        # Iterate through the provided nodes
+        for license_node in license_nodes.keys():
 
-            # Find lowest possible license limit of all found nodes
-            license_limit = min(license_limits)
+            # Find each enabled node in this class
+            nodes = upstream_index.nodes_of_class(license_node)
+            if not nodes:
+                continue
 
-            # Ask the user if user would like to proceed with a license limit
-            proceed = nuke.ask(
-                "There are nodes active in the script with limited licenses %s."
-                "\nIf you submit the script will render with a license limit (%i)."
-                "\n\n"
-                "Would you like to proceed?" % (limiting_nodes, license_limit)
+            # Get the corresponding Limit and license count for the class
+            limit_name = self.limit_names.get(
+                license_node, limit_group_name(license_node)
             )
+            limit_groups[limit_name] = license_nodes.get(license_node)
 
-            # If yes, return the limit
-            if proceed:
-                return license_limit
+            limiting_nodes.extend(node.fullName() for node in nodes)
 
-            # If no, return a license limit found so validation failed
-            else:
-                return True
-
-        # If not found, nothing to worry about
-        else:
-            return False
+        return limit_groups, limiting_nodes
@@ -0,0 +1,176 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to create a pruned snapshot of the script for submission.
+
+The snapshot only contains the Root settings and the nodes needed to
+render the submitted Write nodes: the nodes upstream of them, and the
+nodes they are linked to via expressions. Loading this smaller script
+is faster on every task of the job.
+
+Snapshots are stored by the hash of their content, so submitting an
+unchanged node graph again reuses the existing snapshot.
+
+"""
+
+import hashlib
+import os
+import tempfile
+
+import nuke
+from node_graph import UpstreamIndex
+
+
+def snapshot_directory(script_path):
+    """
+    Return the directory the snapshots of the script are stored in.
+
+    Can be set via the DEADLINE_SUBMISSION_SNAPSHOTS environment
+    variable, otherwise a .deadline_snapshots directory next to the
+    script is used. The directory needs to be available to the farm.
+    """
+    directory = os.getenv("DEADLINE_SUBMISSION_SNAPSHOTS")
+    if directory:
+        return directory
+
+    return os.path.join(os.path.dirname(script_path), ".deadline_snapshots")
+
+
+def snapshot_nodes(nodes):
+    """
+    Return the top level nodes needed to render the provided nodes.
+
+    Nodes inside a Group are represented by the Group itself, as the
+    Group is copied as a whole.
+    """
+    needed = {}
+    indexed = set()
+    pending = list(nodes)
+
+    while pending:
+        node = pending.pop()
+        if node.fullName() in indexed:
+            continue
+
+        for upstream_node in UpstreamIndex(node).nodes:
+            indexed.add(upstream_node.fullName())
+
+            # Use the top level node, so Groups are copied as a whole
+            top_level_name = upstream_node.fullName().split(".")[0]
+            if top_level_name not in needed:
+                needed[top_level_name] = nuke.toNode(top_level_name)
+
+            # Nodes linked via expressions are needed as well
+            for linked_node in upstream_node.dependencies(nuke.EXPRESSIONS):
+                if linked_node.fullName() not in indexed:
+                    pending.append(linked_node)
+
+    return [node for node in needed.values() if node is not None]
+
+
+def create_snapshot(nodes, script_path=None):
+    """
+    Create a snapshot of the script, only containing the Root settings
+    and the nodes needed to render the provided nodes.
+
+    Returns the path of the snapshot. If a snapshot with the same
+    content already exists, its path is returned instead.
+    """
+    if not isinstance(nodes, (list, tuple)):
+        nodes = [nodes]
+
+    if script_path is None:
+        script_path = nuke.root().name()
+
+    # The Root settings, the name is kept so expressions using the
+    # path of the script still point to the original location
+    root_knobs = nuke.root().writeKnobs(
+        nuke.WRITE_NON_DEFAULT_ONLY
+        | nuke.TO_SCRIPT
+        | nuke.WRITE_USER_KNOB_DEFS
+    )
+
+    snapshot = (
+        "#! nuke -nx\n"
+        "version %i.%i\n"
+        "Root {\n"
+        "%s\n"
+        "}\n"
+        "%s"
+        % (
+            nuke.NUKE_VERSION_MAJOR,
+            nuke.NUKE_VERSION_MINOR,
+            root_knobs,
+            _copy_nodes(snapshot_nodes(nodes)),
+        )
+    )
+
+    # Name the snapshot after its content, so an unchanged
+    # node graph will use the same snapshot
+    snapshot_hash = hashlib.sha1(snapshot.encode("utf-8")).hexdigest()
+    script_name = os.path.splitext(os.path.basename(script_path))[0]
+
+    directory = snapshot_directory(script_path)
+    snapshot_path = os.path.join(
+        directory, "%s_%s.nk" % (script_name, snapshot_hash[:16])
+    )
+
+    # Fix for Windows backward slashes systems
+    snapshot_path = snapshot_path.replace(os.sep, "/")
+
+    if os.path.isfile(snapshot_path):
+        return snapshot_path
+
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    # Write via a temporary file, so the farm never loads half a snapshot
+    temporary_file = snapshot_path + ".tmp"
+    with open(temporary_file, "w", encoding="utf-8") as snapshot_file:
+        snapshot_file.write(snapshot)
+    os.replace(temporary_file, snapshot_path)
+
+    return snapshot_path
+
+
+def _copy_nodes(nodes):
+    """
+    Return the nodes as they would be written in a script.
+
+    Nuke only copies selected nodes, so the selection is changed
+    temporarily and restored afterwards.
+    """
+    temporary_directory = tempfile.mkdtemp()
+    copy_file = os.path.join(temporary_directory, "copy.nk")
+
+    with nuke.root():
+        selection = nuke.selectedNodes()
+
+        try:
+            for node in nuke.allNodes():
+                node.setSelected(False)
+            for node in nodes:
+                node.setSelected(True)
+
+            nuke.nodeCopy(copy_file)
+
+            with open(copy_file, encoding="utf-8") as copied_file:
+                copied = copied_file.read()
+
+        # Always restore the selection of the user
+        finally:
+            for node in nuke.allNodes():
+                node.setSelected(False)
+            for node in selection:
+                node.setSelected(True)
+
+            if os.path.isfile(copy_file):
+                os.remove(copy_file)
+            os.rmdir(temporary_directory)
+
+    # The version is already written above the Root settings
+    return "".join(
+        line
+        for line in copied.splitlines(True)
+        if not line.startswith("version ")
+    )
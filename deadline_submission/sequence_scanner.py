@@ -0,0 +1,199 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to scan image sequences on disk.
+
+A file pattern like /path/render.%04d.exr or /path/render.####.exr is
+converted to a regular expression, after which the directory is scanned
+only once using os.scandir. Only the files matching the pattern are
+checked, so scanning stays fast on directories with many files.
+
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+
+def sequence_regex(file_name):
+    """
+    Convert the file name of a sequence to a compiled regular expression.
+
+    The frame number is captured in the frame group. Supports the
+    printf style (%04d, %d) and the hash style (####) of Nuke.
+    """
+    parts = re.split(r"(%0?\d*d|#+)", file_name)
+
+    pattern = ""
+    captured = False
+    for part in parts:
+        printf = re.match(r"^%0?(\d*)d$", part)
+
+        # Not a frame number, so it has to match literally
+        if not printf and not (part and set(part) == {"#"}):
+            pattern += re.escape(part)
+
+        # Other frame numbers in the name have to match the first one
+        elif captured:
+            pattern += "(?P=frame)"
+
+        # printf style padding (%04d) or hash style padding (####)
+        else:
+            padding = int(printf.group(1) or 1) if printf else len(part)
+            pattern += r"(?P<frame>-?\d{%i,})" % padding
+            captured = True
+
+    return re.compile("^%s$" % pattern)
+
+
+def is_sequence(file_path):
+    """Check if the file path contains a frame number pattern."""
+    return bool(re.search(r"%0?\d*d|#+", os.path.basename(file_path)))
+
+
+def scan_sequence(file_path):
+    """
+    Scan the directory of the sequence once, and return a dictionary
+    with the frame number as key and a tuple of file size and
+    modification time as value.
+
+    For example:
+        {
+            1001: (10485760, 1662026102.0),
+            1002: (10485760, 1662026108.0),
+        }
+    """
+    directory = os.path.dirname(file_path) or "."
+    regex = sequence_regex(os.path.basename(file_path))
+
+    frames = {}
+
+    try:
+        entries = os.scandir(directory)
+    except OSError:
+        return frames
+
+    with entries:
+        for entry in entries:
+            match = regex.match(entry.name)
+            if not match:
+                continue
+
+            # Only stat the matching files, as stat is the slow part
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+
+            frames[int(match.group("frame"))] = (stat.st_size, stat.st_mtime)
+
+    return frames
+
+
+def missing_frames(file_path, frames, newer_than=None):
+    """
+    Return the frames of the sequence that still need to be rendered.
+
+    A frame needs to be rendered if the file is missing, is empty
+    or is older than the newer_than timestamp (for example the
+    modification time of the script).
+    """
+    rendered = scan_sequence(file_path)
+    missing = []
+
+    for frame in frames:
+        rendered_frame = rendered.get(frame)
+
+        if rendered_frame is None:
+            missing.append(frame)
+
+        elif rendered_frame[0] == 0:
+            missing.append(frame)
+
+        elif newer_than is not None and rendered_frame[1] < newer_than:
+            missing.append(frame)
+
+    return missing
+
+
+def scan_sequences(file_paths, max_workers=8):
+    """
+    Scan the directories of multiple sequences, returning a dictionary
+    with the file path as key and the frames (like scan_sequence()) as
+    value.
+
+    Every directory is scanned only once, even if it contains multiple
+    sequences. Directories are scanned in parallel, as most of the time
+    is spent waiting on the file server.
+    """
+    directories = {}
+    for file_path in set(file_paths):
+        directory = os.path.dirname(file_path) or "."
+        directories.setdefault(directory, []).append(file_path)
+
+    def scan_directory(directory):
+        sequences = dict(
+            (file_path, {}) for file_path in directories[directory]
+        )
+
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            return sequences
+
+        # Only compile the patterns of directories that exist
+        patterns = [
+            (file_path, sequence_regex(os.path.basename(file_path)))
+            for file_path in directories[directory]
+        ]
+
+        with entries:
+            for entry in entries:
+                for file_path, regex in patterns:
+                    match = regex.match(entry.name)
+                    if not match:
+                        continue
+
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        break
+
+                    sequences[file_path][int(match.group("frame"))] = (
+                        stat.st_size,
+                        stat.st_mtime,
+                    )
+                    break
+
+        return sequences
+
+    sequences = {}
+
+    # Starting threads isn't worth it for a single directory
+    if len(directories) < 2:
+        for directory in directories:
+            sequences.update(scan_directory(directory))
+        return sequences
+
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(directories))
+    ) as executor:
+        for result in executor.map(scan_directory, list(directories)):
+            sequences.update(result)
+
+    return sequences
+
+
+def frame_path(file_path, frame):
+    """
+    Return the path of a single frame of the sequence, for example
+    /path/render.####.exr and 1001 will be /path/render.1001.exr.
+    """
+
+    def replace(match):
+        printf = re.match(r"^%0?(\d*)d$", match.group(0))
+        padding = int(printf.group(1) or 1) if printf else len(match.group(0))
+        return "%0*d" % (padding, frame)
+
+    directory, file_name = os.path.split(file_path)
+    return os.path.join(directory, re.sub(r"%0?\d*d|#+", replace, file_name))
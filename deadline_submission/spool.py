@@ -0,0 +1,479 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module containing a local spool for submissions.
+
+Jobs that can't be sent to Deadline right away are written to a
+directory of JSON files, so they won't get lost. A flusher sends the
+spooled jobs to Deadline in batches, retrying with a backoff if
+Deadline is still unreachable.
+
+The spool can be inspected and flushed from the command line:
+    python spool.py list
+    python spool.py flush
+    python spool.py retry
+
+"""
+
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import job_registry
+import transport
+
+# Seconds after which a job claimed by a flush is given back to the
+# pending directory, as the process flushing it has likely stopped
+CLAIM_TIMEOUT = 3600.0
+
+
+class Spool(object):
+    """
+    Spool containing jobs waiting to be submitted.
+
+    Every job is stored as a JSON file in the pending directory, named
+    after the hash of its submission parameters. Adding the same job
+    twice will therefore only submit it once.
+
+    Jobs failing more than max_attempts times are moved to the failed
+    directory, where they can be inspected or retried.
+
+    A flush claims every job by moving it to an in-flight directory of
+    its process before submitting it. Moving a file is atomic, so when
+    several processes flush the same spool, every job is only submitted
+    by the process that moved it.
+    """
+
+    def __init__(
+        self,
+        directory=None,
+        batch_size=50,
+        max_attempts=5,
+        retry_delay=30.0,
+        flush_delay=5.0,
+    ):
+        # The directory can be set via the environment,
+        # otherwise the .nuke folder of the user is used
+        if directory is None:
+            directory = os.getenv(
+                "DEADLINE_SUBMISSION_SPOOL",
+                os.path.join(
+                    os.path.expanduser("~"), ".nuke", "deadline_spool"
+                ),
+            )
+        self.directory = directory
+        self.pending_directory = os.path.join(directory, "pending")
+        self.failed_directory = os.path.join(directory, "failed")
+        self.inflight_directory = os.path.join(directory, "inflight")
+        self.claim_directory = os.path.join(
+            self.inflight_directory, str(os.getpid())
+        )
+
+        # Amount of jobs sent to Deadline at once
+        self.batch_size = batch_size
+
+        # Amount of attempts before a job is marked as failed, the time
+        # between attempts is doubled every attempt
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        # Time to wait before flushing, so a burst of
+        # submissions will be sent in one batch
+        self.flush_delay = flush_delay
+
+        # The lock is only held while reading or moving spool files,
+        # never while submitting, so scheduling a flush from the main
+        # thread won't wait on Deadline
+        self.__lock = threading.Lock()
+        self.__flushing = False
+
+        self.__timer_lock = threading.Lock()
+        self.__timer = None
+
+        for spool_directory in (
+            self.pending_directory,
+            self.failed_directory,
+            self.claim_directory,
+        ):
+            if not os.path.isdir(spool_directory):
+                os.makedirs(spool_directory)
+
+    def add(self, submission_parameters):
+        """
+        Add the submission parameters (job_info and plugin_info) to
+        the spool. Returns the id of the spooled job.
+
+        If the same job is already waiting, it won't be added again.
+        """
+        job = json.dumps(submission_parameters, sort_keys=True)
+        spool_id = hashlib.sha1(job.encode("utf-8")).hexdigest()
+
+        # The job is already waiting to be submitted
+        spool_file = self.__spool_file(self.pending_directory, spool_id)
+        if os.path.isfile(spool_file):
+            return spool_id
+
+        entry = {
+            "id": spool_id,
+            "created": time.time(),
+            "attempts": 0,
+            "next_attempt": 0,
+            "last_error": None,
+            "job": submission_parameters,
+        }
+        self.__write(spool_file, entry)
+
+        return spool_id
+
+    def backlog(self):
+        """
+        Return all spooled jobs, oldest first.
+
+        Every job is a dictionary containing the spooled entry,
+        with an extra state key that is either pending or failed.
+        """
+        entries = []
+
+        for state, spool_directory in (
+            ("pending", self.pending_directory),
+            ("failed", self.failed_directory),
+        ):
+            for entry in self.__read_directory(spool_directory):
+                entry["state"] = state
+                entries.append(entry)
+
+        return sorted(entries, key=lambda entry: entry.get("created", 0))
+
+    def flush(self, deadline_transport=None, force=False):
+        """
+        Send the pending jobs to Deadline in batches.
+
+        Jobs still waiting for their next attempt are skipped, unless
+        force is True. Returns a dictionary with the spool id as key and
+        the JobID as value for every submitted job.
+        """
+        if deadline_transport is None:
+            deadline_transport = transport.get_transport()
+
+        submitted = {}
+
+        # Only one flush at a time in this process, other processes
+        # can't claim the jobs claimed by this flush. A flush already
+        # in progress will pick up the pending jobs.
+        with self.__lock:
+            if self.__flushing:
+                return submitted
+            self.__flushing = True
+
+        try:
+            self.__release_stale_claims()
+
+            now = time.time()
+            entries = []
+            for entry in self.__read_directory(self.pending_directory):
+                if not force and entry.get("next_attempt", 0) > now:
+                    continue
+
+                # Another process is submitting the job already
+                entry = self.__claim(entry)
+                if entry is not None:
+                    entries.append(entry)
+
+            for index in range(0, len(entries), self.batch_size):
+                batch = entries[index : index + self.batch_size]
+
+                try:
+                    result = deadline_transport.submit(
+                        [entry.get("job") for entry in batch]
+                    )
+                    job_ids = result.get("job_ids")
+                    error = result.get("output")
+                    rejected = False
+                    job_registry.register(
+                        [entry.get("job") for entry in batch], job_ids
+                    )
+
+                # The whole batch failed. If Deadline rejected the jobs,
+                # trying again won't help.
+                except transport.TransportError as exception:
+                    job_ids = [None] * len(batch)
+                    error = str(exception)
+                    rejected = not exception.unreachable
+
+                with self.__lock:
+                    for entry, job_id in zip(batch, job_ids):
+                        # Submitted, so it can be removed from the spool
+                        if job_id:
+                            submitted[entry.get("id")] = job_id
+                            self.__remove(
+                                self.__spool_file(
+                                    self.claim_directory, entry.get("id")
+                                )
+                            )
+                            continue
+
+                        self.__failed_attempt(entry, error, rejected)
+
+        finally:
+            with self.__lock:
+                self.__flushing = False
+
+        return submitted
+
+    def schedule_flush(self, deadline_transport=None, delay=None):
+        """
+        Flush the spool in a background thread after the provided delay.
+
+        If a flush is already scheduled, nothing will happen. This way
+        all jobs spooled in the meantime are sent in the same batch. If
+        jobs are left after flushing, a new flush is scheduled for the
+        next attempt.
+        """
+        if delay is None:
+            delay = self.flush_delay
+
+        with self.__timer_lock:
+            if self.__timer is not None:
+                return
+
+            self.__timer = threading.Timer(
+                delay, self.__scheduled_flush, args=(deadline_transport,)
+            )
+            self.__timer.daemon = True
+            self.__timer.start()
+
+    def retry_failed(self):
+        """Move all failed jobs back to the pending directory."""
+        with self.__lock:
+            for entry in self.__read_directory(self.failed_directory):
+                entry["attempts"] = 0
+                entry["next_attempt"] = 0
+                self.__write(
+                    self.__spool_file(self.pending_directory, entry.get("id")),
+                    entry,
+                )
+                self.__remove(
+                    self.__spool_file(self.failed_directory, entry.get("id"))
+                )
+
+    def __scheduled_flush(self, deadline_transport):
+        """Flush the spool, and schedule the next flush if needed."""
+        with self.__timer_lock:
+            self.__timer = None
+
+        self.flush(deadline_transport)
+
+        # Schedule the next flush for the jobs that are left
+        next_attempts = [
+            entry.get("next_attempt", 0)
+            for entry in self.__read_directory(self.pending_directory)
+        ]
+        if next_attempts:
+            self.schedule_flush(
+                deadline_transport,
+                delay=max(min(next_attempts) - time.time(), self.flush_delay),
+            )
+
+    def __failed_attempt(self, entry, error, rejected=False):
+        """
+        Register a failed attempt for the entry. If it failed too often,
+        or Deadline rejected it, it is moved to the failed directory.
+        """
+        entry["attempts"] = entry.get("attempts", 0) + 1
+        entry["last_error"] = error
+        entry["next_attempt"] = time.time() + self.retry_delay * 2 ** (
+            entry["attempts"] - 1
+        )
+
+        if rejected or entry["attempts"] >= self.max_attempts:
+            spool_directory = self.failed_directory
+        else:
+            spool_directory = self.pending_directory
+
+        self.__write(self.__spool_file(spool_directory, entry["id"]), entry)
+        self.__remove(self.__spool_file(self.claim_directory, entry["id"]))
+
+    def __claim(self, entry):
+        """
+        Claim the pending entry for this process, by moving it to the
+        in-flight directory of the process. Returns the claimed entry,
+        or None if another process claimed or submitted it already.
+        """
+        claimed_file = self.__spool_file(self.claim_directory, entry["id"])
+
+        try:
+            os.replace(
+                self.__spool_file(self.pending_directory, entry["id"]),
+                claimed_file,
+            )
+            # Moving keeps the time of the file, the claim starts now
+            os.utime(claimed_file, None)
+            with open(claimed_file, encoding="utf-8") as spool_json:
+                return json.load(spool_json)
+
+        except (OSError, ValueError):
+            return None
+
+    def __release_stale_claims(self):
+        """
+        Move jobs claimed longer than CLAIM_TIMEOUT ago back to the
+        pending directory, so the jobs of a process that stopped while
+        flushing aren't lost.
+        """
+        now = time.time()
+
+        for directory_name in os.listdir(self.inflight_directory):
+            claim_directory = os.path.join(
+                self.inflight_directory, directory_name
+            )
+            try:
+                file_names = os.listdir(claim_directory)
+            except OSError:
+                continue
+
+            for file_name in file_names:
+                claimed_file = os.path.join(claim_directory, file_name)
+                try:
+                    if now - os.path.getmtime(claimed_file) > CLAIM_TIMEOUT:
+                        os.replace(
+                            claimed_file,
+                            os.path.join(self.pending_directory, file_name),
+                        )
+                except OSError:
+                    continue
+
+    @staticmethod
+    def __remove(spool_file):
+        """Remove the file, if another process didn't remove it already."""
+        try:
+            os.remove(spool_file)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def __spool_file(spool_directory, spool_id):
+        return os.path.join(spool_directory, spool_id + ".json")
+
+    @staticmethod
+    def __write(spool_file, entry):
+        """Write the entry via a temporary file, so it's never half written."""
+        temporary_file = spool_file + ".tmp"
+        with open(temporary_file, "w", encoding="utf-8") as spool_json:
+            json.dump(entry, spool_json)
+        os.replace(temporary_file, spool_file)
+
+    @staticmethod
+    def __read_directory(spool_directory):
+        """Return all readable entries in the directory, oldest first."""
+        entries = []
+
+        for file_name in os.listdir(spool_directory):
+            if not file_name.endswith(".json"):
+                continue
+
+            try:
+                with open(
+                    os.path.join(spool_directory, file_name), encoding="utf-8"
+                ) as spool_json:
+                    entries.append(json.load(spool_json))
+
+            # The file has been removed by another flush in the meantime
+            except (OSError, ValueError):
+                continue
+
+        return sorted(entries, key=lambda entry: entry.get("created", 0))
+
+
+# Shared spool, so all submissions in a session are flushed together
+_spool = None
+_spool_lock = threading.Lock()
+
+
+def get_spool():
+    """Return the spool shared by this session."""
+    global _spool
+
+    with _spool_lock:
+        if _spool is None:
+            _spool = Spool()
+        return _spool
+
+
+def submit_or_spool(deadline_transport, jobs):
+    """
+    Submit the jobs using the transport. If Deadline can't be reached,
+    the jobs are added to the spool and will be submitted later. Jobs
+    rejected by Deadline aren't spooled, so the user sees why right away.
+
+    Returns the same dictionary as the transport, with an extra
+    spooled key that is True if the jobs have been spooled.
+    """
+    try:
+        result = deadline_transport.submit(jobs)
+        result["spooled"] = False
+        job_registry.register(jobs, result.get("job_ids") or [])
+        return result
+
+    except transport.TransportError as error:
+        if not error.unreachable:
+            return {
+                "output": "Deadline rejected the job(s): %s" % str(error),
+                "job_ids": [None] * len(jobs),
+                "spooled": False,
+            }
+
+        spool = get_spool()
+        for submission_parameters in jobs:
+            spool.add(submission_parameters)
+        spool.schedule_flush(deadline_transport, delay=spool.retry_delay)
+
+        return {
+            "output": "Deadline could not be reached: %s"
+            "\n\n"
+            "The job(s) have been spooled and will be submitted "
+            "as soon as Deadline is available." % str(error),
+            "job_ids": [None] * len(jobs),
+            "spooled": True,
+        }
+
+
+def main(arguments):
+    """Command line interface to inspect and flush the spool."""
+    spool = get_spool()
+    command = arguments[0] if arguments else "list"
+
+    if command == "list":
+        for entry in spool.backlog():
+            job_info = entry.get("job", {}).get("job_info", {})
+            print(
+                "%s  %-7s  attempts: %i  %s  %s"
+                % (
+                    entry.get("id")[:12],
+                    entry.get("state"),
+                    entry.get("attempts", 0),
+                    job_info.get("Name", ""),
+                    entry.get("last_error") or "",
+                )
+            )
+
+    elif command == "flush":
+        for spool_id, job_id in spool.flush(force=True).items():
+            print("%s  %s" % (spool_id[:12], job_id))
+
+    elif command == "retry":
+        spool.retry_failed()
+        for spool_id, job_id in spool.flush(force=True).items():
+            print("%s  %s" % (spool_id[:12], job_id))
+
+    else:
+        print("Usage: spool.py [list|flush|retry]")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
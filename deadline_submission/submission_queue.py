@@ -0,0 +1,167 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module containing the queue used to submit jobs in the background.
+
+Sending the jobs to Deadline can take a while on a busy repository. By
+running the transport in a worker thread, the Nuke user interface stays
+responsive. The result is given back in the main thread of Nuke, so it
+is safe to show dialogs with it.
+
+"""
+
+import nuke
+import spool
+import telemetry
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SubmissionQueue(object):
+    """
+    Queue running submissions in worker threads.
+
+    Multiple submissions can be in flight at the same time, the amount
+    is limited by max_workers. While there are submissions in flight,
+    a progress task in Nuke shows how many are left.
+
+    Usage:
+        queue = SubmissionQueue(transport.get_transport())
+        queue.submit([submission_files], callback=show_result)
+    """
+
+    def __init__(self, transport, max_workers=4):
+        self.transport = transport
+        self.__executor = ThreadPoolExecutor(max_workers=max_workers)
+
+        # Keeping track of the submissions that haven't finished yet
+        self.__lock = threading.Lock()
+        self.__in_flight = 0
+        self.__status = None
+
+    def submit(self, jobs, callback=None):
+        """
+        Submit the provided jobs in the background.
+
+        When the submission is done, the callback will be called in the
+        main thread of Nuke with the result of the transport:
+            {
+                "output": "Submission output",
+                "job_ids": ["63a1...", None],
+            }
+
+        Returns a Future containing the same result.
+        """
+        # If Deadline can't be reached, the jobs are spooled
+        return self.run(
+            spool.submit_or_spool, self.transport, jobs, callback=callback
+        )
+
+    def run(self, function, *args, callback=None):
+        """
+        Run a submission function in the background, for submissions
+        that need more than a single call to the transport.
+
+        The function should return the same dictionary as the transport.
+        When done, the callback is called in the main thread of Nuke with
+        the result of the function. Returns a Future containing the
+        same result.
+
+        The active telemetry trace is taken to the worker thread, and
+        finished after the callback has been called.
+        """
+        trace = telemetry.current()
+        trace.queued = True
+
+        self.__update_status(1)
+        return self.__executor.submit(
+            self.__run, function, args, callback, trace
+        )
+
+    def in_flight(self):
+        """Return the amount of submissions that haven't finished yet."""
+        with self.__lock:
+            return self.__in_flight
+
+    def __run(self, function, args, callback, trace):
+        """Run the submission function, this will run in a worker thread."""
+        try:
+            with trace.activate(), trace.span("transport"):
+                result = function(*args)
+
+        # If there is an error, return the error
+        # so the user knows
+        except Exception as error:
+            result = {
+                "output": str(error),
+                "job_ids": [],
+            }
+
+        finally:
+            self.__update_status(-1)
+
+        # Give the result back in the main thread
+        if callback is not None:
+            nuke.executeInMainThread(
+                self.__callback, args=(callback, result, trace)
+            )
+        else:
+            trace.finish()
+
+        return result
+
+    @staticmethod
+    def __callback(callback, result, trace):
+        """Call the callback, and finish the trace of the submission."""
+        try:
+            callback(result)
+        finally:
+            trace.finish()
+
+    def __update_status(self, change):
+        """
+        Change the amount of submissions in flight and
+        update the progress task shown in Nuke.
+        """
+        with self.__lock:
+            self.__in_flight += change
+
+        # The progress task may only be touched in the main thread
+        nuke.executeInMainThread(self.__show_status)
+
+    def __show_status(self):
+        """
+        Show the amount of submissions in flight in the progress task,
+        this has to run in the main thread.
+        """
+        with self.__lock:
+            in_flight = self.__in_flight
+
+        # Remove the progress task if everything is submitted
+        if not in_flight:
+            self.__status = None
+            return
+
+        if self.__status is None:
+            self.__status = nuke.ProgressTask("Deadline submission")
+
+        self.__status.setMessage("%i submission(s) in flight" % in_flight)
+
+
+# Shared queue, so all submissions in a session are limited together
+_submission_queue = None
+_submission_queue_lock = threading.Lock()
+
+
+def get_submission_queue(transport):
+    """Return the submission queue shared by this Nuke session."""
+    global _submission_queue
+
+    with _submission_queue_lock:
+        if _submission_queue is None:
+            _submission_queue = SubmissionQueue(transport)
+
+        # Always use the latest configured transport
+        _submission_queue.transport = transport
+
+        return _submission_queue
@@ -0,0 +1,348 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to record how long every phase of a submission takes.
+
+Every submission creates a trace, containing a span for every phase
+(sanity check, panel, submission parameters, transport, etc.). When
+the submission is done, the trace is written as a line of JSON to a
+rotating log file:
+    ~/.nuke/deadline_telemetry.jsonl
+
+The location can be changed with the DEADLINE_SUBMISSION_TELEMETRY
+environment variable, setting it to "off" disables the log.
+
+External collectors can receive every finished trace, either by
+calling add_collector() or by setting DEADLINE_SUBMISSION_TELEMETRY_HOOK
+to a function, for example "studio_metrics:send_trace".
+
+The latency of every phase over one or more logs can be summarized
+from the command line:
+    python telemetry.py summary /logs/*.jsonl
+
+"""
+
+import glob
+import importlib
+import json
+import logging
+import logging.handlers
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Functions receiving every finished trace
+_collectors = []
+_hook_loaded = False
+
+_local = threading.local()
+_logger_lock = threading.Lock()
+
+
+def log_path():
+    """Return the path of the telemetry log, or None if disabled."""
+    path = os.getenv(
+        "DEADLINE_SUBMISSION_TELEMETRY",
+        os.path.join(
+            os.path.expanduser("~"), ".nuke", "deadline_telemetry.jsonl"
+        ),
+    )
+    if path.lower() == "off":
+        return None
+    return path
+
+
+def add_collector(collector):
+    """
+    Add a function receiving every finished trace as a dictionary,
+    for example to send it to a metrics service.
+    """
+    _collectors.append(collector)
+
+
+class Trace(object):
+    """
+    Trace of a single submission.
+
+    Usage:
+        trace = Trace("submit", write_count=1)
+        with trace.activate():
+            with trace.span("sanity_check"):
+                ...
+            trace.set(exit_status=0)
+        trace.finish()
+
+    Code running while the trace is active can add spans using the
+    span() function of this module, without knowing the trace.
+
+    The submission queue sets queued to True when it takes over the
+    trace, it will finish the trace when the submission is done.
+    """
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = dict(fields)
+        self.queued = False
+        self.spans = []
+        self.started = time.time()
+        self.__start = time.perf_counter()
+        self.__finished = False
+        self.__lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        """Measure the duration of the code inside the with statement."""
+        start = time.perf_counter()
+        error = None
+        try:
+            yield self
+        except Exception as exception:
+            error = "%s: %s" % (type(exception).__name__, exception)
+            raise
+        finally:
+            span = {
+                "name": name,
+                "duration": time.perf_counter() - start,
+            }
+            if error:
+                span["error"] = error
+            with self.__lock:
+                self.spans.append(span)
+
+    def set(self, **fields):
+        """Add fields to the trace, for example the node count."""
+        with self.__lock:
+            self.fields.update(fields)
+
+    @contextmanager
+    def activate(self):
+        """Make this the active trace of the current thread."""
+        previous = getattr(_local, "trace", None)
+        _local.trace = self
+        try:
+            yield self
+        finally:
+            _local.trace = previous
+
+    def finish(self):
+        """
+        Write the trace to the log and give it to the collectors.
+        Finishing a trace a second time won't do anything.
+        """
+        with self.__lock:
+            if self.__finished:
+                return
+            self.__finished = True
+
+        record = {
+            "name": self.name,
+            "started": self.started,
+            "duration": time.perf_counter() - self.__start,
+            "spans": self.spans,
+        }
+        record.update(self.fields)
+
+        # Telemetry should never break a submission
+        try:
+            logger = _get_logger()
+            if logger is not None:
+                logger.info(json.dumps(record))
+        except Exception:
+            pass
+
+        for collector in _get_collectors():
+            try:
+                collector(record)
+            except Exception:
+                pass
+
+
+class _NullTrace(object):
+    """Trace used when no trace is active, recording nothing."""
+
+    queued = False
+
+    @contextmanager
+    def span(self, name):
+        yield self
+
+    def set(self, **fields):
+        pass
+
+    @contextmanager
+    def activate(self):
+        yield self
+
+    def finish(self):
+        pass
+
+
+_null_trace = _NullTrace()
+
+
+def current():
+    """Return the active trace of the current thread."""
+    return getattr(_local, "trace", None) or _null_trace
+
+
+def span(name):
+    """Add a span to the active trace of the current thread."""
+    return current().span(name)
+
+
+def _get_logger():
+    """Return the logger writing to the rotating log file."""
+    path = log_path()
+    if path is None:
+        return None
+
+    with _logger_lock:
+        logger = logging.getLogger("deadline_submission.telemetry")
+
+        # Only add the handler once, or again if the path changed
+        handlers = [
+            handler
+            for handler in logger.handlers
+            if getattr(handler, "baseFilename", None) == os.path.abspath(path)
+        ]
+        if not handlers:
+            directory = os.path.dirname(path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+                handler.close()
+
+            handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+
+        return logger
+
+
+def _get_collectors():
+    """Return the collectors, loading the hook of the environment once."""
+    global _hook_loaded
+
+    if not _hook_loaded:
+        _hook_loaded = True
+        hook = os.getenv("DEADLINE_SUBMISSION_TELEMETRY_HOOK")
+        if hook and ":" in hook:
+            module_name, function_name = hook.split(":", 1)
+            try:
+                module = importlib.import_module(module_name)
+                add_collector(getattr(module, function_name))
+            except Exception:
+                pass
+
+    return list(_collectors)
+
+
+def percentile(values, percent):
+    """Return the percentile of the values, using the nearest rank."""
+    values = sorted(values)
+    if not values:
+        return None
+    rank = max(int(math.ceil(percent / 100.0 * len(values))), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+def summarize(paths):
+    """
+    Read the provided log files, and return a dictionary with the
+    durations of every phase:
+        {
+            "sanity_check": {"count": 12, "p50": 0.01, "p95": 0.20},
+            "total": {...},
+        }
+    """
+    durations = {}
+
+    for path in paths:
+        try:
+            log_file = open(path, encoding="utf-8")
+        except OSError:
+            continue
+
+        with log_file:
+            for line in log_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                # Skip lines that aren't complete traces, for example
+                # written by another version of the submitter
+                if not isinstance(record, dict) or "duration" not in record:
+                    continue
+
+                durations.setdefault("total", []).append(record["duration"])
+                for span in record.get("spans") or []:
+                    if not isinstance(span, dict):
+                        continue
+                    if "name" in span and "duration" in span:
+                        durations.setdefault(span["name"], []).append(
+                            span["duration"]
+                        )
+
+    return dict(
+        (
+            phase,
+            {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+            },
+        )
+        for phase, values in durations.items()
+    )
+
+
+def main(arguments):
+    """Command line interface to summarize telemetry logs."""
+    if not arguments or arguments[0] != "summary":
+        print("Usage: telemetry.py summary [log files or directories]")
+        return 1
+
+    # Without arguments the log of this machine is summarized
+    patterns = arguments[1:]
+    if not patterns:
+        if log_path() is None:
+            print("Telemetry is disabled (DEADLINE_SUBMISSION_TELEMETRY=off)")
+            return 1
+        patterns = [log_path() + "*"]
+
+    paths = []
+    for argument in patterns:
+        if os.path.isdir(argument):
+            paths.extend(glob.glob(os.path.join(argument, "*.jsonl*")))
+        else:
+            paths.extend(glob.glob(argument))
+
+    summary = summarize(sorted(paths))
+    if not summary:
+        print("No telemetry found")
+        return 1
+
+    print("%-24s %8s %10s %10s" % ("phase", "count", "p50 (s)", "p95 (s)"))
+    for phase, result in sorted(
+        summary.items(), key=lambda item: -item[1]["p95"]
+    ):
+        print(
+            "%-24s %8i %10.3f %10.3f"
+            % (phase, result["count"], result["p50"], result["p95"])
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
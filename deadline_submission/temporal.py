@@ -0,0 +1,285 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to choose chunks that keep the work of time based nodes low.
+
+Nodes like Kronos, OFlow2, TimeBlur and FrameBlend read the frames
+around the frame they render. Every task starts with an empty cache,
+so the frames around the edges of its chunk are computed again by the
+next task. A FrameHold with an increment renders the same held frame
+for a whole segment, which is computed again by every task touching
+the segment.
+
+The reach of every node upstream of the Write node is looked up, after
+which the chunk size (and the start of the chunks) is chosen so these
+frames are computed again as little as possible.
+
+"""
+
+import math
+import os
+
+from frames import compact_frame_list
+
+# Frames read before and after the rendered frame by these classes,
+# knobs changing the reach are read by temporal_reach()
+TEMPORAL_REACH = {
+    "Kronos": (2, 2),
+    "OFlow2": (2, 2),
+    "VectorGenerator": (1, 1),
+    "TimeBlur": (1, 1),
+    "FrameBlend": (4, 0),
+    "TimeEcho": (2, 0),
+}
+
+# Part of the rendered frames that may be computed again
+MAX_OVERLAP = 0.1
+
+
+def temporal_reach(node):
+    """
+    Return the amount of frames the node reads before and after the
+    rendered frame, (0, 0) if the node doesn't read other frames.
+    """
+    node_class = node.Class()
+    if node_class not in TEMPORAL_REACH:
+        return 0, 0
+
+    before, after = TEMPORAL_REACH[node_class]
+
+    def knob_value(name, default):
+        knob = node.knob(name)
+        try:
+            return float(knob.value()) if knob is not None else default
+        except (TypeError, ValueError):
+            return default
+
+    # The shutter of the motion blur reaches further
+    if node_class in ("Kronos", "OFlow2"):
+        shutter = int(math.ceil(knob_value("shutterTime", 0) / 2.0))
+        before, after = before + shutter, after + shutter
+
+    elif node_class == "TimeBlur":
+        shutter = int(math.ceil(knob_value("shutter", 1)))
+        before, after = shutter, shutter
+
+    elif node_class == "FrameBlend":
+        before = max(int(knob_value("numframes", before + 1)) - 1, 0)
+
+    elif node_class == "TimeEcho":
+        before = max(int(knob_value("framestolookat", before + 1)) - 1, 0)
+
+    return before, after
+
+
+def upstream_reach(upstream_index):
+    """
+    Return the frames read before and after every rendered frame by all
+    nodes upstream of the Write node. Nodes in a row add up their reach,
+    so this is the reach of the longest possible chain.
+    """
+    before, after = 0, 0
+
+    for node in upstream_index.nodes:
+        if upstream_index.is_disabled(node):
+            continue
+
+        node_before, node_after = temporal_reach(node)
+        before += node_before
+        after += node_after
+
+    return before, after
+
+
+def held_segments(upstream_index):
+    """
+    Return the first frame and length of the segments of the FrameHold
+    nearest to the Write node, or None if there is no FrameHold with an
+    increment. TimeOffsets between the Write and the FrameHold shift
+    the segments.
+    """
+    frame_holds = [
+        node
+        for node in upstream_index.nodes_of_class("FrameHold")
+        if node.knob("increment") is not None
+        and int(node.knob("increment").value() or 0) > 0
+    ]
+    if not frame_holds:
+        return None
+
+    frame_hold = min(
+        frame_holds, key=lambda node: upstream_index.depth[node.fullName()]
+    )
+    hold_depth = upstream_index.depth[frame_hold.fullName()]
+
+    first_frame = int(frame_hold.knob("first_frame").value() or 0)
+    for time_offset in upstream_index.nodes_of_class("TimeOffset"):
+        if upstream_index.depth[time_offset.fullName()] < hold_depth:
+            offset_knob = time_offset.knob("time_offset")
+            first_frame += int(offset_knob.value() or 0) if offset_knob else 0
+
+    return first_frame, int(frame_hold.knob("increment").value())
+
+
+def overlap_frames(frames, chunk_size, reach, segments=None):
+    """
+    Return the amount of upstream frames computed again, when the
+    frames are rendered in chunks of the chunk size in their order.
+    """
+    before, after = reach
+
+    def upstream_frames(frame):
+        needed = range(frame - before, frame + after + 1)
+        if segments is None:
+            return needed
+
+        # Every frame of a segment renders the held frame
+        first_frame, length = segments
+        return [
+            first_frame + ((needed_frame - first_frame) // length) * length
+            for needed_frame in needed
+        ]
+
+    computed = 0
+    all_frames = set()
+    for index in range(0, len(frames), chunk_size):
+        chunk_frames = set()
+        for frame in frames[index : index + chunk_size]:
+            chunk_frames.update(upstream_frames(frame))
+        computed += len(chunk_frames)
+        all_frames.update(chunk_frames)
+
+    return computed - len(all_frames)
+
+
+def ordered_frame_list(frames):
+    """
+    Return a frame list keeping the order of the frames, for example
+    [5, 6, 7, 1, 2] will become "5-7,1-2".
+    """
+    parts = []
+    start = 0
+
+    for index in range(1, len(frames) + 1):
+        if index == len(frames) or frames[index] != frames[index - 1] + 1:
+            parts.append(compact_frame_list(frames[start:index]))
+            start = index
+
+    return ",".join(parts)
+
+
+def ascending_chunks(frames, chunk_size):
+    """
+    Check if every chunk of the frames, split in their order, has
+    its frames in ascending order.
+    """
+    return all(
+        frames[index - 1] < frames[index]
+        for index in range(1, len(frames))
+        if index % chunk_size
+    )
+
+
+def fit_chunks(
+    upstream_index, frames, chunk_size, workers=None, chunk_limit=None
+):
+    """
+    Choose the chunk size and frame order that keep the frames computed
+    again by time based nodes low.
+
+    The smallest chunk size (starting at the provided chunk size) that
+    computes less than MAX_OVERLAP of the frames again is used, but
+    never larger than needed to give every worker a task (workers is
+    set via DEADLINE_SUBMISSION_WORKERS, 10 by default). With held
+    segments the chunk size is a multiple of the segment length, and
+    the frames start at a segment, so chunks don't share segments. The
+    frames before the first segment are rendered last, as a chunk of
+    their own. If the other frames don't fill whole chunks, the frames
+    keep their order instead, so every chunk stays contiguous. The chunk
+    size never grows past the chunk limit (like the largest chunk size
+    fitting in the memory of a worker), if provided.
+
+    Returns a dictionary:
+        {
+            "frames": [1005, ..., 1100, 1001, ..., 1004],
+            "chunk_size": 10,
+            "reach": (2, 2),
+            "overlap": 36,
+            "avoided": 108,
+        }
+    """
+    # Amount of machines expected to pick up the job
+    if workers is None:
+        workers = int(os.getenv("DEADLINE_SUBMISSION_WORKERS", "10"))
+
+    frames = sorted(frames)
+    chunk_size = max(int(chunk_size), 1)
+    reach = upstream_reach(upstream_index)
+    segments = held_segments(upstream_index)
+
+    result = {
+        "frames": frames,
+        "chunk_size": chunk_size,
+        "reach": reach,
+        "overlap": 0,
+        "avoided": 0,
+    }
+    if not frames or (reach == (0, 0) and segments is None):
+        return result
+
+    base_overlap = overlap_frames(frames, chunk_size, reach, segments)
+    result["overlap"] = base_overlap
+    if not base_overlap:
+        return result
+
+    # Every worker should still get a task
+    max_chunk_size = max(
+        chunk_size, int(math.ceil(len(frames) / float(max(workers, 1))))
+    )
+    if chunk_limit is not None:
+        max_chunk_size = max(min(max_chunk_size, int(chunk_limit)), chunk_size)
+    candidates = range(chunk_size, max_chunk_size + 1)
+
+    # Start the chunks at the start of a segment, the frames before
+    # the first segment are rendered last
+    rotated_frames = frames
+    if segments is not None:
+        first_frame, length = segments
+        start = next(
+            (
+                index
+                for index, frame in enumerate(frames)
+                if (frame - first_frame) % length == 0
+            ),
+            0,
+        )
+        rotated_frames = frames[start:] + frames[:start]
+
+        multiples = [size for size in candidates if size % length == 0]
+        candidates = multiples or [max_chunk_size]
+
+    best = None
+    for size in candidates:
+        # The frames before the first segment have to be a chunk of
+        # their own, a task rendering frames of both ends of the range
+        # would render everything in between
+        ordered_frames = rotated_frames
+        if not ascending_chunks(ordered_frames, size):
+            ordered_frames = frames
+
+        overlap = overlap_frames(ordered_frames, size, reach, segments)
+        if best is None or overlap < best[1]:
+            best = (size, overlap, ordered_frames)
+        if overlap <= MAX_OVERLAP * len(frames):
+            break
+
+    size, overlap, ordered_frames = best
+    if overlap < base_overlap:
+        result.update(
+            frames=ordered_frames,
+            chunk_size=size,
+            overlap=overlap,
+            avoided=base_overlap - overlap,
+        )
+
+    return result
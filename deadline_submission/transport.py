@@ -0,0 +1,611 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module containing the transports used to send jobs to Deadline.
+
+There are two transports available:
+- SubprocessTransport, which calls deadlinecommand with info files
+- WebServiceTransport, which sends the jobs as JSON to the
+  Deadline Web Service and reuses its HTTP connections
+
+Both transports share the same interface, so the submitter doesn't
+need to know how the jobs end up in Deadline. Use get_transport() to
+get the transport configured via the environment.
+
+"""
+
+import http.client
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from queue import Empty, LifoQueue
+from shutil import rmtree
+from subprocess import CalledProcessError, check_output
+from urllib.parse import urlsplit
+
+import telemetry
+from job_registry import parse_job_status
+from render_tuning import parse_task
+
+
+# Methods that can safely be sent twice
+IDEMPOTENT_METHODS = ("GET", "HEAD", "PUT", "DELETE", "OPTIONS")
+
+# Output of deadlinecommand when the repository can't be reached
+UNREACHABLE_OUTPUT = re.compile(
+    r"could not connect|unable to connect|could not be reached|"
+    r"repository .*(not available|unavailable|could not be found)|"
+    r"timed out",
+    re.IGNORECASE,
+)
+
+
+class TransportError(Exception):
+    """
+    Raised when the jobs could not be sent to Deadline.
+
+    If deadlinecommand failed, its exit status is available
+    as the exit_status attribute. The unreachable attribute is True
+    if Deadline couldn't be reached at all, so sending the jobs again
+    later might work. Otherwise Deadline rejected the jobs.
+    """
+
+    def __init__(self, message, exit_status=None, unreachable=False):
+        Exception.__init__(self, message)
+        self.exit_status = exit_status
+        self.unreachable = unreachable
+
+
+def write_info_files(submission_parameters, directory, suffix=""):
+    """
+    Write the provided submission dictionary to text files in
+    the provided directory. Every key in the dictionary
+    (job_info, plugin_info) will become its own text file.
+
+    Returns a list with the paths of the created files, in the
+    order of the dictionary.
+    """
+
+    submission_files = []
+
+    # Iterating through the provided dictionary, and get
+    # the created dictionaries inside.
+    for submission_info in submission_parameters.keys():
+
+        # Get the parameters for the specified dictionary
+        # (for example job_info)
+        info_parameters = submission_parameters.get(submission_info)
+
+        # Create the path for the info_file.txt, for example
+        # path/to/temporarydirectory/job_info.txt
+        info_file = os.path.join(
+            directory,
+            submission_info + suffix + ".txt",
+        )
+
+        # Fix for Windows backward slashes systems
+        info_file = info_file.replace(os.sep, "/")
+
+        # Create a text file
+        with open(info_file, "w", encoding="utf-8") as info_file_txt:
+
+            # Iterate through the dictionary for every key
+            for parameter in info_parameters.keys():
+
+                # Get the value per parameter
+                value = info_parameters.get(parameter)
+
+                # Write the key and value and create a new line
+                # For example:
+                # Plugin=Nuke (key=value)
+                info_file_txt.write(parameter + "=" + str(value) + "\n")
+
+        # Add the created text file to the list for submission
+        submission_files.append(info_file)
+
+    return submission_files
+
+
+def parse_job_ids(output):
+    """
+    Parse the JobIDs from the output of a submission.
+
+    Deadline writes a block for every submitted job, containing
+    a Result line and (if succeeded) a JobID line:
+
+        Result=Success
+        JobID=63a1b2c3d4e5f60718293a4b
+
+    Returns a list with a JobID for every Result found. If a job
+    failed, the JobID will be None.
+    """
+    job_ids = []
+
+    for line in output.splitlines():
+        line = line.strip()
+
+        # Every result starts a new job
+        if line.startswith("Result="):
+            job_ids.append(None)
+
+        # Add the JobID to the latest job
+        match = re.match(r"^JobID=(\S+)$", line)
+        if match:
+            if not job_ids or job_ids[-1] is not None:
+                job_ids.append(None)
+            job_ids[-1] = match.group(1)
+
+    return job_ids
+
+
+def parse_key_values(output):
+    """
+    Parse the key=value output of deadlinecommand, returning a
+    dictionary for every block of lines separated by an empty line.
+    """
+    blocks = [{}]
+
+    for line in output.splitlines():
+        if not line.strip():
+            if blocks[-1]:
+                blocks.append({})
+            continue
+
+        key, separator, value = line.partition("=")
+        if separator:
+            blocks[-1][key.strip()] = value.strip()
+
+    return [block for block in blocks if block]
+
+
+class SubprocessTransport(object):
+    """
+    Transport calling deadlinecommand for every submission.
+
+    The job_info and plugin_info dictionaries are written to text files
+    in a temporary directory, which are given to deadlinecommand. Multiple
+    jobs are sent in a single call using -SubmitMultipleJobs.
+    """
+
+    def __init__(self, deadline_path=None):
+        # We need the deadline command path so we will get the environment
+        if deadline_path is None:
+            deadline_path = os.getenv("DEADLINE_PATH", "")
+        self.deadline_command = os.path.join(deadline_path, "deadlinecommand")
+
+    def submit(self, jobs):
+        """
+        Submit the provided jobs to Deadline.
+
+        Every item in the jobs list is a dictionary containing the
+        job_info and plugin_info dictionaries.
+
+        Will return a dictionary:
+            {
+                "output": "Raw output of deadlinecommand",
+                "job_ids": ["63a1...", None],
+            }
+
+        The job_ids list has the same order as the provided jobs,
+        if a job failed its JobID will be None.
+        """
+
+        # Create temporary directory for submission text files
+        temporary_directory = tempfile.mkdtemp()
+
+        try:
+            with telemetry.span("write_info_files"):
+                deadline_command = self.__command(jobs, temporary_directory)
+
+            # Create a subprocess using deadlinecommand and run the submission
+            with telemetry.span("deadlinecommand"):
+                try:
+                    output = check_output(deadline_command)
+                    telemetry.current().set(exit_status=0)
+
+                except CalledProcessError as error:
+                    telemetry.current().set(exit_status=error.returncode)
+                    message = (error.output or b"").decode("utf-8", "replace")
+                    raise TransportError(
+                        message.strip() or str(error),
+                        error.returncode,
+                        unreachable=bool(UNREACHABLE_OUTPUT.search(message)),
+                    )
+
+                except Exception as error:
+                    raise TransportError(str(error))
+
+        # Always remove the created temporary directory
+        finally:
+            rmtree(temporary_directory)
+
+        output = output.decode("utf-8", "replace")
+
+        # Make sure the amount of results matches the submitted jobs
+        job_ids = parse_job_ids(output)
+        job_ids = (job_ids + [None] * len(jobs))[: len(jobs)]
+
+        return {
+            "output": output,
+            "job_ids": job_ids,
+        }
+
+    def command(self, arguments):
+        """
+        Run deadlinecommand with the arguments, for example
+        ["-GetLimitGroupNames"], and return the output.
+        """
+        try:
+            output = check_output([self.deadline_command] + list(arguments))
+        except Exception as error:
+            raise TransportError(
+                str(error), getattr(error, "returncode", None)
+            )
+
+        return output.decode("utf-8", "replace")
+
+    def limit_group_names(self):
+        """Return the names of all Limits in the repository."""
+        return self.__names("-GetLimitGroupNames")
+
+    def pool_names(self):
+        """Return the names of all Pools in the repository."""
+        return self.__names("-GetPoolNames")
+
+    def group_names(self):
+        """Return the names of all Groups in the repository."""
+        return self.__names("-GetGroupNames")
+
+    def __names(self, argument):
+        """Return the names printed by deadlinecommand, one per line."""
+        return [
+            line.strip()
+            for line in self.command([argument]).splitlines()
+            if line.strip()
+        ]
+
+    def set_limit_group(self, name, limit):
+        """Create the Limit, or change the amount of stubs of it."""
+        self.command(["-SetLimitGroup", name, str(limit)])
+
+    def job_statuses(self, job_ids):
+        """
+        Return the status of all jobs in a single deadlinecommand call,
+        as a dictionary with the JobID as key. Unknown jobs are left out.
+        """
+        output = self.command(["-GetJob", ",".join(job_ids)])
+
+        statuses = {}
+        for index, job in enumerate(parse_key_values(output)):
+            job_id = job.get("ID", job.get("JobID"))
+            if job_id is None and index < len(job_ids):
+                job_id = job_ids[index]
+            if job_id in job_ids:
+                statuses[job_id] = parse_job_status(job)
+
+        return statuses
+
+    def job_tasks(self, job_id):
+        """
+        Return the completed tasks of the job, with their amount of
+        frames and render time as used by RenderStats.record_tasks().
+        """
+        tasks = parse_key_values(self.command(["-GetJobTasks", job_id]))
+
+        return [task for task in map(parse_task, tasks) if task]
+
+    def __command(self, jobs, temporary_directory):
+        """
+        Write the info files of the jobs to the temporary directory, and
+        return the deadlinecommand arguments to submit them.
+        """
+
+        # A single job can be submitted by just providing the files
+        if len(jobs) == 1:
+            return [self.deadline_command] + write_info_files(
+                jobs[0], temporary_directory
+            )
+
+        # Multiple jobs are submitted via a multi job submission:
+        # deadlinecommand -SubmitMultipleJobs
+        #   -job job_info_0.txt plugin_info_0.txt
+        #   -job job_info_1.txt plugin_info_1.txt
+        deadline_command = [
+            self.deadline_command,
+            "-SubmitMultipleJobs",
+        ]
+
+        # Write the info files for every job, suffixed with the
+        # index of the job so the files won't overwrite each other
+        for index, submission_parameters in enumerate(jobs):
+            deadline_command = (
+                deadline_command
+                + ["-job"]
+                + write_info_files(
+                    submission_parameters,
+                    temporary_directory,
+                    suffix="_%i" % index,
+                )
+            )
+
+        return deadline_command
+
+
+class WebServiceTransport(object):
+    """
+    Transport sending jobs to the Deadline Web Service.
+
+    The jobs are sent as JSON directly, so no info files are created.
+    Open HTTP connections are kept in a pool and reused by the next
+    request, which avoids setting up a connection for every submission.
+
+    Failed requests (no connection or a server error) are retried with
+    an exponential backoff: backoff, backoff * 2, backoff * 4, etc.
+    Jobs are only posted again if the request never reached the server,
+    so a slow or failing server won't end up with duplicate jobs.
+    """
+
+    def __init__(
+        self, url, pool_size=4, retries=3, backoff=0.5, timeout=30.0
+    ):
+        # Split the url so we know where to connect to,
+        # for example http://deadline:8082
+        url = urlsplit(url)
+        self.scheme = url.scheme or "http"
+        self.host = url.hostname
+        self.port = url.port
+        self.base_path = url.path.rstrip("/")
+
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+
+        # Pool containing idle connections, the last
+        # returned connection is reused first
+        self.pool_size = pool_size
+        self.__pool = LifoQueue(maxsize=pool_size)
+
+    def submit(self, jobs):
+        """
+        Submit the provided jobs to Deadline.
+
+        Every job is posted to the /api/jobs endpoint, using a
+        connection from the pool.
+
+        Returns the same dictionary as SubprocessTransport.submit(), the
+        output mimics deadlinecommand so it can be shown to the user.
+        """
+        output = []
+        job_ids = []
+
+        # Only if all jobs failed because of the connection, it's
+        # worth sending them again later
+        unreachable = True
+
+        for submission_parameters in jobs:
+            body = {
+                "JobInfo": submission_parameters.get("job_info", {}),
+                "PluginInfo": submission_parameters.get("plugin_info", {}),
+                "AuxFiles": [],
+                "IdOnly": True,
+            }
+
+            # A failing job shouldn't stop the other jobs
+            try:
+                with telemetry.span("web_service"):
+                    response = self.request("POST", "/api/jobs", body)
+                job_id = response.get("_id")
+            except TransportError as error:
+                output.append("Result=Failure\n%s" % str(error))
+                job_ids.append(None)
+                unreachable = unreachable and error.unreachable
+                continue
+
+            output.append("Result=Success\nJobID=%s" % job_id)
+            job_ids.append(job_id)
+
+        # If none of the jobs succeeded, the web service is not working
+        if jobs and not any(job_ids):
+            raise TransportError("\n".join(output), unreachable=unreachable)
+
+        return {
+            "output": "\n".join(output),
+            "job_ids": job_ids,
+        }
+
+    def limit_group_names(self):
+        """Return the names of all Limits in the repository."""
+        return list(self.request("GET", "/api/limitgroups?NamesOnly=true"))
+
+    def pool_names(self):
+        """Return the names of all Pools in the repository."""
+        return list(self.request("GET", "/api/pools") or [])
+
+    def group_names(self):
+        """Return the names of all Groups in the repository."""
+        return list(self.request("GET", "/api/groups") or [])
+
+    def set_limit_group(self, name, limit):
+        """Create the Limit, or change the amount of stubs of it."""
+        self.request(
+            "PUT",
+            "/api/limitgroups",
+            {"Command": "set", "Name": name, "Limit": int(limit)},
+        )
+
+    def job_statuses(self, job_ids):
+        """
+        Return the status of all jobs in a single request, as a
+        dictionary with the JobID as key. Unknown jobs are left out.
+        """
+        jobs = self.request("GET", "/api/jobs?JobID=%s" % ",".join(job_ids))
+
+        return dict(
+            (job.get("_id"), parse_job_status(job))
+            for job in jobs or []
+            if job.get("_id") in job_ids
+        )
+
+    def job_tasks(self, job_id):
+        """
+        Return the completed tasks of the job, with their amount of
+        frames and render time as used by RenderStats.record_tasks().
+        """
+        tasks = self.request("GET", "/api/tasks?JobID=%s" % job_id)
+        if isinstance(tasks, dict):
+            tasks = tasks.get("Tasks", [])
+
+        return [task for task in map(parse_task, tasks or []) if task]
+
+    def request(self, method, path, body=None):
+        """
+        Do a request to the web service and return the decoded JSON.
+
+        Will retry with a backoff if the connection failed or the
+        server returned an error. A POST is only retried if it was never
+        sent: the connection failed, or the server closed the pooled
+        connection. Raises a TransportError if all attempts failed.
+        """
+        data = None
+        headers = {}
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        # Sending a job twice creates two jobs, so requests that aren't
+        # idempotent are only sent again if they never reached the server
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        error = None
+        for attempt in range(self.retries + 1):
+
+            # Wait before retrying, doubling the time every attempt
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            connection = self.__get_connection()
+
+            # Connect first, so a failed connection is known
+            # to have never sent the request
+            reused = connection.sock is not None
+            if not reused:
+                try:
+                    connection.connect()
+                except OSError as exception:
+                    connection.close()
+                    error = exception
+                    continue
+
+            try:
+                connection.request(
+                    method, self.base_path + path, body=data, headers=headers
+                )
+                response = connection.getresponse()
+                content = response.read()
+
+            # The connection is broken, so it won't be reused
+            except (http.client.HTTPException, OSError) as exception:
+                connection.close()
+                error = exception
+
+                # The server closed the pooled connection while it was
+                # idle, so the request was never processed
+                stale = reused and isinstance(
+                    exception, (ConnectionResetError, BrokenPipeError)
+                )
+                if idempotent or stale:
+                    continue
+
+                raise TransportError(
+                    "No answer from the Deadline Web Service at %s:%s (%s), "
+                    "the request might have been processed"
+                    % (self.host, self.port, exception)
+                )
+
+            # The server wants to close the connection after this request
+            if response.will_close:
+                connection.close()
+            else:
+                self.__release_connection(connection)
+
+            # Server errors can be temporary, so retry
+            if response.status >= 500 and idempotent:
+                error = "%i %s" % (response.status, response.reason)
+                continue
+
+            # Client errors won't get better by retrying, and a job
+            # might have been created before the server error
+            if response.status >= 400:
+                raise TransportError(
+                    "%i %s: %s"
+                    % (
+                        response.status,
+                        response.reason,
+                        content.decode("utf-8", "replace"),
+                    )
+                )
+
+            if not content:
+                return {}
+
+            # Deadline sometimes answers with plain text instead of JSON
+            try:
+                return json.loads(content.decode("utf-8"))
+            except ValueError:
+                return {"output": content.decode("utf-8", "replace")}
+
+        raise TransportError(
+            "Could not reach the Deadline Web Service at %s:%s (%s)"
+            % (self.host, self.port, error),
+            unreachable=True,
+        )
+
+    def __get_connection(self):
+        """Return an idle connection from the pool, or a new one."""
+        try:
+            return self.__pool.get_nowait()
+        except Empty:
+            pass
+
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return http.client.HTTPConnection(
+            self.host, self.port, timeout=self.timeout
+        )
+
+    def __release_connection(self, connection):
+        """Put the connection back into the pool, or close it if full."""
+        try:
+            self.__pool.put_nowait(connection)
+        except Exception:
+            connection.close()
+
+
+# Shared web service transports, so the connection pool
+# is reused between submissions
+_web_service_transports = {}
+_web_service_lock = threading.Lock()
+
+
+def get_transport():
+    """
+    Return the transport configured via the environment.
+
+    If DEADLINE_WEBSERVICE_URL is set (for example http://deadline:8082)
+    the Deadline Web Service will be used. Otherwise deadlinecommand
+    found in DEADLINE_PATH will be called.
+    """
+    url = os.getenv("DEADLINE_WEBSERVICE_URL")
+
+    if not url:
+        return SubprocessTransport()
+
+    with _web_service_lock:
+        if url not in _web_service_transports:
+            _web_service_transports[url] = WebServiceTransport(url)
+        return _web_service_transports[url]
@@ -0,0 +1,291 @@
+"""
+Nuke Deadline Submitter by Gilles Vink (2022)
+
+Module to render a wedge: a single frame rendered with a knob set to
+many values, as the tasks of a single job.
+
+Deadline renders one task per frame, so the frames of a wedge job are
+the indices of the values (0, 1, 2, ...). The job renders a wedge script
+created by create_wedge_script(), in which the knob picks the value of
+the index from the frame of the timeline (root.frame), the input of the
+Write node is held at the wedge frame and the Write node renders to the
+wedge output of the index, for example:
+    /renders/comp.####.exr -> /renders/comp_wedge003.1001.exr
+
+Nothing has to be installed on the workers. Only the functions working
+on the script import Nuke, so the job parameters of a wedge can be
+created without Nuke.
+
+"""
+
+import json
+import os
+import re
+
+import job_registry
+import sequence_scanner
+
+# Frame number patterns of Nuke, like %04d and ####
+FRAME_PATTERN = re.compile(r"%0?\d*d|#+")
+
+# Ranges of values, like 1-10 or 0.5-2x0.25
+VALUE_RANGE = re.compile(r"^(-?[\d.]+)-(-?[\d.]+)(?:x([\d.]+))?$")
+
+# Suffix added to the outputs, the hashes are the index of the value
+WEDGE_SUFFIX = "_wedge###"
+
+# The index of the value being rendered, the frame of the timeline.
+# Unlike the frame of a node, time based nodes don't change it.
+WEDGE_INDEX = "[value root.frame]"
+
+
+def _parse_value(text):
+    """Return the text as an int or float if possible, else as string."""
+    for value_type in (int, float):
+        try:
+            return value_type(text)
+        except ValueError:
+            continue
+
+    return text
+
+
+def parse_values(text):
+    """
+    Parse the values of a wedge, separated by commas. Ranges are
+    written as start-end with an optional step, for example:
+        "1,2,4,8" -> [1, 2, 4, 8]
+        "0-1x0.25" -> [0.0, 0.25, 0.5, 0.75, 1.0]
+        "0-3,red" -> [0, 1, 2, 3, "red"]
+    """
+    values = []
+
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+
+        match = VALUE_RANGE.match(part)
+        if not match:
+            values.append(_parse_value(part))
+            continue
+
+        start, end, step = match.groups()
+        number = int if "." not in part else float
+        start, end = number(start), number(end)
+        step = number(step) if step else number(1)
+        if step <= 0:
+            raise ValueError("The step of %s has to be positive" % part)
+
+        # Count the values instead of adding up steps, so floats
+        # don't drift past the end
+        count = int(round(abs(end - start) / float(step)))
+        direction = 1 if end >= start else -1
+        values.extend(
+            number(round(start + direction * index * step, 6))
+            for index in range(count + 1)
+        )
+
+    return values
+
+
+def wedge_output(file_path, frame):
+    """
+    Return the output of the wedge, rendering the frame. The index of
+    the value is added as hashes, for example /renders/comp.####.exr
+    and frame 1001 will be /renders/comp_wedge###.1001.exr.
+    """
+    directory, file_name = os.path.split(file_path)
+
+    match = FRAME_PATTERN.search(file_name)
+    if match:
+        # Keep the separator in front of the frame number
+        start = match.start()
+        if start and file_name[start - 1] in "._":
+            start -= 1
+        head = file_name[:start]
+        tail = sequence_scanner.frame_path(file_name[start:], frame)
+    else:
+        head, tail = os.path.splitext(file_name)
+
+    return os.path.join(directory, head + WEDGE_SUFFIX + tail)
+
+
+def wedge_settings(write_node, file_path, knob, values, frame):
+    """
+    Return the settings of a wedge of the knob (for example
+    "Defocus1.size") rendered by the Write node (its full name):
+        {
+            "write": "Write1",
+            "knob": "Defocus1.size",
+            "values": [1, 2, 4, 8],
+            "frame": 1001,
+            "file": "/renders/comp_wedge###.1001.exr",
+        }
+    """
+    return {
+        "write": write_node,
+        "knob": knob,
+        "values": list(values),
+        "frame": int(frame),
+        "file": wedge_output(file_path, frame).replace(os.sep, "/"),
+    }
+
+
+def wedge_outputs(wedge):
+    """Return the output file of every value of the wedge."""
+    return [
+        sequence_scanner.frame_path(wedge["file"], index)
+        for index in range(len(wedge["values"]))
+    ]
+
+
+def wedge_expression(values):
+    """
+    Return the TCL expression picking the value of the index being
+    rendered, for example "[lindex {{1} {2} {4}} [value root.frame]]".
+
+    The index is the frame of the timeline (root.frame) instead of the
+    frame of the node, as the FrameHold of the wedge holds every node
+    upstream of the Write node at the wedge frame.
+    """
+    return "[lindex {%s} %s]" % (
+        " ".join("{%s}" % value for value in values),
+        WEDGE_INDEX,
+    )
+
+
+def _set_values(knob, values):
+    """
+    Let the knob pick the value of the index being rendered. Numbers
+    are set as an expression of every channel, other values (like text)
+    as the value of the knob.
+    """
+    if not all(isinstance(value, (int, float, list)) for value in values):
+        knob.setValue(wedge_expression(values))
+        return
+
+    knob.clearAnimated()
+
+    lists = [value for value in values if isinstance(value, list)]
+    if not lists:
+        knob.setExpression(wedge_expression(values))
+        return
+
+    # Single numbers are used for every channel
+    for channel in range(max(len(value) for value in lists)):
+        knob.setExpression(
+            wedge_expression(
+                [
+                    value[min(channel, len(value) - 1)]
+                    if isinstance(value, list)
+                    else value
+                    for value in values
+                ]
+            ),
+            channel,
+        )
+
+
+def create_wedge_script(wedge, script_path=None):
+    """
+    Create the script rendered by the wedge job: a snapshot of the nodes
+    needed by the Write node, in which frame N renders value N:
+    - the knob picks the value of the frame of the timeline
+    - a FrameHold holds the input of the Write node at the wedge frame
+    - the Write node renders to the wedge output of the index
+
+    The tasks therefore don't need a hook, and never render to the normal
+    output of the Write node. The script of the user is changed
+    temporarily and restored afterwards. Returns the path of the script.
+    """
+    import nuke
+    import script_snapshot
+
+    write = nuke.toNode(wedge["write"])
+    node_name, knob_name = wedge["knob"].rsplit(".", 1)
+    knob = nuke.toNode(node_name).knob(knob_name)
+
+    # The index is outside of the frame range of the Write node
+    changed = [knob, write.knob("file"), write.knob("use_limit")]
+    changed = [changed_knob for changed_knob in changed if changed_knob]
+    scripts = [changed_knob.toScript() for changed_knob in changed]
+
+    parent = nuke.toNode(wedge["write"].rpartition(".")[0]) or nuke.root()
+    write_input = write.input(0)
+    with parent:
+        frame_hold = nuke.nodes.FrameHold(first_frame=wedge["frame"])
+
+    try:
+        frame_hold.setInput(0, write_input)
+        write.setInput(0, frame_hold)
+
+        _set_values(knob, wedge["values"])
+        if write.knob("use_limit") is not None:
+            write.knob("use_limit").setValue(False)
+        write.knob("file").setValue(wedge["file"])
+
+        return script_snapshot.create_snapshot(write, script_path)
+
+    # Always restore the script of the user
+    finally:
+        write.setInput(0, write_input)
+        nuke.delete(frame_hold)
+        for changed_knob, script in zip(changed, scripts):
+            changed_knob.fromScript(script)
+
+
+def write_manifest(wedge, job_id=None):
+    """
+    Write the knob, frame, values and output files of the wedge next to
+    the outputs, so the results can be matched to their values. Returns
+    the path of the manifest.
+    """
+    directory, file_name = os.path.split(wedge["file"])
+    path = os.path.join(
+        directory, "%s_wedge.json" % file_name.split(WEDGE_SUFFIX)[0]
+    )
+
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    manifest = dict(wedge, job_id=job_id, outputs=wedge_outputs(wedge))
+    with open(path, "w", encoding="utf-8") as manifest_json:
+        json.dump(manifest, manifest_json, indent=4)
+
+    return path
+
+
+def notify_when_done(job_id, description, deadline_transport):
+    """
+    Let the user know when all tasks of the wedge job are done, or when
+    the job failed. The status is asked by the shared StatusPoller.
+    """
+    import nuke
+
+    poller = job_registry.get_poller(deadline_transport)
+
+    def jobs_polled(jobs):
+        for job in jobs:
+            if job["job_id"] != job_id:
+                continue
+
+            if job["status"] not in job_registry.FINISHED_STATUSES:
+                return
+
+            poller.remove_listener(jobs_polled)
+            nuke.executeInMainThread(
+                nuke.message,
+                args=(
+                    "Wedge %s is %s (%i/%i tasks)."
+                    % (
+                        description,
+                        job["status"].lower(),
+                        job["completed"],
+                        job["tasks"],
+                    ),
+                ),
+            )
+            return
+
+    poller.add_listener(jobs_polled)
@@ -1,3 +1,6 @@
 import nuke
 
-nuke.pluginAddPath("./deadline_submission")
+# The submitter is only used from the user interface, so terminal
+# and render sessions (nuke -t) don't need to load it at all
+if nuke.GUI:
+    nuke.pluginAddPath("./deadline_submission")
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules import each other by name, like inside Nuke
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in ("deadline_submission", "benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT, directory))
@@ -0,0 +1,92 @@
+import bulk_submit
+import duplicates
+
+
+class StatusTransport(object):
+    """Answers the status of earlier jobs."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+
+    def job_statuses(self, job_ids):
+        return dict(
+            (job_id, {"status": self.statuses[job_id]})
+            for job_id in job_ids
+            if job_id in self.statuses
+        )
+
+
+def job(script_path, frames="1001-1010", write_node="Write1"):
+    return {
+        "job_info": {
+            "Name": "shot - %s" % write_node,
+            "Frames": frames,
+            "OutputDirectory0": "/renders",
+            "OutputFilename0": "comp.####.exr",
+        },
+        "plugin_info": {"SceneFile": script_path, "WriteNode": write_node},
+    }
+
+
+def test_fingerprint(tmp_path):
+    script = tmp_path / "shot_v001.nk"
+    script.write_text("Root {}\n")
+    fingerprint = duplicates.fingerprint(job(str(script)))
+
+    # Only the frames matter, not how they are written
+    assert fingerprint == duplicates.fingerprint(
+        job(str(script), "1001-1005,1006-1010")
+    )
+    assert fingerprint != duplicates.fingerprint(job(str(script), "1-10"))
+    assert fingerprint != duplicates.fingerprint(
+        job(str(script), write_node="Write2")
+    )
+
+    # The content of the script is hashed, not its path
+    script.write_text("Root {}\nWrite {}\n")
+    assert fingerprint != duplicates.fingerprint(job(str(script)))
+
+    assert duplicates.fingerprint(job(str(tmp_path / "missing.nk"))) is None
+
+
+def test_find_duplicates(tmp_path):
+    index = duplicates.SubmissionIndex(str(tmp_path / "index.json"))
+    jobs = []
+    for number in range(3):
+        script = tmp_path / ("shot_%i.nk" % number)
+        script.write_text("Root {name %i}\n" % number)
+        jobs.append(job(str(script)))
+    index.record(jobs, ["active", "failed", None])
+
+    deadline_transport = StatusTransport(
+        {"active": "Active", "failed": "Failed"}
+    )
+    found = duplicates.find_duplicates(jobs, deadline_transport, index)
+
+    assert [duplicate["job"] for duplicate in found] == [jobs[0]]
+    assert found[0]["job_id"] == "active"
+    assert found[0]["status"] == "Active"
+
+
+def test_bulk_submit_skips_duplicates(tmp_path, monkeypatch):
+    index = duplicates.SubmissionIndex(str(tmp_path / "index.json"))
+    monkeypatch.setattr(duplicates, "_index", index)
+
+    script = tmp_path / "shot_v001.nk"
+    script.write_text("Root {}\n")
+    results = [
+        {"status": "checked", "submission_parameters": job(str(script))},
+        {
+            "status": "checked",
+            "submission_parameters": job(str(script), write_node="Write2"),
+        },
+    ]
+    index.record([results[0]["submission_parameters"]], ["earlier"])
+
+    left = bulk_submit.skip_duplicates(
+        results, StatusTransport({"earlier": "Completed"})
+    )
+
+    assert left == [results[1]]
+    assert results[0]["status"] == "duplicate"
+    assert results[0]["job_id"] == "earlier"
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+import sequence_scanner
+from frames import compact_frame_list, key_frames, parse_frame_list
+
+
+def test_parse_frame_list():
+    assert parse_frame_list("1-10x2, 20") == [1, 3, 5, 7, 9, 20]
+    assert parse_frame_list("5,1-3 3") == [1, 2, 3, 5]
+    assert parse_frame_list("10-8") == [8, 9, 10]
+    assert parse_frame_list("-2-1") == [-2, -1, 0, 1]
+    assert parse_frame_list("") == []
+
+    with pytest.raises(ValueError):
+        parse_frame_list("1-10y2")
+
+
+def test_compact_frame_list():
+    assert compact_frame_list([1, 2, 3, 5, 7, 8]) == "1-3,5,7-8"
+    assert compact_frame_list([3, 1, 2, 2]) == "1-3"
+    assert compact_frame_list([]) == ""
+
+
+def test_key_frames():
+    assert key_frames(range(1, 101), 25) == [1, 100, 51, 26, 76]
+    assert key_frames([3, 1, 2, 1], 10) == [1, 3, 2]
+    assert key_frames([]) == []
+
+
+def test_sequence_regex():
+    regex = sequence_scanner.sequence_regex("comp.####.exr")
+    assert regex.match("comp.1001.exr").group("frame") == "1001"
+    assert regex.match("comp.10001.exr").group("frame") == "10001"
+    assert not regex.match("comp.101.exr")
+    assert not regex.match("comp.1001.exr.tmp")
+
+    regex = sequence_scanner.sequence_regex("v%03d/comp.%03d.exr")
+    assert regex.match("v012/comp.012.exr")
+    assert not regex.match("v012/comp.013.exr")
+
+
+def test_frame_path():
+    assert sequence_scanner.frame_path("/r/comp.####.exr", 7) == os.path.join(
+        "/r", "comp.0007.exr"
+    )
+    assert sequence_scanner.frame_path("/r/comp.%d.exr", 7) == os.path.join(
+        "/r", "comp.7.exr"
+    )
+
+
+def test_missing_frames(tmp_path):
+    for frame in (1001, 1002, 1003):
+        (tmp_path / ("comp.%i.exr" % frame)).write_bytes(b"data")
+    (tmp_path / "comp.1004.exr").write_bytes(b"")
+    (tmp_path / "other.1005.exr").write_bytes(b"data")
+
+    file_path = str(tmp_path / "comp.####.exr")
+    frames = range(1001, 1006)
+
+    assert sequence_scanner.missing_frames(file_path, frames) == [1004, 1005]
+
+    # Frames older than the script have to be rendered again
+    os.utime(str(tmp_path / "comp.1001.exr"), (1000, 1000))
+    assert sequence_scanner.missing_frames(
+        file_path, frames, newer_than=2000
+    ) == [1001, 1004, 1005]
+
+    assert sequence_scanner.missing_frames(
+        str(tmp_path / "missing" / "comp.####.exr"), [1, 2]
+    ) == [1, 2]
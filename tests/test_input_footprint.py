@@ -0,0 +1,42 @@
+from concurrent.futures import Future
+
+import fake_nuke
+import input_footprint
+import node_graph
+
+
+def read_index(*file_paths):
+    """Return the index of a Write node fed by a Read of every file."""
+    write = fake_nuke.Node("Write", "Write1")
+    for index, file_path in enumerate(file_paths):
+        read = fake_nuke.Node("Read", "Read%i" % (index + 1), file=file_path)
+        write.setInput(index, read)
+    return node_graph.UpstreamIndex(write)
+
+
+def test_scan(tmp_path):
+    for frame in range(1001, 1005):
+        (tmp_path / ("plate.%i.exr" % frame)).write_bytes(b"x" * 1000)
+    (tmp_path / "still.png").write_bytes(b"x" * 300)
+
+    index = read_index(
+        str(tmp_path / "plate.####.exr"),
+        str(tmp_path / "still.png"),
+        str(tmp_path / "missing.####.exr"),
+        "[value root.name]",
+    )
+    scan = input_footprint.scan(index)
+    footprint = scan.result(timeout=10)
+
+    assert input_footprint.scanned(scan) == footprint
+    assert footprint == input_footprint.estimate(index)
+    assert footprint["bytes_per_frame"] == 1000
+    assert footprint["bytes_per_task"] == 300
+    assert footprint["inputs"][0]["frames"] == 4
+    assert footprint["missing"] == [str(tmp_path / "missing.####.exr")]
+
+
+def test_scanned_never_waits():
+    assert input_footprint.scanned(Future()) is None
+    assert input_footprint.scanned(None) is None
+    assert input_footprint.scanned({"inputs": []}) == {"inputs": []}
@@ -0,0 +1,133 @@
+import fake_nuke
+import job_parameters
+import memory_budget
+import node_graph
+import temporal
+from frames import parse_frame_list
+
+
+def rendered_frames(frame_list):
+    """Return the frames in the order Deadline renders them."""
+    return [
+        frame
+        for part in frame_list.split(",")
+        for frame in parse_frame_list(part)
+    ]
+
+
+def kronos_write():
+    read = fake_nuke.Node("Read", "Read1")
+    kronos = fake_nuke.Node("Kronos", "Kronos1")
+    kronos.setInput(0, read)
+    write = fake_nuke.Node("Write", "Write1")
+    write.setInput(0, kronos)
+    return write, node_graph.UpstreamIndex(write)
+
+
+def test_chunks_fit_in_memory(monkeypatch):
+    write, index = kronos_write()
+
+    # Room for two tasks of 3 frames, not for four tasks
+    memory = (
+        2 * memory_budget.estimate_task_memory(write, index, 3)
+        / memory_budget.MEMORY_HEADROOM
+    )
+    monkeypatch.setenv(
+        "DEADLINE_SUBMISSION_WORKER_MEMORY", str(memory / 1024 ** 3)
+    )
+    monkeypatch.setenv("DEADLINE_SUBMISSION_WORKERS", "1")
+
+    fitted = job_parameters.fit_to_node_graph(write, index, "1001-1100", 4, 1)
+
+    assert fitted["concurrent_tasks"] == 2
+    assert fitted["chunk_size"] == 3
+    task_memory = memory_budget.estimate_task_memory(
+        write, index, fitted["chunk_size"]
+    )
+    assert task_memory * fitted["concurrent_tasks"] <= memory * (
+        memory_budget.MEMORY_HEADROOM
+    )
+
+    # The extra info describes the chunks that are rendered
+    frames = rendered_frames(fitted["frames"])
+    overlap = temporal.overlap_frames(
+        frames, fitted["chunk_size"], fitted["reach"]
+    )
+    assert fitted["extra_info"]["TemporalOverlap"] == "%i frames" % overlap
+
+
+def test_chunks_of_held_segments_fit_in_memory(monkeypatch):
+    read = fake_nuke.Node("Read", "Read1")
+    frame_hold = fake_nuke.Node(
+        "FrameHold", "FrameHold1", first_frame=1003, increment=10
+    )
+    frame_hold.setInput(0, read)
+    kronos = fake_nuke.Node("Kronos", "Kronos1")
+    kronos.setInput(0, frame_hold)
+    write = fake_nuke.Node("Write", "Write1")
+    write.setInput(0, kronos)
+    index = node_graph.UpstreamIndex(write)
+
+    # A single task of 10 frames doesn't fit
+    memory = (
+        memory_budget.estimate_task_memory(write, index, 3)
+        / memory_budget.MEMORY_HEADROOM
+    )
+    monkeypatch.setenv(
+        "DEADLINE_SUBMISSION_WORKER_MEMORY", str(memory / 1024 ** 3)
+    )
+
+    fitted = job_parameters.fit_to_node_graph(write, index, "1001-1102", 4, 1)
+
+    assert fitted["concurrent_tasks"] == 1
+    assert fitted["chunk_size"] <= 3
+
+    # Every chunk renders contiguous frames
+    frames = rendered_frames(fitted["frames"])
+    for start in range(0, len(frames), fitted["chunk_size"]):
+        chunk = frames[start : start + fitted["chunk_size"]]
+        assert chunk == list(range(chunk[0], chunk[0] + len(chunk)))
+
+
+def preview_parameters(frames="1-100", priority=70):
+    return {
+        "job_info": {
+            "Name": "comp - Write1",
+            "Frames": frames,
+            "ChunkSize": 10,
+            "Priority": priority,
+        },
+        "plugin_info": {"WriteNode": "Write1"},
+    }
+
+
+def test_preview_jobs():
+    submission_parameters = preview_parameters()
+    preview, fill = job_parameters.preview_jobs(submission_parameters, 25)
+
+    assert preview["job_info"]["Name"] == "comp - Write1 (preview)"
+    assert rendered_frames(preview["job_info"]["Frames"]) == [
+        1,
+        100,
+        51,
+        26,
+        76,
+    ]
+    assert preview["job_info"]["ChunkSize"] == 1
+    assert preview["job_info"]["Priority"] == 80
+
+    assert fill["job_info"]["Name"] == "comp - Write1"
+    assert fill["job_info"]["Frames"] == "2-25,27-50,52-75,77-99"
+    assert fill["job_info"]["ChunkSize"] == 10
+    assert fill["job_info"]["Priority"] == 70
+
+    # The original job is left as it is
+    assert submission_parameters["job_info"]["Frames"] == "1-100"
+
+
+def test_preview_jobs_of_key_frames_only():
+    jobs = job_parameters.preview_jobs(preview_parameters("1-3", 95))
+
+    assert len(jobs) == 1
+    assert rendered_frames(jobs[0]["job_info"]["Frames"]) == [1, 3, 2]
+    assert jobs[0]["job_info"]["Priority"] == 100
@@ -0,0 +1,75 @@
+import threading
+
+import job_registry
+
+
+class StatusTransport(object):
+    """Answers the statuses of the known jobs."""
+
+    def __init__(self, statuses):
+        self.statuses = statuses
+        self.polled = threading.Event()
+
+    def job_statuses(self, job_ids):
+        self.polled.set()
+        return dict(
+            (job_id, dict(self.statuses[job_id]))
+            for job_id in job_ids
+            if job_id in self.statuses
+        )
+
+
+def job(name):
+    return {"job_info": {"Name": name}, "plugin_info": {"WriteNode": name}}
+
+
+def registry_with_jobs(*job_ids):
+    registry = job_registry.JobRegistry()
+    registry.register([job(job_id) for job_id in job_ids], list(job_ids))
+    return registry
+
+
+def test_missing_jobs_are_deleted_after_several_polls():
+    registry = registry_with_jobs("a", "b")
+    deadline_transport = StatusTransport({"a": {"status": "Active"}})
+    poller = job_registry.StatusPoller(deadline_transport, registry)
+
+    for _ in range(job_registry.MISSING_POLLS - 1):
+        poller.poll()
+        assert registry.get("b")["status"] == "Submitted"
+
+    # Found again, so it has to be missing a few more times
+    deadline_transport.statuses["b"] = {"status": "Active"}
+    poller.poll()
+    del deadline_transport.statuses["b"]
+    poller.poll()
+    assert registry.get("b")["status"] == "Active"
+
+    for _ in range(job_registry.MISSING_POLLS - 1):
+        poller.poll()
+    assert registry.get("b")["status"] == "Deleted"
+    assert registry.unfinished() == ["a"]
+
+
+def test_polling_stops_without_unfinished_jobs():
+    registry = registry_with_jobs("a")
+    deadline_transport = StatusTransport({"a": {"status": "Completed"}})
+    poller = job_registry.StatusPoller(
+        deadline_transport, registry, min_interval=0.01
+    )
+
+    polled = []
+    poller.add_listener(polled.append)
+    assert deadline_transport.polled.wait(5)
+
+    # The thread stops, a listener added afterwards starts a new one
+    for thread in threading.enumerate():
+        if thread.name == "DeadlineStatusPoller":
+            thread.join(5)
+    assert registry.unfinished() == []
+
+    registry.register([job("b")], ["b"])
+    deadline_transport.statuses["b"] = {"status": "Completed"}
+    deadline_transport.polled.clear()
+    poller.add_listener(lambda jobs: None)
+    assert deadline_transport.polled.wait(5)
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Registering the menu may load at most this many extra modules,
+# and take at most this many seconds
+MODULE_BUDGET = 5
+TIME_BUDGET = 0.5
+
+# Runs menu.py in a fresh interpreter, so the modules loaded by
+# the tests themselves don't count
+MENU_IMPORT = """
+import json, sys, time
+sys.path[:0] = [%r, %r]
+import fake_nuke
+nuke = fake_nuke.install()
+nuke.GUI = %r
+modules = set(sys.modules)
+start = time.perf_counter()
+exec(compile(open(%r).read(), "menu.py", "exec"), {"nuke": nuke})
+print(json.dumps({
+    "time": time.perf_counter() - start,
+    "modules": sorted(set(sys.modules) - modules),
+    "commands": [command[0] for command in nuke.menu("Nuke").commands],
+}))
+"""
+
+
+def import_menu(gui):
+    code = MENU_IMPORT % (
+        os.path.join(ROOT, "benchmarks"),
+        os.path.join(ROOT, "deadline_submission"),
+        gui,
+        os.path.join(ROOT, "deadline_submission", "menu.py"),
+    )
+    return json.loads(subprocess.check_output([sys.executable, "-c", code]))
+
+
+def test_menu_import_budget():
+    result = import_menu(gui=True)
+
+    assert "Submit to Deadline" in result["commands"]
+    assert len(result["modules"]) <= MODULE_BUDGET, result["modules"]
+    assert result["time"] < TIME_BUDGET
+
+
+def test_submitter_is_not_imported():
+    for gui in (True, False):
+        modules = import_menu(gui)["modules"]
+
+        assert "deadline_submission" not in modules
+        assert "panel" not in modules
+        assert "transport" not in modules
+
+
+def test_terminal_session_adds_nothing():
+    result = import_menu(gui=False)
+
+    assert result["commands"] == []
+    assert result["modules"] == []
@@ -0,0 +1,89 @@
+import os
+
+import pytest
+
+import nk_parser
+import node_graph
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "small_comp.nk")
+
+
+@pytest.fixture
+def script():
+    return nk_parser.parse_script(FIXTURE)
+
+
+def test_root(script):
+    assert script.version == "13.2"
+    assert script.name() == "/shots/sh010/comp/sh010_comp_v003.nk"
+    assert (script.first_frame(), script.last_frame()) == (1001, 1100)
+    assert (script.format().width(), script.format().height()) == (2048, 1152)
+
+
+def test_stack(script):
+    merge = script.to_node("Merge1")
+    assert [merge.input(0).name(), merge.input(1).name()] == [
+        "Blur2",
+        "Blur1",
+    ]
+    assert script.to_node("Write2").input(0) is script.to_node("Plate")
+
+
+def test_clones(script):
+    assert script.to_node("Blur1").Class() == "Blur"
+    assert script.to_node("Blur2").Class() == "Blur"
+    assert script.to_node("Blur2").input(0) is script.to_node("Plate")
+
+
+def test_groups(script):
+    group = script.to_node("Retime")
+    assert isinstance(group, nk_parser.ParsedGroup)
+    assert [node.name() for node in group.nodes()] == [
+        "Input1",
+        "Kronos1",
+        "Output1",
+    ]
+    assert group.output().input(0).fullName() == "Retime.Kronos1"
+    assert script.to_node("Retime.Kronos1").knob("shutterTime").value() == 2
+    assert script.to_node("Grade1").input(0) is group
+    assert [node.name() for node in script.all_nodes("Write")] == [
+        "Write1",
+        "Write2",
+    ]
+
+
+def test_knobs(script):
+    write = script.to_node("Write1")
+    assert write.knob("file").value() == "/renders/sh010/comp.####.exr"
+    assert write.knob("disable").value() is False
+    assert script.to_node("Write2").knob("disable").value() is True
+
+    # Only the indexed knobs are kept
+    assert script.to_node("Grade1").knob("white") is None
+    script = nk_parser.parse_script(FIXTURE, knobs=["white"])
+    assert script.to_node("Grade1").knob("white").value() == 1.2
+
+
+def test_upstream_index(script):
+    index = node_graph.UpstreamIndex(script.to_node("Write1"))
+
+    assert [node.fullName() for node in index.nodes_of_class("Kronos")] == [
+        "Retime.Kronos1"
+    ]
+    assert len(index.nodes_of_class("Read")) == 1
+
+    # Driven by an expression, so it can't be known to be disabled
+    assert not index.is_disabled(script.to_node("Grade1"))
+
+
+def test_parse_value():
+    assert nk_parser.parse_value("true") is True
+    assert nk_parser.parse_value('"a \\"quoted\\" name"') == 'a "quoted" name'
+    assert nk_parser.parse_value("{1 2 3}") == "1 2 3"
+    assert nk_parser.parse_value("{{frame}}") == "{{frame}}"
+    assert nk_parser.parse_value("0.5") == 0.5
+
+
+def test_unreadable_script(tmp_path):
+    with pytest.raises(nk_parser.ParseError):
+        nk_parser.parse_script(str(tmp_path / "missing.nk"))
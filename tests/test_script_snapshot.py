@@ -0,0 +1,60 @@
+import os
+
+import fake_nuke
+
+nuke = fake_nuke.install()
+
+import script_snapshot  # noqa: E402
+
+
+def comp(tmp_path, monkeypatch):
+    """Create a script with a branch the Write node doesn't need."""
+    monkeypatch.setenv("DEADLINE_SUBMISSION_SNAPSHOTS", str(tmp_path))
+    fake_nuke.reset(str(tmp_path / "comp_v001.nk"))
+
+    read = fake_nuke.add(fake_nuke.Node("Read", "Read1"))
+    grade = fake_nuke.add(fake_nuke.Node("Grade", "Grade1", white=1.0))
+    grade.setInput(0, read)
+    write = fake_nuke.add(fake_nuke.Node("Write", "Write1"))
+    write.setInput(0, grade)
+
+    # Linked via an expression only
+    fake_nuke.add(fake_nuke.Node("NoOp", "Controls"))
+    grade._links.append(nuke.toNode("Controls"))
+
+    unused = fake_nuke.add(fake_nuke.Node("Blur", "Unused"))
+    unused.setInput(0, read)
+
+    return write, grade
+
+
+def test_snapshot_only_contains_needed_nodes(tmp_path, monkeypatch):
+    write, _ = comp(tmp_path, monkeypatch)
+
+    path = script_snapshot.create_snapshot(write)
+    with open(path, encoding="utf-8") as snapshot:
+        text = snapshot.read()
+
+    assert os.path.dirname(path) == str(tmp_path).replace(os.sep, "/")
+    assert os.path.basename(path).startswith("comp_v001_")
+    for name in ("Read1", "Grade1", "Write1", "Controls"):
+        assert "name %s" % name in text
+    assert "Unused" not in text
+
+
+def test_snapshots_are_named_after_their_content(tmp_path, monkeypatch):
+    write, grade = comp(tmp_path, monkeypatch)
+
+    path = script_snapshot.create_snapshot(write)
+    assert script_snapshot.create_snapshot([write]) == path
+
+    # The unused branch doesn't change the snapshot
+    nuke.toNode("Unused").knob("disable").setValue(True)
+    assert script_snapshot.create_snapshot(write) == path
+
+    grade.knob("white").setValue(2.0)
+    changed_path = script_snapshot.create_snapshot(write)
+    assert changed_path != path
+    assert sorted(os.listdir(str(tmp_path))) == sorted(
+        os.path.basename(snapshot) for snapshot in (path, changed_path)
+    )
@@ -0,0 +1,135 @@
+import os
+
+import pytest
+
+import job_registry
+import spool
+import transport
+
+
+class FakeTransport(object):
+    """Submits the jobs, or raises the provided error."""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.submitted = []
+
+    def submit(self, jobs):
+        if self.error is not None:
+            raise self.error
+
+        self.submitted.extend(jobs)
+        return {
+            "output": "",
+            "job_ids": [
+                "job%i" % index
+                for index in range(
+                    len(self.submitted) - len(jobs), len(self.submitted)
+                )
+            ],
+        }
+
+
+def job(name):
+    return {"job_info": {"Name": name}, "plugin_info": {}}
+
+
+@pytest.fixture
+def local_spool(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_registry, "register", lambda *args: None)
+    return spool.Spool(str(tmp_path), batch_size=2, retry_delay=60.0)
+
+
+def test_round_trip(local_spool):
+    first = local_spool.add(job("a"))
+    second = local_spool.add(job("b"))
+    local_spool.add(job("c"))
+
+    # The same job is only spooled once
+    assert local_spool.add(job("a")) == first
+    assert [entry["job"] for entry in local_spool.backlog()] == [
+        job("a"),
+        job("b"),
+        job("c"),
+    ]
+
+    deadline_transport = FakeTransport()
+    submitted = local_spool.flush(deadline_transport)
+
+    assert submitted[first] == "job0"
+    assert submitted[second] == "job1"
+    assert len(submitted) == 3
+    assert deadline_transport.submitted == [job("a"), job("b"), job("c")]
+    assert local_spool.backlog() == []
+    assert os.listdir(local_spool.claim_directory) == []
+
+
+def test_unreachable_jobs_wait(local_spool):
+    local_spool.add(job("a"))
+
+    unreachable = transport.TransportError("timed out", unreachable=True)
+    assert local_spool.flush(FakeTransport(unreachable)) == {}
+
+    (entry,) = local_spool.backlog()
+    assert entry["state"] == "pending"
+    assert entry["attempts"] == 1
+    assert entry["last_error"] == "timed out"
+
+    # Waiting for the next attempt, unless forced
+    assert local_spool.flush(FakeTransport()) == {}
+    assert list(local_spool.flush(FakeTransport(), force=True).values()) == [
+        "job0"
+    ]
+
+
+def test_rejected_jobs_fail(local_spool):
+    local_spool.add(job("a"))
+
+    rejected = transport.TransportError("Invalid job")
+    local_spool.flush(FakeTransport(rejected))
+
+    (entry,) = local_spool.backlog()
+    assert entry["state"] == "failed"
+
+    local_spool.retry_failed()
+    (entry,) = local_spool.backlog()
+    assert entry["state"] == "pending"
+    assert entry["attempts"] == 0
+
+
+def test_jobs_are_claimed_once(tmp_path, local_spool):
+    local_spool.add(job("a"))
+
+    # Another process flushes the spool while the jobs are submitted
+    other_spool = spool.Spool(str(tmp_path))
+    other_transport = FakeTransport()
+
+    class FlushingTransport(FakeTransport):
+        def submit(self, jobs):
+            other_spool.flush(other_transport, force=True)
+            return FakeTransport.submit(self, jobs)
+
+    deadline_transport = FlushingTransport()
+    local_spool.flush(deadline_transport)
+
+    assert deadline_transport.submitted == [job("a")]
+    assert other_transport.submitted == []
+    assert local_spool.backlog() == []
+
+
+def test_stale_claims_are_released(local_spool):
+    spool_id = local_spool.add(job("a"))
+
+    # A process stopped while submitting the job
+    claim_directory = os.path.join(local_spool.inflight_directory, "1")
+    os.makedirs(claim_directory)
+    claimed_file = os.path.join(claim_directory, spool_id + ".json")
+    os.replace(
+        os.path.join(local_spool.pending_directory, spool_id + ".json"),
+        claimed_file,
+    )
+    assert local_spool.flush(FakeTransport()) == {}
+
+    stale = os.path.getmtime(claimed_file) - spool.CLAIM_TIMEOUT - 1
+    os.utime(claimed_file, (stale, stale))
+    assert local_spool.flush(FakeTransport()) == {spool_id: "job0"}
@@ -0,0 +1,84 @@
+import threading
+
+import fake_nuke
+
+nuke = fake_nuke.install()
+
+import submission_queue  # noqa: E402
+
+
+class MainThread(object):
+    """Queues the calls to the main thread, like Nuke does."""
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def execute(self, call, args=(), kwargs=None):
+        with self.lock:
+            self.calls.append((call, args, kwargs or {}))
+
+    def run(self):
+        with self.lock:
+            calls, self.calls = self.calls, []
+        for call, args, kwargs in calls:
+            call(*args, **kwargs)
+
+
+class ProgressTask(object):
+    """Fails when used outside of the main thread."""
+
+    tasks = []
+    deleted_in = []
+
+    def __init__(self, name):
+        assert threading.current_thread() is threading.main_thread()
+        self.messages = []
+        ProgressTask.tasks.append(self)
+
+    def setMessage(self, message):
+        assert threading.current_thread() is threading.main_thread()
+        self.messages.append(message)
+
+    def __del__(self):
+        ProgressTask.deleted_in.append(threading.current_thread())
+
+
+class Transport(object):
+    def __init__(self):
+        self.release = threading.Event()
+
+    def submit(self, jobs):
+        self.release.wait(10)
+        return {"output": "ok", "job_ids": ["a"] * len(jobs)}
+
+
+def test_progress_task_in_main_thread(monkeypatch):
+    main_thread = MainThread()
+    monkeypatch.setattr(nuke, "executeInMainThread", main_thread.execute)
+    monkeypatch.setattr(nuke, "ProgressTask", ProgressTask)
+    monkeypatch.setattr(
+        submission_queue.spool.job_registry, "register", lambda *args: None
+    )
+
+    transport = Transport()
+    queue = submission_queue.SubmissionQueue(transport)
+    results = []
+    future = queue.submit([{"job_info": {}}], callback=results.append)
+    main_thread.run()
+
+    (task,) = ProgressTask.tasks
+    assert task.messages == ["1 submission(s) in flight"]
+    del task
+    ProgressTask.tasks = []
+
+    transport.release.set()
+    assert future.result(10)["job_ids"] == ["a"]
+    assert queue.in_flight() == 0
+
+    assert ProgressTask.deleted_in == []
+
+    # The progress task is removed in the main thread
+    main_thread.run()
+    assert results == [{"output": "ok", "job_ids": ["a"], "spooled": False}]
+    assert ProgressTask.deleted_in == [threading.main_thread()]
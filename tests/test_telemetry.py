@@ -0,0 +1,32 @@
+import json
+
+import telemetry
+
+
+def test_percentile():
+    values = list(range(1, 21))
+
+    assert telemetry.percentile(values, 50) == 10
+    assert telemetry.percentile(values, 95) == 19
+    assert telemetry.percentile(values, 100) == 20
+    assert telemetry.percentile([3.0], 95) == 3.0
+    assert telemetry.percentile([], 50) is None
+
+
+def test_summarize_skips_incomplete_records(tmp_path):
+    log = tmp_path / "deadline_telemetry.jsonl"
+    lines = [
+        {"duration": 2.0, "spans": [{"name": "panel", "duration": 1.5}]},
+        {"duration": 4.0, "spans": [{"name": "panel"}, {"duration": 1.0}]},
+        {"name": "submit", "spans": [{"name": "panel", "duration": 9.0}]},
+        ["not", "a", "trace"],
+    ]
+    log.write_text(
+        "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+    )
+
+    summary = telemetry.summarize([str(log), str(tmp_path / "missing")])
+
+    assert summary["total"] == {"count": 2, "p50": 2.0, "p95": 4.0}
+    assert summary["panel"] == {"count": 1, "p50": 1.5, "p95": 1.5}
+    assert set(summary) == {"total", "panel"}
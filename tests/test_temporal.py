@@ -0,0 +1,90 @@
+import fake_nuke
+import node_graph
+import temporal
+
+
+def upstream_index(*nodes):
+    """Return the index of a Write node fed by the nodes, in order."""
+    upstream = fake_nuke.Node("Read", "Read1")
+    for node in nodes:
+        node.setInput(0, upstream)
+        upstream = node
+
+    write = fake_nuke.Node("Write", "Write1")
+    write.setInput(0, upstream)
+    return node_graph.UpstreamIndex(write)
+
+
+def chunks(frames, chunk_size):
+    return [
+        frames[index : index + chunk_size]
+        for index in range(0, len(frames), chunk_size)
+    ]
+
+
+def assert_contiguous(frames, chunk_size):
+    for chunk in chunks(frames, chunk_size):
+        assert chunk == list(range(chunk[0], chunk[0] + len(chunk)))
+
+
+def test_no_time_nodes():
+    index = upstream_index(fake_nuke.Node("Blur", "Blur1"))
+    result = temporal.fit_chunks(index, range(1001, 1101), 5)
+
+    assert result["frames"] == list(range(1001, 1101))
+    assert result["chunk_size"] == 5
+    assert result["overlap"] == result["avoided"] == 0
+
+
+def test_reach_grows_chunks():
+    index = upstream_index(fake_nuke.Node("Kronos", "Kronos1"))
+    result = temporal.fit_chunks(index, range(1001, 1101), 1, workers=10)
+
+    assert result["reach"] == (2, 2)
+    assert result["chunk_size"] > 1
+    assert result["avoided"] > 0
+    assert_contiguous(result["frames"], result["chunk_size"])
+
+
+def test_chunks_start_at_segments():
+    index = upstream_index(
+        fake_nuke.Node(
+            "FrameHold", "FrameHold1", first_frame=1003, increment=10
+        )
+    )
+    result = temporal.fit_chunks(index, range(1001, 1103), 1, workers=10)
+
+    assert result["chunk_size"] == 10
+    assert result["frames"][0] == 1003
+    assert result["frames"][-2:] == [1001, 1002]
+    assert_contiguous(result["frames"], result["chunk_size"])
+    assert temporal.ordered_frame_list(result["frames"]) == (
+        "1003-1102,1001-1002"
+    )
+
+
+def test_segments_not_filling_chunks_keep_their_order():
+    index = upstream_index(
+        fake_nuke.Node(
+            "FrameHold", "FrameHold1", first_frame=1003, increment=4
+        )
+    )
+    result = temporal.fit_chunks(index, range(1001, 1011), 1, workers=1)
+
+    assert_contiguous(result["frames"], result["chunk_size"])
+
+
+def test_chunk_limit():
+    index = upstream_index(fake_nuke.Node("Kronos", "Kronos1"))
+    result = temporal.fit_chunks(
+        index, range(1001, 1101), 1, workers=1, chunk_limit=3
+    )
+
+    assert result["chunk_size"] == 3
+    assert_contiguous(result["frames"], result["chunk_size"])
+
+    # The limit never lowers the provided chunk size
+    result = temporal.fit_chunks(
+        index, range(1001, 1101), 5, workers=1, chunk_limit=3
+    )
+    assert result["chunk_size"] == 5
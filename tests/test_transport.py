@@ -0,0 +1,158 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import transport
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers with the next response queued on the server."""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def handle_request(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.server.requests.append((self.command, self.path, body))
+
+        status, content, options = self.server.responses.pop(0)
+        if options.get("delay"):
+            self.server.release.wait(options["delay"])
+
+        content = json.dumps(content).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+        # Close the connection without telling the client,
+        # like a server dropping idle connections
+        if options.get("drop"):
+            self.close_connection = True
+
+    do_GET = do_POST = do_PUT = handle_request
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.responses = []
+    server.connections = 0
+    server.release = threading.Event()
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    yield server
+
+    server.release.set()
+    server.shutdown()
+    server.server_close()
+
+
+def web_service(server, **kwargs):
+    kwargs.setdefault("backoff", 0)
+    return transport.WebServiceTransport(
+        "http://127.0.0.1:%i" % server.server_address[1], **kwargs
+    )
+
+
+def test_connection_is_reused(server):
+    server.responses = [(200, ["comp"], {}), (200, ["nuke"], {})]
+    deadline = web_service(server)
+
+    assert deadline.pool_names() == ["comp"]
+    assert deadline.group_names() == ["nuke"]
+    assert server.connections == 1
+
+
+def test_submit_returns_job_ids(server):
+    server.responses = [
+        (200, {"_id": "63a1"}, {}),
+        (200, {"_id": "63a2"}, {}),
+    ]
+    result = web_service(server).submit(
+        [{"job_info": {"Name": "a"}}, {"job_info": {"Name": "b"}}]
+    )
+
+    assert result["job_ids"] == ["63a1", "63a2"]
+    assert [request[:2] for request in server.requests] == [
+        ("POST", "/api/jobs"),
+        ("POST", "/api/jobs"),
+    ]
+    assert json.loads(server.requests[0][2])["JobInfo"] == {"Name": "a"}
+
+
+def test_stale_connection_is_retried(server):
+    server.responses = [
+        (200, ["comp"], {"drop": True}),
+        (200, {"_id": "63a1"}, {}),
+    ]
+    deadline = web_service(server)
+    deadline.pool_names()
+
+    assert deadline.request("POST", "/api/jobs", {}) == {"_id": "63a1"}
+    assert len(server.requests) == 2
+    assert server.connections == 2
+
+
+def test_server_error_retries_get(server):
+    server.responses = [(503, {}, {}), (500, {}, {}), (200, ["comp"], {})]
+
+    assert web_service(server).pool_names() == ["comp"]
+    assert len(server.requests) == 3
+
+
+def test_server_error_does_not_retry_post(server):
+    server.responses = [(500, {}, {}), (200, {"_id": "63a1"}, {})]
+
+    with pytest.raises(transport.TransportError) as error:
+        web_service(server).request("POST", "/api/jobs", {})
+
+    assert len(server.requests) == 1
+    assert not error.value.unreachable
+
+
+def test_read_timeout_does_not_retry_post(server):
+    server.responses = [(200, {"_id": "63a1"}, {"delay": 5})]
+
+    with pytest.raises(transport.TransportError) as error:
+        web_service(server, timeout=0.2).request("POST", "/api/jobs", {})
+
+    assert len(server.requests) == 1
+    assert not error.value.unreachable
+
+
+def test_client_error_is_not_retried(server):
+    server.responses = [(400, {"error": "Invalid"}, {}), (200, {}, {})]
+
+    with pytest.raises(transport.TransportError) as error:
+        web_service(server).pool_names()
+
+    assert "400" in str(error.value)
+    assert len(server.requests) == 1
+    assert not error.value.unreachable
+
+
+def test_connection_failure_is_unreachable(server):
+    deadline = web_service(server, retries=1)
+    server.shutdown()
+    server.server_close()
+
+    with pytest.raises(transport.TransportError) as error:
+        deadline.submit([{"job_info": {}}])
+
+    assert error.value.unreachable
@@ -0,0 +1,92 @@
+import fake_nuke
+
+nuke = fake_nuke.install()
+
+import script_snapshot  # noqa: E402
+import wedge  # noqa: E402
+
+
+def wedge_script(monkeypatch, values):
+    """
+    Create the wedge script of Blur1.size, returning the value of the
+    knob for every index and the Write node as it was snapshotted.
+    """
+    fake_nuke.reset("/shots/comp_v001.nk")
+    read = fake_nuke.add(fake_nuke.Node("Read", "Read1"))
+    blur = fake_nuke.add(fake_nuke.Node("Blur", "Blur1", size=3))
+    blur.setInput(0, read)
+    write = fake_nuke.add(
+        fake_nuke.Node("Write", "Write1", file="/renders/comp.####.exr")
+    )
+    write.setInput(0, blur)
+
+    settings = wedge.wedge_settings(
+        "Write1", "/renders/comp.####.exr", "Blur1.size", values, 1010
+    )
+    snapshotted = {}
+
+    def create_snapshot(node, script_path=None):
+        # Deadline renders frame N of the timeline for index N
+        for index in range(len(values)):
+            nuke.root().knob("frame").setValue(index)
+            snapshotted.setdefault("values", []).append(
+                blur.knob("size").evaluate()
+            )
+        snapshotted["input"] = node.input(0)
+        snapshotted["file"] = node.knob("file").value()
+        return "/snapshots/comp_wedge.nk"
+
+    monkeypatch.setattr(script_snapshot, "create_snapshot", create_snapshot)
+    path = wedge.create_wedge_script(settings)
+
+    return path, snapshotted, blur, write
+
+
+def test_every_index_renders_its_value(monkeypatch):
+    path, snapshotted, blur, write = wedge_script(monkeypatch, [1, 2, 4])
+
+    assert path == "/snapshots/comp_wedge.nk"
+    assert snapshotted["values"] == [1, 2, 4]
+
+    # The FrameHold doesn't change the frame of the timeline
+    frame_hold = snapshotted["input"]
+    assert frame_hold.Class() == "FrameHold"
+    assert frame_hold.knob("first_frame").value() == 1010
+    assert snapshotted["file"] == "/renders/comp_wedge###.1010.exr"
+
+
+def test_text_values(monkeypatch):
+    _, snapshotted, _, _ = wedge_script(monkeypatch, ["low", "high"])
+
+    assert snapshotted["values"] == ["low", "high"]
+
+
+def test_script_is_restored(monkeypatch):
+    _, _, blur, write = wedge_script(monkeypatch, [1, 2])
+
+    assert blur.knob("size").value() == 3
+    assert not blur.knob("size").isAnimated()
+    assert write.input(0) is blur
+    assert write.knob("file").value() == "/renders/comp.####.exr"
+    assert [node.Class() for node in nuke.allNodes()] == [
+        "Read",
+        "Blur",
+        "Write",
+    ]
+
+
+def test_parse_values():
+    assert wedge.parse_values("1,2,4,8") == [1, 2, 4, 8]
+    assert wedge.parse_values("0-1x0.25") == [0.0, 0.25, 0.5, 0.75, 1.0]
+    assert wedge.parse_values("0-2, red") == [0, 1, 2, "red"]
+
+
+def test_wedge_output():
+    assert (
+        wedge.wedge_output("/renders/comp.####.exr", 1001)
+        == "/renders/comp_wedge###.1001.exr"
+    )
+    assert (
+        wedge.wedge_output("/renders/still.png", 1)
+        == "/renders/still_wedge###.png"
+    )